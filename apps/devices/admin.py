@@ -1,6 +1,9 @@
 from django.contrib import admin
+from django.core.exceptions import ValidationError
+from django.forms.models import BaseInlineFormSet
 from django.utils.html import format_html
-from .models import Device, DeviceCycle, Department, MaintenanceLog
+from core.register_map import RegisterSpec, find_overlaps
+from .models import Device, DeviceCycle, DeviceRegister, Department, MaintenanceLog
 
 
 @admin.register(Department)
@@ -9,6 +12,38 @@ class DepartmentAdmin(admin.ModelAdmin):
     search_fields = ['name']
 
 
+class DeviceRegisterFormSet(BaseInlineFormSet):
+    """رجیسترهای هم‌پوشان یک ناحیه (مثلاً u32 روی D4 و رجیستر دیگری روی D5) ذخیره نشوند"""
+
+    def clean(self):
+        super().clean()
+        specs = []
+        for form in self.forms:
+            data = getattr(form, 'cleaned_data', None)
+            if not data or data.get('DELETE') or data.get('address') is None:
+                continue
+            specs.append(RegisterSpec(
+                field=data.get('target_field') or '?',
+                address=data['address'],
+                data_type=data.get('data_type') or 'u16',
+                area=data.get('area') or 'holding',
+            ))
+        overlaps = find_overlaps(specs)
+        if overlaps:
+            raise ValidationError([
+                f"{spec.field} @ {spec.address} با {other.field} @ {other.address} "
+                f"({other.data_type}، {other.width} رجیستر) هم‌پوشانی دارد"
+                for spec, other in overlaps
+            ])
+
+
+class DeviceRegisterInline(admin.TabularInline):
+    model = DeviceRegister
+    formset = DeviceRegisterFormSet
+    extra = 0
+    fields = ['target_field', 'area', 'address', 'data_type', 'scale']
+
+
 @admin.register(Device)
 class DeviceAdmin(admin.ModelAdmin):
     list_display = ['name', 'device_type', 'serial_number', 'department',
@@ -16,6 +51,7 @@ class DeviceAdmin(admin.ModelAdmin):
     list_filter = ['device_type', 'status', 'connection_type', 'is_active']
     search_fields = ['name', 'serial_number', 'manufacturer']
     readonly_fields = ['last_seen', 'status']
+    inlines = [DeviceRegisterInline]
 
     fieldsets = (
         ('اطلاعات پایه', {
@@ -35,7 +71,8 @@ class DeviceAdmin(admin.ModelAdmin):
     )
 
     def status_badge(self, obj):
-        colors = {'online': '#00ff88', 'offline': '#555', 'error': '#ff2244', 'maintenance': '#ffb800'}
+        colors = {'online': '#00ff88', 'offline': '#555', 'error': '#ff2244', 'maintenance': '#ffb800',
+                  'reconnecting': '#00d4ff'}
         color = colors.get(obj.status, '#555')
         return format_html(
             '<span style="background:{};color:#000;padding:2px 8px;border-radius:12px;font-size:11px;font-weight:700">{}</span>',
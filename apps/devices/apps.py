@@ -5,3 +5,6 @@ class DevicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.devices'
     verbose_name = 'دستگاه‌ها'
+
+    def ready(self):
+        from apps.devices import signals  # noqa: F401
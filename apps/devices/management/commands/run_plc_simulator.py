@@ -0,0 +1,107 @@
+"""
+python manage.py run_plc_simulator
+
+سرور شبیه‌ساز Modbus: صدها PLC COTRUST روی TCP (localhost) و RTU (pty)
+برای تست و بنچمارک کامل پشته درایور بدون سخت‌افزار
+
+    # ۲۰۰ PLC روی پورت‌های 15020..15219
+    python manage.py run_plc_simulator --devices 200
+
+    # Gateway: ۴ پورت × ۵۰ unit ID + ۸ slave روی یک خط RS485 مجازی
+    python manage.py run_plc_simulator --devices 200 --units-per-port 50 --rtu-units 8
+
+    # ساخت/به‌روزرسانی رکورد Device برای هر PLC (سپس: start_polling)
+    python manage.py run_plc_simulator --devices 200 --create-devices
+"""
+import asyncio
+import time
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'شبیه‌ساز Modbus TCP/RTU با N PLC مجازی'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--devices', type=int, default=10, help='تعداد PLC روی TCP')
+        parser.add_argument('--base-port', type=int, default=15020)
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--units-per-port', type=int, default=1, help='بیش از 1 = حالت Gateway')
+        parser.add_argument('--rtu-units', type=int, default=0, help='تعداد slave روی pty')
+        parser.add_argument('--tick', type=float, default=1.0, help='گام مدل فاز (ثانیه)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--auto-cycle', type=float, default=None,
+                            help='میانگین زمان idle قبل از شروع خودکار سیکل (ثانیه)')
+        parser.add_argument('--delay-ms', type=float, default=0.0, help='تأخیر پاسخ (scan time PLC)')
+        parser.add_argument('--create-devices', action='store_true')
+
+    def handle(self, *args, **options):
+        from core.modbus_sim_server import PLCSimulatorServer
+
+        server = PLCSimulatorServer(
+            devices=options['devices'],
+            base_port=options['base_port'],
+            host=options['host'],
+            units_per_port=options['units_per_port'],
+            rtu_units=options['rtu_units'],
+            tick_seconds=options['tick'],
+            seed=options['seed'],
+            auto_cycle_seconds=options['auto_cycle'],
+            response_delay=options['delay_ms'] / 1000,
+        )
+        try:
+            asyncio.run(self._run(server, options))
+        except KeyboardInterrupt:
+            self.stdout.write('\n⏹ شبیه‌ساز متوقف شد')
+
+    async def _run(self, server, options):
+        await server.start()
+        self.stdout.write(f'\n🎮 {len(server.plcs)} PLC شبیه‌سازی‌شده آماده است')
+        if server.tcp_plcs:
+            ports = sorted(server.tcp_plcs)
+            self.stdout.write(f'  🌐 TCP: {server.host}:{ports[0]}..{ports[-1]}')
+        if server.rtu_port:
+            self.stdout.write(f'  📡 RTU: {server.rtu_port} (slave 1..{len(server.rtu_plcs)})')
+
+        if options['create_devices']:
+            from asgiref.sync import sync_to_async
+            created = await sync_to_async(self._create_devices)(server)
+            self.stdout.write(f'  ✅ {created} دستگاه ساخته/به‌روزرسانی شد — حالا: python manage.py start_polling')
+
+        self.stdout.write('Ctrl+C برای توقف\n\n')
+        last_requests, last_time = 0, time.monotonic()
+        while True:
+            await asyncio.sleep(10)
+            now, requests = time.monotonic(), server.requests
+            rate = (requests - last_requests) / (now - last_time)
+            last_requests, last_time = requests, now
+            self.stdout.write(f'\r  {requests:,} درخواست — {rate:,.0f} req/s  ', ending='')
+            self.stdout.flush()
+
+    def _create_devices(self, server) -> int:
+        from apps.devices.models import Device
+
+        count = 0
+        for port, units in server.tcp_plcs.items():
+            for unit_id in units:
+                serial = f'SIM-TCP-{port}-{unit_id}'
+                Device.objects.update_or_create(serial_number=serial, defaults={
+                    'name': f'PLC شبیه‌ساز {port}/{unit_id}',
+                    'device_type': 'autoclave',
+                    'connection_type': 'tcp',
+                    'plc_ip': server.host,
+                    'plc_port': port,
+                    'modbus_slave_id': unit_id,
+                    'manufacturer': 'COTRUST (sim)',
+                })
+                count += 1
+        for unit_id in server.rtu_plcs:
+            Device.objects.update_or_create(serial_number=f'SIM-RTU-{unit_id}', defaults={
+                'name': f'PLC شبیه‌ساز RS485/{unit_id}',
+                'device_type': 'autoclave',
+                'connection_type': 'rtu',
+                'serial_port': server.rtu_port,
+                'modbus_slave_id': unit_id,
+                'manufacturer': 'COTRUST (sim)',
+            })
+            count += 1
+        return count
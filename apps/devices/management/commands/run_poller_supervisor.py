@@ -0,0 +1,90 @@
+"""
+python manage.py run_poller_supervisor
+
+اجرای polling روی چند پروسه (core.poller_supervisor) به جای start_polling:
+دستگاه‌ها بین workerها تقسیم می‌شوند، worker از کار افتاده دوباره
+راه‌اندازی می‌شود و تغییرات Device (پنل تنظیم PLC، فعال/غیرفعال کردن)
+حداکثر بعد از PLC_RELOAD_SECONDS اعمال می‌شوند — بدون restart.
+متریک‌های ادغام‌شده همه workerها روی PLC_METRICS_PORT (/metrics) سرو می‌شوند.
+
+    python manage.py run_poller_supervisor --workers 8
+"""
+import time
+import signal
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'polling چندپروسه‌ای با بارگذاری مجدد خودکار تنظیمات دستگاه‌ها'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.PLC_WORKERS,
+                            help='تعداد پروسه worker (۰ = تعداد هسته‌ها)')
+        parser.add_argument('--reload-seconds', type=float, default=settings.PLC_RELOAD_SECONDS,
+                            help='فاصله بررسی تغییرات دستگاه‌ها')
+        parser.add_argument('--report-seconds', type=float, default=30, help='فاصله چاپ بار workerها')
+        parser.add_argument('--metrics-port', type=int, default=settings.PLC_METRICS_PORT,
+                            help='پورت HTTP متریک‌های Prometheus (۰ = غیرفعال)')
+        parser.add_argument('--metrics-host', default=settings.PLC_METRICS_HOST,
+                            help='آدرس bind سرور متریک (پیش‌فرض فقط localhost)')
+
+    def handle(self, *args, **options):
+        from core.poller_supervisor import PollerSupervisor
+
+        supervisor = PollerSupervisor(
+            workers=options['workers'] or None,
+            reload_seconds=options['reload_seconds'],
+        )
+        supervisor.start()
+        self.stdout.write(
+            f'\n🧩 {supervisor.count} worker polling شروع شد — '
+            f'بررسی تغییرات دستگاه‌ها هر {options["reload_seconds"]:g} ثانیه\n'
+        )
+        if options['metrics_port']:
+            from core.metrics import start_metrics_server
+            server = start_metrics_server(options['metrics_port'], host=options['metrics_host'],
+                                          source=supervisor.metrics)
+            self.stdout.write(f'📈 متریک‌ها: http://{options["metrics_host"]}:{options["metrics_port"]}/metrics\n')
+        else:
+            server = None
+        self.stdout.write('Ctrl+C برای توقف\n\n')
+
+        stopping = []
+
+        def handle_signal(sig, frame):
+            stopping.append(sig)
+
+        signal.signal(signal.SIGINT, handle_signal)
+        signal.signal(signal.SIGTERM, handle_signal)
+
+        last_report = time.monotonic()
+        while not stopping:
+            supervisor.check()
+            if time.monotonic() - last_report >= options['report_seconds']:
+                last_report = time.monotonic()
+                self._report(supervisor)
+            time.sleep(1)
+
+        self.stdout.write('\n⏹ توقف workerها...')
+        if server is not None:
+            server.shutdown()
+        supervisor.stop()
+        self.stdout.write(self.style.SUCCESS('✅ همه workerها متوقف شدند'))
+
+    def _report(self, supervisor):
+        loads = supervisor.loads()
+        total = sum(load['pollers'] for load in loads.values())
+        self.stdout.write(
+            f'\n📊 {supervisor.alive()}/{supervisor.count} worker زنده — {total} دستگاه — '
+            f'{supervisor.restarts} راه‌اندازی مجدد'
+        )
+        for index, load in loads.items():
+            self.stdout.write(
+                f'  worker {index} (pid {load["pid"]}): {load["pollers"]} دستگاه، '
+                f'{load["polls_per_second"]:g} poll/s، CPU {load["cpu_pct"]:.0f}%، '
+                f'{load["rss_mb"]:.0f}MB، {load["unreachable"]} بدون پاسخ، '
+                f'تأخیر poll p95 {load["late_p95_ms"]:.0f}ms ({load["skipped"]:,} نوبت رد شده)، '
+                f'ذخیره {load["written"]:,} ({load["pending"]:,} در صف، {load["spool_backlog"]:,} در spool با '
+                f'تأخیر {load["spool_lag_s"]:.0f}s)، WebSocket {load["ws_pending"]:,} در صف'
+            )
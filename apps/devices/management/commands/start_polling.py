@@ -7,6 +7,7 @@ python manage.py start_polling
 import time
 import signal
 import logging
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from apps.devices.models import Device
 
@@ -18,9 +19,18 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument('--device-id', type=int, help='فقط یک دستگاه خاص')
+        parser.add_argument('--metrics-port', type=int, default=settings.PLC_METRICS_PORT,
+                            help='پورت HTTP متریک‌های Prometheus (۰ = غیرفعال)')
+        parser.add_argument('--metrics-host', default=settings.PLC_METRICS_HOST,
+                            help='آدرس bind سرور متریک (پیش‌فرض فقط localhost)')
 
     def handle(self, *args, **options):
-        from core.plc_driver import start_polling, stop_polling, get_all_pollers
+        from core.plc_driver import start_polling, stop_polling, get_all_pollers, get_poller_states
+        from core.plc_commands import command_latency
+        from core.bulk_writer import get_bulk_writer
+        from core.status_cache import get_status_cache
+        from core.ws_publisher import get_publisher
+        from core.poll_scheduler import get_scheduler
 
         devices = Device.objects.filter(is_active=True)
         if options['device_id']:
@@ -36,12 +46,19 @@ class Command(BaseCommand):
             )
 
         self.stdout.write('\n✅ همه دستگاه‌ها در حال polling هستند\n')
+        if options['metrics_port']:
+            from core.metrics import start_metrics_server
+            start_metrics_server(options['metrics_port'], host=options['metrics_host'])
+            self.stdout.write(f'📈 متریک‌ها: http://{options["metrics_host"]}:{options["metrics_port"]}/metrics\n')
         self.stdout.write('Ctrl+C برای توقف\n\n')
 
         def handle_signal(sig, frame):
             self.stdout.write('\n⏹ توقف polling...')
             for device in devices:
                 stop_polling(device.pk)
+            get_bulk_writer().stop()
+            get_status_cache().stop()
+            get_publisher().stop()
             exit(0)
 
         signal.signal(signal.SIGINT, handle_signal)
@@ -51,5 +68,17 @@ class Command(BaseCommand):
         while True:
             pollers = get_all_pollers()
             active = len(pollers)
-            self.stdout.write(f'\r  {active} دستگاه در حال polling  ', ending='')
+            unreachable = sum(1 for state in get_poller_states().values() if state != 'closed')
+            latency = command_latency.summary()
+            commands = f" — فرمان p95: {latency['p95_ms']:.0f}ms" if latency['count'] else ''
+            schedule = get_scheduler().stats()
+            lateness = f" — تأخیر poll p95: {schedule['p95_ms']:.0f}ms" if schedule['count'] else ''
+            writer = get_bulk_writer().stats()
+            spool = writer.get('spool')
+            spooled = f'، {spool["backlog_rows"]:,} در spool (تأخیر {spool["lag_seconds"]:.0f}s)' if spool and spool['backlog_rows'] else ''
+            self.stdout.write(
+                f'\r  {active} دستگاه در حال polling — {unreachable} بدون پاسخ (backoff){lateness}{commands}'
+                f' — ذخیره: {writer["written"]:,} ردیف، {writer["pending"]:,} در صف{spooled}'
+                f' — WebSocket: {get_publisher().pending:,} در صف  ', ending=''
+            )
             time.sleep(10)
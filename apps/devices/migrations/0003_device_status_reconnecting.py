@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0002_alter_department_options_alter_device_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='device',
+            name='status',
+            field=models.CharField(choices=[('online', 'آنلاین'), ('offline', 'آفلاین'), ('error', 'خطا'), ('maintenance', 'در سرویس'), ('reconnecting', 'در حال اتصال مجدد')], default='offline', max_length=20, verbose_name='وضعیت'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0003_device_status_reconnecting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceRegister',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_field', models.CharField(help_text='مثلاً temperature_c — نام\u200cهای دیگر در extras قرار می\u200cگیرند', max_length=50, verbose_name='فیلد مقصد')),
+                ('area', models.CharField(choices=[('holding', 'Holding Register (FC03)'), ('coil', 'Coil (FC01)')], default='holding', max_length=10, verbose_name='ناحیه')),
+                ('address', models.PositiveIntegerField(verbose_name='آدرس')),
+                ('data_type', models.CharField(choices=[('u16', 'UINT16'), ('s16', 'INT16'), ('u32', 'UINT32'), ('float32', 'FLOAT32')], default='u16', max_length=10, verbose_name='نوع داده')),
+                ('scale', models.FloatField(default=1.0, help_text='مقدار = خام ÷ ضریب (مثلاً 10 برای °C × 10)', verbose_name='ضریب')),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='registers', to='devices.device')),
+            ],
+            options={
+                'verbose_name': 'رجیستر PLC',
+                'verbose_name_plural': 'نقشه رجیستر PLC',
+                'ordering': ['area', 'address'],
+                'unique_together': {('device', 'target_field')},
+            },
+        ),
+    ]
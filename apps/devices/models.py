@@ -12,7 +12,8 @@ class Department(models.Model):
 
 class Device(models.Model):
     DEVICE_TYPES = [('autoclave', 'اتوکلاو'), ('incinerator', 'زباله‌سوز')]
-    STATUS_CHOICES = [('online', 'آنلاین'), ('offline', 'آفلاین'), ('error', 'خطا'), ('maintenance', 'در سرویس')]
+    STATUS_CHOICES = [('online', 'آنلاین'), ('offline', 'آفلاین'), ('error', 'خطا'), ('maintenance', 'در سرویس'),
+                      ('reconnecting', 'در حال اتصال مجدد')]
     CONNECTION_TYPES = [('sim', 'شبیه‌ساز (تست)'), ('rtu', 'Modbus RTU — RS485'), ('tcp', 'Modbus TCP — Ethernet')]
 
     # اطلاعات پایه
@@ -70,6 +71,27 @@ class Device(models.Model):
         return dict(self.DEVICE_TYPES).get(self.device_type, self.device_type)
 
 
+class DeviceRegister(models.Model):
+    """نقشه رجیستر PLC — دستگاه بدون ردیف از نقشه پیش‌فرض D0..D11 استفاده می‌کند (core.register_map)"""
+    AREAS = [('holding', 'Holding Register (FC03)'), ('coil', 'Coil (FC01)')]
+    DATA_TYPES = [('u16', 'UINT16'), ('s16', 'INT16'), ('u32', 'UINT32'), ('float32', 'FLOAT32')]
+
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='registers')
+    target_field = models.CharField(max_length=50, verbose_name="فیلد مقصد",
+                                    help_text="مثلاً temperature_c — نام‌های دیگر در extras قرار می‌گیرند")
+    area = models.CharField(max_length=10, choices=AREAS, default='holding', verbose_name="ناحیه")
+    address = models.PositiveIntegerField(verbose_name="آدرس")
+    data_type = models.CharField(max_length=10, choices=DATA_TYPES, default='u16', verbose_name="نوع داده")
+    scale = models.FloatField(default=1.0, verbose_name="ضریب", help_text="مقدار = خام ÷ ضریب (مثلاً 10 برای °C × 10)")
+
+    class Meta:
+        verbose_name = "رجیستر PLC"; verbose_name_plural = "نقشه رجیستر PLC"; ordering = ['area', 'address']
+        unique_together = [('device', 'target_field')]
+
+    def __str__(self):
+        return f"{self.device.name} — {self.target_field} @ {self.address}"
+
+
 class DeviceCycle(models.Model):
     STATUS_CHOICES = [
         ('idle', 'آماده'), ('heating', 'گرمایش'), ('sterilizing', 'استریل'),
@@ -0,0 +1,28 @@
+"""
+هم‌گام نگه داشتن DeviceStateTracker (core/device_state.py) با تغییرات مدل
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.devices.models import Device, DeviceCycle
+from core.device_state import get_device_tracker
+
+
+@receiver(post_save, sender=Device)
+def device_saved(sender, instance, **kwargs):
+    get_device_tracker().device_saved(instance)
+
+
+@receiver(post_delete, sender=Device)
+def device_deleted(sender, instance, **kwargs):
+    get_device_tracker().device_deleted(instance)
+
+
+@receiver(post_save, sender=DeviceCycle)
+def cycle_saved(sender, instance, **kwargs):
+    get_device_tracker().cycle_saved(instance)
+
+
+@receiver(post_delete, sender=DeviceCycle)
+def cycle_deleted(sender, instance, **kwargs):
+    get_device_tracker().cycle_deleted(instance)
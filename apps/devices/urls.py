@@ -6,5 +6,6 @@ urlpatterns = [
     path('<int:device_id>/plc-config/', views.plc_config, name='plc_config'),
     path('<int:device_id>/plc-test/', views.plc_test, name='plc_test'),
     path('plc-registers/', views.plc_registers, name='plc_registers'),
+    path('plc-metrics/', views.plc_metrics, name='plc_metrics'),
     path('maintenance/', views.maintenance_log, name='maintenance_log_list'),
 ]
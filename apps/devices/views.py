@@ -1,5 +1,7 @@
 from django.shortcuts import render, get_object_or_404, redirect
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.http import JsonResponse
 from .models import Device, DeviceCycle, Department, MaintenanceLog
 
@@ -95,3 +97,51 @@ def plc_registers(request):
         'registers_data': registers_data,
         'title': 'تنظیم رجیسترها',
     })
+
+
+@staff_member_required
+def plc_metrics(request):
+    """تله‌متری poller: تأخیر هر دستگاه، خطاها و بهره‌وری باس‌ها (از /metrics.json پروسه polling)"""
+    import requests
+    from core.metrics import quantile
+
+    try:
+        response = requests.get(settings.PLC_METRICS_URL, timeout=2)
+        response.raise_for_status()
+        snapshot = response.json()
+        error = None
+    except Exception as e:
+        snapshot, error = {'devices': {}, 'buses': {}}, str(e)
+
+    names = Device.objects.in_bulk([int(pk) for pk in snapshot['devices'] if pk.isdigit()])
+    rows = []
+    for pk, data in snapshot['devices'].items():
+        request_p50, request_p95 = quantile(data['request'], 0.5), quantile(data['request'], 0.95)
+        poll_p95 = quantile(data['poll'], 0.95)
+        device = names.get(int(pk)) if pk.isdigit() else None
+        rows.append({
+            'device': device,
+            'device_id': pk,
+            'bus': data['bus'],
+            'request_p50_ms': request_p50 * 1000 if request_p50 is not None else None,
+            'request_p95_ms': request_p95 * 1000 if request_p95 is not None else None,
+            'poll_p95_ms': poll_p95 * 1000 if poll_p95 is not None else None,
+            'polls_per_second': data['polls_per_second'],
+            'polls_ok': data['polls_ok'],
+            'polls_failed': data['polls_failed'],
+            'reconnects': data['reconnects'],
+            'errors': {kind: count for kind, count in data['errors'].items() if count},
+        })
+    rows.sort(key=lambda row: row['request_p95_ms'] or 0, reverse=True)
+
+    buses = [
+        {'name': name, 'utilization_pct': data['utilization'] * 100, **data}
+        for name, data in sorted(snapshot['buses'].items())
+    ]
+    return render(request, 'devices/plc_metrics.html', {
+        'rows': rows,
+        'buses': buses,
+        'error': error,
+        'metrics_url': settings.PLC_METRICS_URL,
+        'title': 'تله‌متری PLC',
+    })
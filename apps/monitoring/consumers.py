@@ -1,4 +1,5 @@
 import json
+import time
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 
@@ -36,9 +37,48 @@ class DeviceConsumer(AsyncWebsocketConsumer):
                 history = await self.get_reading_history()
                 await self.send(text_data=json.dumps({'type': 'history', 'data': history}))
 
+            elif action == 'command':
+                await self.send_command(data)
+
         except json.JSONDecodeError:
             pass
 
+    async def send_command(self, data):
+        """فرمان PLC (شروع/توقف/ریست هشدار) → پروسه polling مالک دستگاه"""
+        from core.plc_commands import COMMANDS, command_group
+
+        command = data.get('command')
+        request_id = data.get('request_id')
+        if command not in COMMANDS:
+            await self.send_command_error(request_id, command, 'فرمان نامعتبر')
+            return
+        if not await self.can_control_device():
+            await self.send_command_error(request_id, command, 'دسترسی ارسال فرمان ندارید')
+            return
+
+        await self.channel_layer.group_send(command_group(self.device_id), {
+            'type': 'plc.command',
+            'device_id': int(self.device_id),
+            'command': command,
+            'request_id': request_id,
+            'reply_channel': self.channel_name,
+            'sent_at': time.time(),
+            'user': self.scope['user'].username,
+        })
+
+    async def send_command_error(self, request_id, command, error):
+        await self.send(text_data=json.dumps({
+            'type': 'command_result',
+            'data': {'request_id': request_id, 'command': command, 'success': False, 'error': error},
+        }))
+
+    async def command_result(self, event):
+        """نتیجه فرمان از پروسه polling"""
+        await self.send(text_data=json.dumps({
+            'type': 'command_result',
+            'data': {k: v for k, v in event.items() if k != 'type'},
+        }))
+
     async def sensor_update(self, event):
         """ارسال داده سنسور جدید به مرورگر"""
         await self.send(text_data=json.dumps({
@@ -53,6 +93,10 @@ class DeviceConsumer(AsyncWebsocketConsumer):
             'data': event['data'],
         }))
 
+    @database_sync_to_async
+    def can_control_device(self):
+        return self.scope['user'].has_perm('devices.change_device')
+
     @database_sync_to_async
     def get_latest_reading(self):
         from apps.monitoring.models import SensorReading
@@ -0,0 +1,88 @@
+"""
+python manage.py run_mqtt_consumer
+
+دریافت داده سنسورها روی چند پروسه (core.mqtt_consumer) به جای تک thread
+start_mqtt_listener: سریال دستگاه‌ها بین workerها تقسیم می‌شود و هر worker
+topic دستگاه‌های خود را با shared subscription (MQTT v5) دریافت می‌کند؛
+ترتیب پیام‌های هر دستگاه حفظ می‌شود. دستگاه جدید/غیرفعال‌شده حداکثر بعد
+از MQTT_RELOAD_SECONDS subscribe/unsubscribe می‌شود.
+
+    python manage.py run_mqtt_consumer --workers 8
+"""
+import time
+import signal
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'مصرف‌کننده چندپروسه‌ای MQTT با shared subscription'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.MQTT_CONSUMER_WORKERS,
+                            help='تعداد پروسه worker (۰ = تعداد هسته‌ها)')
+        parser.add_argument('--group', default=settings.MQTT_SHARED_GROUP,
+                            help='نام گروه shared subscription')
+        parser.add_argument('--reload-seconds', type=float, default=settings.MQTT_RELOAD_SECONDS,
+                            help='فاصله بررسی دستگاه‌های جدید/غیرفعال')
+        parser.add_argument('--report-seconds', type=float, default=30, help='فاصله چاپ بار workerها')
+
+    def handle(self, *args, **options):
+        from core.mqtt_consumer import MqttConsumerSupervisor
+
+        supervisor = MqttConsumerSupervisor(
+            workers=options['workers'] or None,
+            reload_seconds=options['reload_seconds'],
+            group=options['group'],
+        )
+        supervisor.start()
+        self.stdout.write(
+            f'\n📡 {supervisor.count} مصرف‌کننده MQTT شروع شد — '
+            f'{settings.MQTT_BROKER_HOST}:{settings.MQTT_BROKER_PORT}، group {options["group"]}\n'
+        )
+        self.stdout.write('Ctrl+C برای توقف\n\n')
+
+        stopping = []
+
+        def handle_signal(sig, frame):
+            stopping.append(sig)
+
+        signal.signal(signal.SIGINT, handle_signal)
+        signal.signal(signal.SIGTERM, handle_signal)
+
+        last_report = time.monotonic()
+        while not stopping:
+            supervisor.check()
+            if time.monotonic() - last_report >= options['report_seconds']:
+                last_report = time.monotonic()
+                self._report(supervisor)
+            time.sleep(1)
+
+        self.stdout.write('\n⏹ توقف workerها...')
+        supervisor.stop()
+        self.stdout.write(self.style.SUCCESS('✅ همه workerها متوقف شدند'))
+
+    def _report(self, supervisor):
+        loads = supervisor.loads()
+        total = sum(load['messages_per_second'] for load in loads.values())
+        self.stdout.write(
+            f'\n📊 {supervisor.alive()}/{supervisor.count} worker زنده — {total:,.0f} پیام/ثانیه — '
+            f'{supervisor.restarts} راه‌اندازی مجدد'
+        )
+        for index, load in loads.items():
+            self.stdout.write(
+                f'  worker {index} (pid {load["pid"]}): {"متصل" if load["connected"] else "قطع"}، '
+                f'{load["devices"]} دستگاه ({load["topics"]} topic)، {load["messages_per_second"]:,.0f} پیام/ثانیه، '
+                f'CPU {load["cpu_pct"]:.0f}%، {load["rss_mb"]:.0f}MB، '
+                f'صف {load["pipeline_pending"]:,} ({load["pipeline_rejected"]:,} رد شده)، '
+                f'نامعتبر {load["pipeline_invalid"] + load["decode_errors"]:,}، '
+                f'ذخیره {load["written"]:,} ({load["pending"]:,} در صف، {load["spool_backlog"]:,} در spool)، '
+                f'WebSocket {load["ws_pending"]:,} در صف'
+            )
+            rejected = ', '.join(
+                f'{device_type}.{key} {count:,}'
+                for device_type, stats in load['pipeline_rejections'].items()
+                for key, count in stats['rejected'].items()
+            )
+            if rejected:
+                self.stdout.write(f'    خارج از محدوده: {rejected}')
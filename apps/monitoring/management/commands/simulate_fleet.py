@@ -0,0 +1,169 @@
+"""
+python manage.py simulate_fleet
+
+تولید بار واقع‌گرایانه چندساعته از ناوگان شبیه‌سازی‌شده (core.fleet_simulator)
+برای برنامه‌ریزی ظرفیت: دیتابیس، MQTT یا فقط اندازه‌گیری نرخ تولید
+
+    # ۴ ساعت داده ۵۵۰۰ دستگاه با گام ۵ ثانیه، با حداکثر سرعت، مستقیم در SensorReading
+    python manage.py simulate_fleet --autoclaves 5000 --incinerators 500 --hours 4 --output db --create-devices
+
+    # انتشار روی MQTT با سرعت واقعی (هر dt ثانیه یک خوانش برای هر دستگاه)
+    python manage.py simulate_fleet --autoclaves 1000 --output mqtt --realtime --create-devices
+
+    # همان، با payload باینری v1 (core.mqtt_codec) به جای JSON
+    python manage.py simulate_fleet --autoclaves 1000 --output mqtt --format binary --realtime
+
+    # gateway با بافر: هر دستگاه یک پیام دسته‌ای برای هر ۷۲۰ tick (یک ساعت با گام ۵ ثانیه)
+    python manage.py simulate_fleet --autoclaves 100 --output mqtt --gateway-ticks 720
+"""
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'شبیه‌ساز برداری ناوگان اتوکلاو/زباله‌سوز (NumPy)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--autoclaves', type=int, default=100)
+        parser.add_argument('--incinerators', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--dt', type=float, default=5.0, help='فاصله خوانش‌ها (ثانیه شبیه‌سازی‌شده)')
+        parser.add_argument('--hours', type=float, default=1.0, help='مدت شبیه‌سازی')
+        parser.add_argument('--output', choices=['none', 'db', 'mqtt'], default='none')
+        parser.add_argument('--realtime', action='store_true',
+                            help='هر tick به اندازه dt صبر کند (پیش‌فرض: با حداکثر سرعت، زمان‌ها تا الان)')
+        parser.add_argument('--format', choices=['json', 'binary'], default='json',
+                            help='قالب payload در --output mqtt')
+        parser.add_argument('--gateway-ticks', type=int, default=1,
+                            help='هر N tick خوانش‌های هر دستگاه در یک پیام دسته‌ای منتشر شوند (فقط JSON)')
+        parser.add_argument('--create-devices', action='store_true')
+        parser.add_argument('--prefix', default='FLEET', help='پیشوند سریال دستگاه‌ها')
+
+    def handle(self, *args, **options):
+        try:
+            from core.fleet_simulator import FleetSimulator
+        except ImportError:
+            raise CommandError('NumPy نصب نیست — pip install numpy')
+
+        autoclaves, incinerators = options['autoclaves'], options['incinerators']
+        prefix, dt, output = options['prefix'], options['dt'], options['output']
+        gateway_ticks = options['gateway_ticks']
+        if gateway_ticks > 1 and options['format'] == 'binary':
+            raise CommandError('پیام دسته‌ای gateway فقط با --format json')
+        serials = (
+            [f'{prefix}-AC-{i:05d}' for i in range(1, autoclaves + 1)]
+            + [f'{prefix}-IN-{i:05d}' for i in range(1, incinerators + 1)]
+        )
+        if options['create_devices']:
+            self._create_devices(serials, autoclaves)
+        device_ids = self._device_ids(serials) if output == 'db' else None
+
+        ticks = int(options['hours'] * 3600 / dt)
+        start = None if options['realtime'] else time.time() - ticks * dt
+        fleet = FleetSimulator(
+            autoclaves=autoclaves, incinerators=incinerators, seed=options['seed'],
+            start=start, device_ids=device_ids, serials=serials,
+        )
+        publish = self._publisher(output, options['format'], autoclaves)
+
+        self.stdout.write(
+            f'\n🏭 {fleet.size:,} دستگاه × {ticks:,} tick ({dt:g}s) = {fleet.size * ticks:,} خوانش → {output}\n'
+        )
+        started = time.monotonic()
+        rows = 0
+        buffered = {}
+        try:
+            for tick in range(1, ticks + 1):
+                tick_started = time.monotonic()
+                fleet.step(dt)
+                columns = fleet.columns()
+                if output == 'db':
+                    fleet.batch(columns).insert()
+                elif output == 'mqtt' and gateway_ticks > 1:
+                    for serial, payload in fleet.payloads(columns):
+                        del payload['device_id']
+                        buffered.setdefault(serial, []).append(payload)
+                    if tick % gateway_ticks == 0 or tick == ticks:
+                        for index, serial in enumerate(fleet.serials):
+                            publish(index, serial, {'device_id': serial, 'readings': buffered.pop(serial)})
+                elif output == 'mqtt':
+                    for index, (serial, payload) in enumerate(fleet.payloads(columns)):
+                        publish(index, serial, payload)
+                rows += fleet.size
+
+                if tick % 100 == 0 or tick == ticks:
+                    elapsed = time.monotonic() - started
+                    self.stdout.write(
+                        f'\r  {tick:,}/{ticks:,} tick — {rows:,} خوانش — {rows / elapsed:,.0f} خوانش/ثانیه  ',
+                        ending='',
+                    )
+                    self.stdout.flush()
+                if options['realtime']:
+                    time.sleep(max(0.0, dt - (time.monotonic() - tick_started)))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if output == 'mqtt':
+                publish.client.loop_stop()
+                publish.client.disconnect()
+
+        self.stdout.write(f'\n\n✅ {rows:,} خوانش در {time.monotonic() - started:.1f} ثانیه\n')
+
+    def _create_devices(self, serials, autoclaves):
+        from apps.devices.models import Device
+
+        devices = [
+            Device(
+                name=f'ناوگان شبیه‌ساز {serial}',
+                serial_number=serial,
+                device_type='autoclave' if i < autoclaves else 'incinerator',
+                connection_type='sim',
+                manufacturer='Fleet Simulator',
+            )
+            for i, serial in enumerate(serials)
+        ]
+        Device.objects.bulk_create(devices, batch_size=1000, ignore_conflicts=True)
+        self.stdout.write(f'  ✅ {len(devices):,} دستگاه ساخته شد (یا از قبل وجود داشت)')
+
+    def _device_ids(self, serials):
+        from apps.devices.models import Device
+
+        pk_by_serial = dict(Device.objects.filter(serial_number__in=serials).values_list('serial_number', 'pk'))
+        missing = len(serials) - len(pk_by_serial)
+        if missing:
+            raise CommandError(f'{missing:,} دستگاه در دیتابیس نیست — با --create-devices اجرا کنید')
+        return [pk_by_serial[serial] for serial in serials]
+
+    def _publisher(self, output, payload_format, autoclaves):
+        if output != 'mqtt':
+            return None
+        try:
+            import paho.mqtt.client as mqtt
+        except ImportError:
+            raise CommandError('paho-mqtt نصب نشده')
+        from django.conf import settings
+
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id='fleet_simulator')
+        if settings.MQTT_USERNAME:
+            client.username_pw_set(settings.MQTT_USERNAME, settings.MQTT_PASSWORD)
+        try:
+            client.connect(settings.MQTT_BROKER_HOST, settings.MQTT_BROKER_PORT, 60)
+        except OSError as e:
+            raise CommandError(f'اتصال به MQTT Broker ناموفق: {e}')
+        client.loop_start()
+
+        if payload_format == 'binary':
+            from core.mqtt_codec import encode_binary
+
+            def encode(index, payload):
+                return encode_binary(payload, 'autoclave' if index < autoclaves else 'incinerator')
+        else:
+            def encode(index, payload):
+                return json.dumps(payload)
+
+        def publish(index, serial, payload):
+            client.publish(f'{settings.MQTT_TOPIC_PREFIX}/{serial}/data', encode(index, payload))
+
+        publish.client = client
+        return publish
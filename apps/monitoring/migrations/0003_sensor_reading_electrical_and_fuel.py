@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0002_rename_monitoring_device_ts_idx_monitoring__device__2f9b5e_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensorreading',
+            name='current_a',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sensorreading',
+            name='fuel_flow_lh',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sensorreading',
+            name='post_combustion_temp_c',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sensorreading',
+            name='voltage_v',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -17,14 +17,18 @@ class SensorReading(models.Model):
 
     # زباله‌سوز
     combustion_temp_c = models.FloatField(null=True, blank=True)
+    post_combustion_temp_c = models.FloatField(null=True, blank=True)
     exhaust_temp_c = models.FloatField(null=True, blank=True)
     co_ppm = models.FloatField(null=True, blank=True)
     nox_ppm = models.FloatField(null=True, blank=True)
     so2_ppm = models.FloatField(null=True, blank=True)
     co2_ppm = models.FloatField(null=True, blank=True)
+    fuel_flow_lh = models.FloatField(null=True, blank=True)
 
     # مشترک
     power_consumption_kw = models.FloatField(null=True, blank=True)
+    voltage_v = models.FloatField(null=True, blank=True)
+    current_a = models.FloatField(null=True, blank=True)
     device_status = models.CharField(max_length=20, default='idle')
 
     class Meta:
@@ -0,0 +1,150 @@
+"""
+بنچمارک end-to-end پشته درایور روی شبیه‌ساز Modbus (بدون سخت‌افزار)
+
+    python benchmarks/bench_driver_e2e.py [--devices 200] [--seconds 5] [--delay-ms 0]
+
+PLCSimulatorServer در همین پروسه (thread جدا) اجرا می‌شود و سه مسیر
+اندازه‌گیری می‌شوند:
+
+- sync:  CotrustModbusTCP، یک thread به ازای هر دستگاه (مثل PLCPollingService)
+- async: AsyncCotrustModbusTCP، همه دستگاه‌ها روی یک event loop
+- rtu:   CotrustModbusRTU، slaveها روی یک خط RS485 مجازی (pty)
+
+خروجی: poll در ثانیه و p50/p99 زمان هر poll.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from core.modbus_async import AsyncCotrustModbusTCP  # noqa: E402
+from core.modbus_sim_server import PLCSimulatorServer  # noqa: E402
+from core.plc_driver import CotrustModbusRTU, CotrustModbusTCP  # noqa: E402
+
+
+def _report(label, latencies, elapsed):
+    latencies.sort()
+    if not latencies:
+        print(f"  {label:<6} هیچ poll موفقی نبود")
+        return
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"  {label:<6} {len(latencies) / elapsed:10,.0f} poll/s   p50 {p50:6.2f}ms   p99 {p99:6.2f}ms")
+
+
+def bench_sync(server, seconds):
+    latencies, lock = [], threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def worker(port, unit_id):
+        driver = CotrustModbusTCP(server.host, port, slave_id=unit_id)
+        driver.connect()
+        local = []
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            if driver.read() is not None:
+                local.append(time.perf_counter() - start)
+        driver.disconnect()
+        with lock:
+            latencies.extend(local)
+
+    threads = [
+        threading.Thread(target=worker, args=(port, unit_id))
+        for port, units in server.tcp_plcs.items() for unit_id in units
+    ]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    _report("sync", latencies, time.monotonic() - started)
+
+
+def bench_async(server, seconds):
+    latencies = []
+
+    async def worker(driver, deadline):
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            if await driver.read() is not None:
+                latencies.append(time.perf_counter() - start)
+
+    async def run():
+        drivers = [
+            AsyncCotrustModbusTCP(server.host, port, slave_id=unit_id)
+            for port, units in server.tcp_plcs.items() for unit_id in units
+        ]
+        await asyncio.gather(*(d.connect() for d in drivers))
+        started = time.monotonic()
+        await asyncio.gather(*(worker(d, started + seconds) for d in drivers))
+        elapsed = time.monotonic() - started
+        await asyncio.gather(*(d.disconnect() for d in drivers))
+        return elapsed
+
+    _report("async", latencies, asyncio.run(run()))
+
+
+def bench_rtu(server, seconds):
+    latencies, lock = [], threading.Lock()
+    deadline = time.monotonic() + seconds
+    drivers = [CotrustModbusRTU(server.rtu_port, slave_id=unit_id) for unit_id in server.rtu_plcs]
+
+    def worker(driver):
+        driver.connect()
+        local = []
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            if driver.read() is not None:
+                local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(d,)) for d in drivers]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for driver in drivers:
+        driver.disconnect()
+    _report("rtu", latencies, time.monotonic() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--devices', type=int, default=200)
+    parser.add_argument('--rtu-units', type=int, default=8)
+    parser.add_argument('--base-port', type=int, default=25020)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--delay-ms', type=float, default=0.0, help='scan time شبیه‌سازی‌شده PLC')
+    args = parser.parse_args()
+
+    server = PLCSimulatorServer(
+        devices=args.devices, base_port=args.base_port, rtu_units=args.rtu_units,
+        response_delay=args.delay_ms / 1000,
+    )
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result()
+
+    print(f"\nدرایور end-to-end — {args.devices} PLC TCP، {args.rtu_units} slave RTU، {args.seconds:g}s\n")
+    bench_sync(server, args.seconds)
+    bench_async(server, args.seconds)
+    if server.rtu_port:
+        bench_rtu(server, args.seconds)
+    print(f"\n  کل درخواست‌های سرور: {server.requests:,}\n")
+
+    asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+بنچمارک کدک Modbus — هزینه encode/decode هر poll
+
+    python benchmarks/bench_modbus_codec.py [--polls 100000]
+
+هر poll = ساخت فریم درخواست FC03 (۱۲ رجیستر) + بررسی طول/CRC/function code
++ RegisterMap.decode (همان مسیر _read_block و read_values درایورهای RTU/TCP).
+نسخه قدیمی (CRC بیت‌به‌بیت + struct.unpack و مقیاس به ازای هر رجیستر) با
+core.modbus_codec + core.register_map مقایسه می‌شود و سهم CPU در نرخ 10k poll/s
+گزارش می‌شود.
+"""
+import argparse
+import os
+import struct
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import modbus_codec  # noqa: E402
+from core.register_map import DEFAULT_REGISTER_MAP  # noqa: E402
+
+REGS = [1215, 152, 82, 74, 148, 2, 1, 1, 1, 7, 150, 0]
+COUNT = len(REGS)
+TARGET_RATE = 10_000
+BLOCK = DEFAULT_REGISTER_MAP.blocks[0]
+# (فیلد، مقیاس) به ترتیب آدرس — مقیاس‌گذاری دستی مسیر قبلی
+SCALES = [(spec.field, spec.scale) for spec in sorted(DEFAULT_REGISTER_MAP.specs, key=lambda s: s.address)]
+
+
+# ── پیاده‌سازی قبلی (برای مقایسه) ─────────────────────────
+def legacy_crc16(data: bytes) -> bytes:
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            if crc & 0x0001:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+    return struct.pack('<H', crc)
+
+
+def legacy_rtu_poll(response: bytes):
+    frame = struct.pack('>BBHH', 1, 0x03, 0, COUNT)
+    frame += legacy_crc16(frame)
+    if response[-2:] != legacy_crc16(response[:-2]):
+        raise ValueError("crc")
+    registers = [struct.unpack('>H', response[3 + i * 2: 5 + i * 2])[0] for i in range(COUNT)]
+    return {field: value / scale for (field, scale), value in zip(SCALES, registers)}
+
+
+def legacy_tcp_poll(response: bytes, tid: int):
+    pdu = struct.pack('>BHH', 0x03, 0, COUNT)
+    mbap = struct.pack('>HHHB', tid, 0, len(pdu) + 1, 1)
+    frame = mbap + pdu  # noqa: F841
+    registers = []
+    for i in range(COUNT):
+        offset = 9 + i * 2
+        if offset + 2 <= len(response):
+            registers.append(struct.unpack('>H', response[offset:offset + 2])[0])
+    return {field: value / scale for (field, scale), value in zip(SCALES, registers)}
+
+
+# ── کدک جدید (مسیر درایور) ─────────────────────────────────
+def codec_rtu_poll(response: bytes):
+    """CotrustModbusRTU._read_block + RegisterMap.decode، بدون bus"""
+    modbus_codec.rtu_read_request(1, BLOCK.start, BLOCK.count, BLOCK.function)
+    expected_len = modbus_codec.rtu_read_response_length(BLOCK.count, BLOCK.function)
+    if len(response) < expected_len or not modbus_codec.check_crc(response) or response[1] != BLOCK.function:
+        raise ValueError("bad response")
+    return DEFAULT_REGISTER_MAP.decode((memoryview(response)[3:],))
+
+
+def codec_tcp_poll(response: bytes, tid: int):
+    """CotrustModbusTCP._read_block + RegisterMap.decode، بدون socket"""
+    modbus_codec.tcp_read_request(tid, 1, BLOCK.start, BLOCK.count, BLOCK.function)
+    if response[7] != BLOCK.function or len(response) < 9 + BLOCK.payload_length:
+        raise ValueError("bad response")
+    return DEFAULT_REGISTER_MAP.decode((memoryview(response)[9:],))
+
+
+def _rtu_response() -> bytes:
+    body = struct.pack('>BBB', 1, 0x03, COUNT * 2) + struct.pack(f'>{COUNT}H', *REGS)
+    return body + modbus_codec.crc16_bytes(body)
+
+
+def _tcp_response() -> bytes:
+    pdu = struct.pack('>BB', 0x03, COUNT * 2) + struct.pack(f'>{COUNT}H', *REGS)
+    return modbus_codec.MBAP.pack(1, 0, len(pdu) + 1, 1) + pdu
+
+
+def _measure(label, fn, polls):
+    start = time.perf_counter()
+    for i in range(polls):
+        fn(i & 0xFFFF)
+    elapsed = time.perf_counter() - start
+    per_poll_us = elapsed / polls * 1e6
+    cpu_pct = per_poll_us * TARGET_RATE / 1e6 * 100
+    print(f"  {label:<18} {per_poll_us:8.2f} µs/poll   {cpu_pct:6.1f}% یک هسته @ {TARGET_RATE:,} poll/s")
+    return per_poll_us
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--polls', type=int, default=100_000)
+    args = parser.parse_args()
+
+    rtu = _rtu_response()
+    tcp = _tcp_response()
+    assert len(DEFAULT_REGISTER_MAP.blocks) == 1 and BLOCK.count == COUNT
+    assert codec_rtu_poll(rtu) == legacy_rtu_poll(rtu)
+    assert codec_tcp_poll(tcp, 1) == legacy_tcp_poll(tcp, 1)
+
+    print(f"\nModbus codec — {args.polls:,} poll، {COUNT} رجیستر\n")
+    print("RTU (FC03 + CRC):")
+    old = _measure("legacy", lambda _: legacy_rtu_poll(rtu), args.polls)
+    new = _measure("RegisterMap", lambda _: codec_rtu_poll(rtu), args.polls)
+    print(f"  → {old / new:.1f}x سریع‌تر\n")
+
+    print("TCP (FC03 + MBAP):")
+    old = _measure("legacy", lambda tid: legacy_tcp_poll(tcp, tid), args.polls)
+    new = _measure("RegisterMap", lambda tid: codec_tcp_poll(tcp, tid), args.polls)
+    print(f"  → {old / new:.1f}x سریع‌تر\n")
+
+
+if __name__ == '__main__':
+    main()
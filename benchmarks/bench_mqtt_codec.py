@@ -0,0 +1,66 @@
+"""
+بنچمارک قالب payload MQTT — حجم هر پیام و هزینه decode
+
+    python benchmarks/bench_mqtt_codec.py [--messages 50000]
+
+payloadهای core.fleet_simulator (اتوکلاو و زباله‌سوز) یک بار JSON و یک
+بار با قالب باینری v1 (core.mqtt_codec) encode می‌شوند و decode همه
+پیام‌ها زمان‌گیری می‌شود (همان کاری که on_message برای هر پیام انجام می‌دهد).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.fleet_simulator import FleetSimulator  # noqa: E402
+from core.mqtt_codec import decode_payload, encode_binary  # noqa: E402
+
+
+def _timed(decode, messages, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for raw in messages:
+            decode(raw)
+        best = min(best, time.perf_counter() - started)
+    return best / len(messages) * 1e6
+
+
+def bench(label, payloads, device_type):
+    as_json = [json.dumps(payload).encode() for payload in payloads]
+    as_binary = [encode_binary(payload, device_type) for payload in payloads]
+    json_bytes = sum(map(len, as_json)) / len(as_json)
+    binary_bytes = sum(map(len, as_binary)) / len(as_binary)
+
+    legacy = _timed(lambda raw: json.loads(raw.decode('utf-8')), as_json)
+    fallback = _timed(decode_payload, as_json)
+    binary = _timed(decode_payload, as_binary)
+    print(f"  {label}")
+    print(f"    JSON    {json_bytes:6.0f} B/msg   json.loads {legacy:5.2f}µs   decode_payload {fallback:5.2f}µs")
+    print(f"    binary  {binary_bytes:6.0f} B/msg   decode_payload {binary:5.2f}µs   "
+          f"(×{json_bytes / binary_bytes:.1f} کوچک‌تر، ×{legacy / binary:.1f} سریع‌تر)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=50_000)
+    args = parser.parse_args()
+
+    fleet = FleetSimulator(autoclaves=500, incinerators=500, seed=1)
+    autoclave, incinerator = [], []
+    while len(autoclave) < args.messages:
+        fleet.step(5.0)
+        for index, (_, payload) in enumerate(fleet.payloads()):
+            (autoclave if index < 500 else incinerator).append(payload)
+
+    print(f"\nقالب payload MQTT — {args.messages:,} پیام از هر نوع\n")
+    bench("autoclave", autoclave[:args.messages], 'autoclave')
+    bench("incinerator", incinerator[:args.messages], 'incinerator')
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+بنچمارک مقیاس‌پذیری run_mqtt_consumer روی broker محلی (mosquitto)
+
+    mosquitto -p 1883 &
+    python benchmarks/bench_mqtt_consumers.py [--workers 1 2 4] [--devices 1000] [--messages 100000]
+
+دستگاه‌های موقت (سریال BENCH-*) ساخته و در پایان حذف می‌شوند. برای هر
+تعداد worker یک MqttConsumerSupervisor اجرا می‌شود، payloadهای
+core.fleet_simulator با QoS 1 روی {MQTT_TOPIC_PREFIX}/<serial>/data منتشر
+می‌شوند و زمان تا پردازش همه پیام‌ها (pipeline_processed در گزارش بار
+workerها) اندازه‌گیری می‌شود.
+
+خروجی: پیام در ثانیه و ضریب نسبت به یک worker.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import paho.mqtt.client as mqtt  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+from apps.devices.models import Device  # noqa: E402
+from core.fleet_simulator import FleetSimulator  # noqa: E402
+from core.mqtt_consumer import MqttConsumerSupervisor  # noqa: E402
+
+
+def _publisher():
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id='bench_mqtt_consumers',
+                         protocol=mqtt.MQTTv5)
+    if settings.MQTT_USERNAME:
+        client.username_pw_set(settings.MQTT_USERNAME, settings.MQTT_PASSWORD)
+    client.max_queued_messages_set(0)
+    client.max_inflight_messages_set(1000)
+    client.connect(settings.MQTT_BROKER_HOST, settings.MQTT_BROKER_PORT, 60)
+    client.loop_start()
+    return client
+
+
+def _processed(supervisor):
+    loads = supervisor.loads()
+    return sum(load['pipeline_processed'] for load in loads.values()), loads
+
+
+def bench(workers, messages, devices, timeout):
+    supervisor = MqttConsumerSupervisor(workers=workers, reload_seconds=0.5, group=f'bench{workers}')
+    supervisor.start()
+    try:
+        # همه workerها وصل و همه topicها subscribe شده باشند
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            loads = supervisor.loads()
+            if (len(loads) == workers and all(load['connected'] for load in loads.values())
+                    and sum(load['devices'] for load in loads.values()) >= devices):
+                break
+            time.sleep(0.2)
+        else:
+            print(f"  {workers} worker: اتصال به broker ممکن نشد")
+            return None
+        time.sleep(1)
+
+        client = _publisher()
+        started = time.perf_counter()
+        infos = [client.publish(f'{settings.MQTT_TOPIC_PREFIX}/{serial}/data', payload, qos=1)
+                 for serial, payload in messages]
+        for info in infos:
+            info.wait_for_publish()
+        published = time.perf_counter() - started
+
+        deadline = time.monotonic() + timeout
+        done, loads = _processed(supervisor)
+        while done < len(messages) and time.monotonic() < deadline:
+            time.sleep(0.1)
+            done, loads = _processed(supervisor)
+        elapsed = time.perf_counter() - started
+        client.loop_stop()
+        client.disconnect()
+
+        rate = done / elapsed
+        shares = ' / '.join(f"{load['pipeline_processed']:,}" for load in loads.values())
+        print(f"  {workers:>2} worker {rate:10,.0f} msg/s   انتشار {published:5.1f}s   کل {elapsed:5.1f}s   "
+              f"{done:,}/{len(messages):,} ({shares})")
+        return rate
+    finally:
+        supervisor.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--devices', type=int, default=1000)
+    parser.add_argument('--messages', type=int, default=100_000)
+    parser.add_argument('--timeout', type=float, default=120)
+    args = parser.parse_args()
+
+    autoclaves = args.devices - args.devices // 10
+    incinerators = args.devices // 10
+    serials = (
+        [f'BENCH-AC-{i:05d}' for i in range(1, autoclaves + 1)]
+        + [f'BENCH-IN-{i:05d}' for i in range(1, incinerators + 1)]
+    )
+    Device.objects.bulk_create([
+        Device(name=serial, serial_number=serial, connection_type='sim',
+               device_type='autoclave' if i < autoclaves else 'incinerator')
+        for i, serial in enumerate(serials)
+    ], batch_size=1000, ignore_conflicts=True)
+
+    try:
+        fleet = FleetSimulator(autoclaves=autoclaves, incinerators=incinerators, serials=serials)
+        messages = []
+        while len(messages) < args.messages:
+            fleet.step(5.0)
+            messages.extend((serial, json.dumps(payload)) for serial, payload in fleet.payloads())
+        messages = messages[:args.messages]
+
+        print(f"\nMQTT consumers — {args.devices:,} دستگاه، {len(messages):,} پیام، "
+              f"{settings.MQTT_BROKER_HOST}:{settings.MQTT_BROKER_PORT}\n")
+        base = None
+        for workers in args.workers:
+            rate = bench(workers, messages, args.devices, args.timeout)
+            if rate and base is None:
+                base = rate
+            elif rate and base:
+                print(f"           ×{rate / base:.2f} نسبت به {args.workers[0]} worker")
+        print()
+    finally:
+        Device.objects.filter(serial_number__startswith='BENCH-').delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+بنچمارک مسیر دریافت MQTT (core.mqtt_pipeline) بدون broker
+
+    python benchmarks/bench_mqtt_pipeline.py [--devices 1000] [--messages 50000] [--batch 2000]
+
+دستگاه‌های موقت (سریال BENCH-*) در دیتابیس تنظیمات فعلی ساخته و در پایان
+حذف می‌شوند. payloadها از core.fleet_simulator می‌آیند و مثل callback
+paho با submit() در صف گذاشته می‌شوند؛ زمان تا ذخیره کامل در BulkWriter
+اندازه‌گیری می‌شود. دو حالت:
+
+- single: max_batch=1 (معادل مسیر قبلی، یک پیام در هر بار پردازش)
+- batch:  max_batch=--batch با linger پیش‌فرض
+
+خروجی: پیام در ثانیه (هدف: ۵٬۰۰۰ از یک پروسه listener) و آمار pipeline.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from apps.devices.models import Device  # noqa: E402
+from core.bulk_writer import get_bulk_writer  # noqa: E402
+from core.fleet_simulator import FleetSimulator  # noqa: E402
+from core.mqtt_pipeline import MqttIngestPipeline  # noqa: E402
+
+TARGET = 5000
+
+
+def _payloads(fleet, count):
+    messages = []
+    while len(messages) < count:
+        fleet.step(5.0)
+        messages.extend(fleet.payloads())
+    return messages[:count]
+
+
+def bench(label, messages, max_batch):
+    pipeline = MqttIngestPipeline(max_batch=max_batch, max_queue=len(messages) + 1)
+    writer = get_bulk_writer()
+    started = time.perf_counter()
+    for serial, payload in messages:
+        pipeline.submit(payload, f"bench/{serial}/data")
+    pipeline.stop(timeout=600)
+    writer.flush()
+    elapsed = time.perf_counter() - started
+
+    rate = pipeline.processed / elapsed
+    mark = "✅" if rate >= TARGET else "⚠️"
+    print(f"  {label:<7} {rate:10,.0f} msg/s {mark}   {elapsed:6.2f}s   {pipeline.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--devices', type=int, default=1000)
+    parser.add_argument('--messages', type=int, default=50_000)
+    parser.add_argument('--batch', type=int, default=2000)
+    parser.add_argument('--single-messages', type=int, default=5000,
+                        help='تعداد پیام حالت single (کند است)')
+    args = parser.parse_args()
+
+    autoclaves = args.devices - args.devices // 10
+    incinerators = args.devices // 10
+    serials = (
+        [f'BENCH-AC-{i:05d}' for i in range(1, autoclaves + 1)]
+        + [f'BENCH-IN-{i:05d}' for i in range(1, incinerators + 1)]
+    )
+    Device.objects.bulk_create([
+        Device(name=serial, serial_number=serial, connection_type='sim',
+               device_type='autoclave' if i < autoclaves else 'incinerator')
+        for i, serial in enumerate(serials)
+    ], batch_size=1000, ignore_conflicts=True)
+
+    try:
+        fleet = FleetSimulator(autoclaves=autoclaves, incinerators=incinerators, serials=serials)
+        print(f"\nMQTT ingest — {args.devices:,} دستگاه\n")
+        bench("single", _payloads(fleet, args.single_messages), 1)
+        bench("batch", _payloads(fleet, args.messages), args.batch)
+        print()
+    finally:
+        Device.objects.filter(serial_number__startswith='BENCH-').delete()
+
+
+if __name__ == '__main__':
+    main()
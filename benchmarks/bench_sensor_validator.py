@@ -0,0 +1,110 @@
+"""
+بنچمارک اعتبارسنجی payload سنسور — هزینه هر پیام
+
+    python benchmarks/bench_sensor_validator.py [--messages 100000] [--batches 1 50 500 2000]
+
+payloadهای core.fleet_simulator با سه روش بررسی می‌شوند:
+- legacy: حلقه روی همه SENSOR_BOUNDS و ساخت dict ستون‌ها (مسیر قبلی)
+- validate: validator نوع دستگاه، یک خوانش در هر فراخوانی
+- validate_batch: ماتریس NumPy برای دسته‌های هم‌اندازه MQTT_BATCH_MAX
+
+با فیلدهای اضافه (--extra-fields) اثر بزرگ شدن SCHEMA دیده می‌شود.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.fleet_simulator import FleetSimulator  # noqa: E402
+from core.sensor_schema import (  # noqa: E402
+    PAYLOAD_COLUMNS, SCHEMA, SENSOR_BOUNDS, PayloadValidator, SensorField,
+)
+
+
+def legacy(payloads, bounds):
+    """اعتبارسنجی و نگاشت ستون‌ها مثل validate_sensor_payload + process قبلی"""
+    for data in payloads:
+        errors = []
+        for field, (min_val, max_val) in bounds.items():
+            value = data.get(field)
+            if value is None:
+                continue
+            if not isinstance(value, (int, float)):
+                errors.append(f"{field}: مقدار باید عدد باشد، دریافت شد: {type(value).__name__}")
+                continue
+            if not (min_val <= value <= max_val):
+                errors.append(f"{field}: مقدار {value} خارج از محدوده [{min_val}, {max_val}]")
+        if not errors:
+            values = {column: data.get(key) for key, column in PAYLOAD_COLUMNS.items()}
+            for column in ('power_consumption_kw', 'voltage_v', 'current_a'):
+                if values[column] is None:
+                    values[column] = 0
+
+
+def _timed(run, payloads, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run(payloads)
+        best = min(best, time.perf_counter() - started)
+    return best / len(payloads) * 1e6
+
+
+def bench(label, payloads, fields, bounds, batch_sizes):
+    validator = PayloadValidator(label, fields)
+
+    def single(items):
+        for data in items:
+            validator.validate(data)
+
+    def batched(size):
+        def run(items):
+            for start in range(0, len(items), size):
+                validator.validate_batch(items[start:start + size])
+        return run
+
+    print(f"  {label} ({len(validator.keys)} فیلد در validator، {len(bounds)} در SENSOR_BOUNDS)")
+    base = _timed(lambda items: legacy(items, bounds), payloads)
+    print(f"    legacy               {base:6.2f}µs/msg")
+    cost = _timed(single, payloads)
+    print(f"    validate             {cost:6.2f}µs/msg   ×{base / cost:.1f}")
+    for size in batch_sizes:
+        cost = _timed(batched(size), payloads)
+        print(f"    validate_batch {size:>5} {cost:6.2f}µs/msg   ×{base / cost:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=100_000)
+    parser.add_argument('--batches', type=int, nargs='+', default=[1, 50, 500, 2000])
+    parser.add_argument('--extra-fields', type=int, default=32,
+                        help='تعداد فیلد ساختگی اضافه برای سناریوی SCHEMA بزرگ')
+    args = parser.parse_args()
+
+    fleet = FleetSimulator(autoclaves=500, incinerators=500, seed=1)
+    autoclave, incinerator = [], []
+    while len(autoclave) < args.messages:
+        fleet.step(5.0)
+        for index, (_, payload) in enumerate(fleet.payloads()):
+            (autoclave if index < 500 else incinerator).append(payload)
+    autoclave, incinerator = autoclave[:args.messages], incinerator[:args.messages]
+
+    print(f"\nاعتبارسنجی payload سنسور — {args.messages:,} پیام از هر نوع\n")
+    for device_type, payloads in (('autoclave', autoclave), ('incinerator', incinerator)):
+        fields = [field for field in SCHEMA if device_type in field.device_types]
+        bench(device_type, payloads, fields, SENSOR_BOUNDS, args.batches)
+
+    # فیلدهای ساختگی (نیمی در payload) — legacy خطی رشد می‌کند، batch تقریباً ثابت
+    extra = [SensorField(f'extra_{i}', f'extra_{i}', 0, 100) for i in range(args.extra_fields)]
+    for data in autoclave:
+        data.update({field.key: 50.0 for field in extra[::2]})
+    fields = [field for field in SCHEMA if 'autoclave' in field.device_types] + extra
+    bounds = {**SENSOR_BOUNDS, **{field.key: (field.low, field.high) for field in extra}}
+    bench(f'autoclave +{args.extra_fields}', autoclave, fields, bounds, args.batches)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 import os
+import json
 import sys
 import dj_database_url
 from pathlib import Path
@@ -268,6 +269,76 @@ MQTT_BROKER_PORT = int(os.environ.get("MQTT_BROKER_PORT", 1883))
 MQTT_USERNAME = os.environ.get("MQTT_USERNAME", "")
 MQTT_PASSWORD = os.environ.get("MQTT_PASSWORD", "")
 MQTT_TOPIC_PREFIX = os.environ.get("MQTT_TOPIC_PREFIX", "hospital/devices")
+# پردازش دسته‌ای پیام‌ها (core.mqtt_pipeline): حداکثر خوانش و انتظار هر دسته
+MQTT_BATCH_MAX = int(os.environ.get("MQTT_BATCH_MAX", 2000))
+MQTT_BATCH_LINGER_MS = int(os.environ.get("MQTT_BATCH_LINGER_MS", 20))
+# صف محدود (خوانش) بین callback و پردازش؛ وقتی پر است callback تا این مدت منتظر می‌ماند
+MQTT_QUEUE_MAX = int(os.environ.get("MQTT_QUEUE_MAX", 50000))
+MQTT_QUEUE_BLOCK_SECONDS = float(os.environ.get("MQTT_QUEUE_BLOCK_SECONDS", 1))
+# پیام دسته‌ای gateway: سقف خوانش هر پیام (پیش‌فرض یک روز 1Hz) و حداکثر جلو بودن ساعت دستگاه
+MQTT_BATCH_MAX_READINGS = int(os.environ.get("MQTT_BATCH_MAX_READINGS", 86400))
+MQTT_MAX_CLOCK_SKEW_SECONDS = float(os.environ.get("MQTT_MAX_CLOCK_SKEW_SECONDS", 300))
+# run_mqtt_consumer: تعداد پروسه worker (۰ = تعداد هسته‌ها)، گروه shared subscription
+# و فاصله بارگذاری مجدد فهرست دستگاه‌ها (core.mqtt_consumer)
+MQTT_CONSUMER_WORKERS = int(os.environ.get("MQTT_CONSUMER_WORKERS", 0))
+MQTT_SHARED_GROUP = os.environ.get("MQTT_SHARED_GROUP", "hospital_monitor")
+MQTT_RELOAD_SECONDS = float(os.environ.get("MQTT_RELOAD_SECONDS", 10))
+
+# =====================================================
+# PLC Polling
+# =====================================================
+# دستگاه‌های Modbus TCP همگی روی یک event loop (core.modbus_async)
+PLC_ASYNC_TCP = os.environ.get("PLC_ASYNC_TCP", "True") == "True"
+PLC_ASYNC_DB_WORKERS = int(os.environ.get("PLC_ASYNC_DB_WORKERS", 8))
+# حداکثر درخواست هم‌زمان روی هر اتصال TCP (pipelining پشت Gateway)
+PLC_TCP_MAX_INFLIGHT = int(os.environ.get("PLC_TCP_MAX_INFLIGHT", 8))
+# Circuit breaker: بعد از N خطای پشت‌سرهم، تلاش مجدد با backoff نمایی
+PLC_BREAKER_FAILURES = int(os.environ.get("PLC_BREAKER_FAILURES", 3))
+PLC_BACKOFF_BASE_SECONDS = float(os.environ.get("PLC_BACKOFF_BASE_SECONDS", 2))
+PLC_BACKOFF_MAX_SECONDS = float(os.environ.get("PLC_BACKOFF_MAX_SECONDS", 300))
+# Deadband compression: ردیف SensorReading فقط هنگام تغییر معنادار (core.compression)
+PLC_COMPRESSION_ENABLED = os.environ.get("PLC_COMPRESSION_ENABLED", "True") == "True"
+PLC_DEADBANDS = {
+    "temperature_c": float(os.environ.get("PLC_DEADBAND_TEMPERATURE", 0.5)),
+    "pressure_bar": float(os.environ.get("PLC_DEADBAND_PRESSURE", 0.02)),
+    "power_consumption_kw": float(os.environ.get("PLC_DEADBAND_POWER", 0.5)),
+    "steam_flow_kg_h": float(os.environ.get("PLC_DEADBAND_STEAM_FLOW", 0.3)),
+    "water_level_pct": float(os.environ.get("PLC_DEADBAND_WATER_LEVEL", 2.0)),
+}
+# حداکثر فاصله بین دو ردیف ذخیره‌شده حتی بدون تغییر
+PLC_HEARTBEAT_SECONDS = int(os.environ.get("PLC_HEARTBEAT_SECONDS", 300))
+# Adaptive polling: نرخ poll بر اساس فاز سیکل (core.adaptive_polling)
+PLC_ADAPTIVE_POLLING = os.environ.get("PLC_ADAPTIVE_POLLING", "True") == "True"
+PLC_MIN_POLL_INTERVAL = float(os.environ.get("PLC_MIN_POLL_INTERVAL", 0.5))
+# بازنویسی نرخ پیش‌فرض هر نوع دستگاه، مثلاً {"autoclave": {"idle": 120}}
+PLC_ADAPTIVE_RATES = json.loads(os.environ.get("PLC_ADAPTIVE_RATES", "{}"))
+# Bulk writer: SensorReadingها از همه pollerها و MQTT دسته‌ای نوشته می‌شوند (core.bulk_writer)
+SENSOR_WRITE_FLUSH_MS = int(os.environ.get("SENSOR_WRITE_FLUSH_MS", 200))
+SENSOR_WRITE_FLUSH_ROWS = int(os.environ.get("SENSOR_WRITE_FLUSH_ROWS", 1000))
+# سقف بافر؛ بعد از آن تولیدکننده منتظر می‌ماند (backpressure) تا حداکثر BLOCK_SECONDS
+SENSOR_WRITE_MAX_ROWS = int(os.environ.get("SENSOR_WRITE_MAX_ROWS", 100000))
+SENSOR_WRITE_BLOCK_SECONDS = float(os.environ.get("SENSOR_WRITE_BLOCK_SECONDS", 5))
+# Spool روی دیسک (core.spool): خوانش‌هایی که به دیتابیس نرسیدند؛ مسیر خالی = غیرفعال
+SENSOR_SPOOL_DIR = os.environ.get("SENSOR_SPOOL_DIR", str(BASE_DIR / "spool"))
+SENSOR_SPOOL_MAX_MB = int(os.environ.get("SENSOR_SPOOL_MAX_MB", 1024))
+SENSOR_SPOOL_SEGMENT_MB = int(os.environ.get("SENSOR_SPOOL_SEGMENT_MB", 8))
+# status/last_seen دستگاه: تغییر وضعیت فوری، last_seen هر N ثانیه با bulk_update (core.status_cache)
+DEVICE_STATUS_FLUSH_SECONDS = float(os.environ.get("DEVICE_STATUS_FLUSH_SECONDS", 5))
+# run_poller_supervisor: تعداد پروسه worker (۰ = تعداد هسته‌ها) و فاصله بارگذاری مجدد تنظیمات دستگاه‌ها
+PLC_WORKERS = int(os.environ.get("PLC_WORKERS", 0))
+PLC_RELOAD_SECONDS = float(os.environ.get("PLC_RELOAD_SECONDS", 10))
+# زمان‌بند مرکزی poll (core.poll_scheduler): تعداد thread اجرای poll و jitter (کسری از فاصله)
+PLC_POLL_WORKERS = int(os.environ.get("PLC_POLL_WORKERS", 32))
+PLC_POLL_JITTER = float(os.environ.get("PLC_POLL_JITTER", 0.1))
+# WebSocket publisher: صف محدود با تجمیع پیام هر دستگاه، ارسال هم‌زمان هر LINGER_MS (core.ws_publisher)
+WS_PUBLISH_MAX_PENDING = int(os.environ.get("WS_PUBLISH_MAX_PENDING", 10000))
+WS_PUBLISH_LINGER_MS = int(os.environ.get("WS_PUBLISH_LINGER_MS", 20))
+WS_PUBLISH_CONCURRENCY = int(os.environ.get("WS_PUBLISH_CONCURRENCY", 64))
+# متریک‌های poller (core.metrics): پورت /metrics برای Prometheus (۰ = غیرفعال) و آدرسی که صفحه متریک پنل می‌خواند
+# پیش‌فرض فقط localhost؛ برای Prometheus روی ماشین دیگر 0.0.0.0 یا IP شبکه داخلی
+PLC_METRICS_HOST = os.environ.get("PLC_METRICS_HOST", "127.0.0.1")
+PLC_METRICS_PORT = int(os.environ.get("PLC_METRICS_PORT", 9108))
+PLC_METRICS_URL = os.environ.get("PLC_METRICS_URL", "http://127.0.0.1:9108/metrics.json")
 
 # =====================================================
 # هشدار پیامکی (Kavenegar)
@@ -0,0 +1,105 @@
+"""
+============================================================
+Adaptive Polling — نرخ poll بر اساس فاز سیکل و سرعت تغییر سیگنال
+============================================================
+به جای polling_interval ثابت برای همه حالت‌ها:
+
+- فاز سیکل (CYCLE_STATUS رجیستر D5) نرخ پایه را تعیین می‌کند:
+  heating/sterilizing زیر ثانیه (برای validation سیکل)، idle/complete
+  هر ۶۰ ثانیه
+- اگر سیگنال سریع‌تر از انتظار تغییر کند، فاصله طوری کوتاه می‌شود که
+  بین دو poll حدود یک deadband (core.compression) تغییر رخ دهد — تا کف
+  min_interval؛ مثلاً باز کردن دستی بخار در حالت idle
+- خواندن ناموفق: polling_interval خود دستگاه (backoff با circuit breaker)
+
+نرخ‌ها برای هر نوع دستگاه در settings.PLC_ADAPTIVE_RATES قابل تغییرند.
+"""
+
+import time
+from typing import Dict, Optional
+
+from core.compression import DEFAULT_DEADBANDS
+from core.plc_driver import CYCLE_STATUS
+
+# نوع دستگاه → فاز → فاصله poll (ثانیه)
+DEFAULT_RATES: Dict[str, Dict[str, float]] = {
+    "autoclave": {
+        "idle": 60.0,
+        "heating": 1.0,
+        "sterilizing": 0.5,
+        "cooling": 2.0,
+        "complete": 30.0,
+        "error": 5.0,
+    },
+    "incinerator": {
+        "idle": 60.0,
+        "heating": 2.0,
+        "sterilizing": 1.0,
+        "cooling": 5.0,
+        "complete": 30.0,
+        "error": 5.0,
+    },
+}
+
+
+class AdaptivePollRate:
+    """فاصله poll بعدی برای یک دستگاه"""
+
+    def __init__(
+        self,
+        rates: Dict[str, float],
+        fallback_interval: float = 5.0,
+        min_interval: float = 0.5,
+        deadbands: Optional[Dict[str, float]] = None,
+    ):
+        self.rates = rates
+        self.fallback_interval = fallback_interval
+        self.min_interval = min_interval
+        self.deadbands = deadbands or DEFAULT_DEADBANDS
+        self._last = None
+
+    def _change_rate(self, values: Dict[str, float], now: float) -> float:
+        """سرعت تغییر نسبت به poll قبل: بیشترین «تعداد deadband در ثانیه» بین متریک‌ها"""
+        if self._last is None:
+            return 0.0
+        last, last_time = self._last
+        elapsed = now - last_time
+        if elapsed <= 0:
+            return 0.0
+        # نویز داخل deadband نادیده گرفته می‌شود؛ وگرنه در فاصله‌های کوتاه
+        # نویز سنسور نرخ را بالا نگه می‌دارد و فاصله هرگز به نرخ فاز برنمی‌گردد
+        ratio = max(
+            abs(values.get(field, 0.0) - last.get(field, 0.0)) / band
+            for field, band in self.deadbands.items()
+        )
+        return ratio / elapsed if ratio > 1.0 else 0.0
+
+    def next_interval(self, values: Optional[Dict[str, float]]) -> float:
+        """values: خروجی RegisterMap.decode آخرین poll (None = ناموفق)"""
+        if values is None:
+            return self.fallback_interval
+
+        phase = CYCLE_STATUS.get(int(values.get("cycle_status", 0)), "idle")
+        interval = self.rates.get(phase, self.fallback_interval)
+        now = time.monotonic()
+        rate = self._change_rate(values, now)
+        self._last = (values, now)
+        if rate > 0:
+            # حدود یک deadband تغییر بین دو poll
+            interval = min(interval, 1.0 / rate)
+        return max(self.min_interval, interval)
+
+
+def adaptive_rate_from_settings(device_type: str, fallback_interval: float) -> Optional[AdaptivePollRate]:
+    """None = adaptive غیرفعال (polling_interval ثابت)"""
+    from django.conf import settings
+    if not getattr(settings, "PLC_ADAPTIVE_POLLING", True):
+        return None
+    rates = dict(DEFAULT_RATES.get(device_type, DEFAULT_RATES["autoclave"]))
+    rates.update(getattr(settings, "PLC_ADAPTIVE_RATES", {}).get(device_type, {}))
+    return AdaptivePollRate(
+        rates=rates,
+        fallback_interval=fallback_interval,
+        min_interval=getattr(settings, "PLC_MIN_POLL_INTERVAL", 0.5),
+        deadbands=getattr(settings, "PLC_DEADBANDS", None),
+    )
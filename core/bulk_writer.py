@@ -0,0 +1,408 @@
+"""
+============================================================
+Bulk Writer — نوشتن دسته‌ای SensorReading برای همه pollerها و MQTT
+============================================================
+به جای یک INSERT (و یک تراکنش) به ازای هر خوانش در هر thread، همه
+تولیدکننده‌ها ReadingBatch خود را در یک بافر مشترک می‌گذارند و یک
+thread نویسنده هر FLUSH_MS میلی‌ثانیه یا هر FLUSH_ROWS ردیف (هر کدام
+زودتر) کل بافر را با یک executemany در یک تراکنش می‌نویسد.
+
+- PostgreSQL: یک round trip و یک commit برای صدها ردیف
+- SQLite: فقط یک نویسنده → بدون رقابت قفل "database is locked"
+- بافر محدود است (MAX_ROWS): وقتی پر شود تولیدکننده منتظر می‌ماند
+  (backpressure)؛ اگر تا BLOCK_SECONDS جا باز نشود add() مقدار False
+  برمی‌گرداند و خطا لاگ می‌شود — داده هرگز بی‌صدا دور ریخته نمی‌شود
+- خطای اتصال دیتابیس: دسته به ابتدای بافر برمی‌گردد و با backoff
+  دوباره نوشته می‌شود؛ خطای داده (مثلاً FK دستگاه حذف‌شده) با نصف
+  کردن دسته به همان ردیف‌ها محدود و لاگ می‌شود
+- با spool (core.spool، SENSOR_SPOOL_DIR): دسته‌ای که نوشتنش ناموفق بود
+  یا در بافر پر جا نشد به جای انتظار/رد شدن روی دیسک می‌رود و همین
+  thread نویسنده وقتی بافر زنده خالی است آن را به ترتیب و دسته‌ای درج
+  می‌کند (replay) — pollerها هیچ‌وقت منتظر دیتابیس نمی‌مانند و خوانش‌ها
+  از restart پروسه جان سالم به در می‌برند
+
+    get_bulk_writer().add(batch)      # از هر thread
+    get_bulk_writer().on_written(fn)   # fn در thread نویسنده بعد از ذخیره همه خوانش‌های قبلی
+    get_bulk_writer().flush()          # انتظار همگام (خاموش شدن، تست‌ها)
+"""
+
+import atexit
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+
+from core.reading_batch import ReadingBatch
+from core.spool import ReadingSpool
+
+logger = logging.getLogger(__name__)
+
+MAX_BACKOFF_SECONDS = 30.0
+# تعداد تلاش نوشتن بافر باقی‌مانده هنگام خاموش شدن
+SHUTDOWN_ATTEMPTS = 3
+
+
+class BulkWriter:
+    def __init__(
+        self,
+        flush_ms: int = 200,
+        flush_rows: int = 1000,
+        max_rows: int = 100_000,
+        block_seconds: float = 5.0,
+        using: str = "default",
+        spool: Optional[ReadingSpool] = None,
+    ):
+        self.flush_seconds = flush_ms / 1000
+        self.flush_rows = flush_rows
+        self.max_rows = max_rows
+        self.block_seconds = block_seconds
+        self.using = using
+        self.spool = spool
+
+        self._buffer = ReadingBatch()
+        self._in_flight = 0
+        self._oldest: Optional[float] = None
+        self._force = False
+        self._stopping = False
+        # زمان تلاش بعدی replay بعد از خطای دیتابیس
+        self._retry_at = 0.0
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        # on_written: منتظر ردیف‌های بافر فعلی / منتظر خالی شدن spool
+        self._waiters: List[Callable[[], None]] = []
+        self._spool_waiters: List[Callable[[], None]] = []
+
+        self.written = 0
+        self.flushes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.spooled = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer) + self._in_flight
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="sensor-writer", daemon=True)
+            self._thread.start()
+
+    # ── تولیدکننده‌ها ──────────────────────────────────────
+    def add(self, batch: ReadingBatch) -> bool:
+        """False = بافر تا block_seconds پر ماند و دسته پذیرفته نشد (لاگ می‌شود)"""
+        if not len(batch):
+            return True
+        self.start()
+        deadline = time.monotonic() + self.block_seconds
+        with self._cond:
+            if self.spool is not None and (
+                self._stopping or (self._buffer and len(self._buffer) + len(batch) > self.max_rows)
+            ):
+                # نویسنده عقب افتاده: دسته بدون انتظار روی دیسک می‌رود
+                return self._to_spool(batch)
+            if self._stopping:
+                self.rejected += len(batch)
+                logger.error(f"نویسنده SensorReading متوقف شده — {len(batch)} خوانش رد شد")
+                return False
+            # دسته بزرگ‌تر از کل سقف در بافر خالی پذیرفته می‌شود
+            while self._buffer and len(self._buffer) + len(batch) > self.max_rows:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stopping:
+                    self.rejected += len(batch)
+                    logger.error(
+                        f"بافر SensorReading پر است ({len(self._buffer):,} ردیف) — "
+                        f"{len(batch)} خوانش رد شد (مجموع {self.rejected:,})"
+                    )
+                    return False
+                self._cond.wait(remaining)
+            self._buffer.extend(batch)
+            if self._oldest is None:
+                # نویسنده در انتظار بافر خالی است: از اینجا تا FLUSH_MS صبر کند
+                self._oldest = time.monotonic()
+                self._cond.notify_all()
+            elif len(self._buffer) >= self.flush_rows:
+                self._cond.notify_all()
+        return True
+
+    def on_written(self, callback: Callable[[], None]):
+        """
+        callback در thread نویسنده بعد از ذخیره همه خوانش‌هایی که تا الان add
+        شده‌اند (بافر، دسته در حال نوشتن و spool) — بدون انتظار فراخواننده
+        """
+        self.start()
+        with self._cond:
+            if self.spool_backlog:
+                # replay فقط با بافر خالی اجرا می‌شود؛ خالی شدن spool یعنی همه قبلی‌ها نوشته شده‌اند
+                self._spool_waiters.append(callback)
+            else:
+                self._waiters.append(callback)
+                if not self._buffer:
+                    self._cond.notify_all()
+
+    @staticmethod
+    def _run_callbacks(callbacks: List[Callable[[], None]]):
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"خطا در callback بعد از نوشتن خوانش‌ها: {e}")
+
+    def _to_spool(self, batch: ReadingBatch) -> bool:
+        try:
+            self.spooled += self.spool.append(batch)
+        except Exception as e:
+            self.rejected += len(batch)
+            logger.error(f"نوشتن {len(batch)} خوانش در spool ناموفق: {e}")
+            return False
+        self._cond.notify_all()  # replay در thread نویسنده
+        return True
+
+    @property
+    def spool_backlog(self) -> int:
+        return self.spool.backlog_rows if self.spool is not None else 0
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """نوشتن فوری هر چه در بافر (و spool) است؛ True اگر تا timeout خالی شد"""
+        if self._thread is None:
+            return not self.pending
+        deadline = time.monotonic() + (self.block_seconds if timeout is None else timeout)
+        with self._cond:
+            self._force = True
+            self._cond.notify_all()
+            while self.pending or self.spool_backlog:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout: float = 10.0):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.pending:
+            logger.error(f"⚠️ {self.pending:,} خوانش هنگام توقف نوشته نشد")
+        if self.spool is not None and (self._thread is None or not self._thread.is_alive()):
+            if self.spool.backlog_rows:
+                logger.warning(f"📼 {self.spool.backlog_rows:,} خوانش در spool برای اجرای بعدی ماند")
+            self.spool.close()
+
+    def stats(self) -> dict:
+        stats = {
+            "pending": self.pending,
+            "written": self.written,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+            "spooled": self.spooled,
+            "last_flush_ms": round(self.last_flush_ms, 1),
+        }
+        if self.spool is not None:
+            stats["spool"] = self.spool.stats()
+        return stats
+
+    # ── نویسنده ────────────────────────────────────────────
+    def _due(self) -> bool:
+        if not self._buffer:
+            return False
+        return (
+            self._force
+            or self._stopping
+            or len(self._buffer) >= self.flush_rows
+            or time.monotonic() - self._oldest >= self.flush_seconds
+        )
+
+    def _replay_due(self) -> bool:
+        return (
+            self.spool_backlog > 0
+            and not self._stopping
+            and time.monotonic() >= self._retry_at
+        )
+
+    def _idle_timeout(self) -> Optional[float]:
+        """انتظار بافر خالی: تا تلاش بعدی replay (یا بی‌نهایت)"""
+        if self.spool_backlog and not self._stopping:
+            return max(0.0, self._retry_at - time.monotonic())
+        return None
+
+    def _run(self):
+        backoff = 0.5
+        shutdown_attempts = 0
+        while True:
+            ready = []
+            with self._cond:
+                while not self._due():
+                    if self._stopping and not self._buffer:
+                        return
+                    if self._replay_due():
+                        break
+                    if not self._buffer:
+                        if not self.spool_backlog:
+                            self._force = False
+                        if self._waiters:
+                            # بافر خالی: منتظرها چیزی برای انتظار ندارند
+                            ready, self._waiters = self._waiters, []
+                            break
+                        self._cond.notify_all()  # flush() منتظر خالی شدن است
+                        self._cond.wait(self._idle_timeout())
+                    else:
+                        self._cond.wait(max(0.0, self.flush_seconds - (time.monotonic() - self._oldest)))
+                if ready:
+                    batch = None
+                elif self._due():
+                    batch, self._buffer = self._buffer, ReadingBatch()
+                    callbacks, self._waiters = self._waiters, []
+                    self._oldest = None
+                    self._in_flight = len(batch)
+                    self._cond.notify_all()  # جا برای تولیدکننده‌های منتظر
+                else:
+                    batch = None
+
+            if ready:
+                self._run_callbacks(ready)
+                continue
+            if batch is None:
+                # بافر زنده خالی است: یک دسته از spool (به ترتیب)
+                ok = self._replay()
+                if ok and not self.spool_backlog:
+                    with self._cond:
+                        ready, self._spool_waiters = self._spool_waiters, []
+            else:
+                ok = self._write(batch)
+                if ok:
+                    ready = callbacks
+
+            with self._cond:
+                self._in_flight = 0
+                if batch is not None and not ok:
+                    if self.spool is not None:
+                        # دیتابیس در دسترس نیست: دسته روی دیسک، حافظه آزاد
+                        if self._to_spool(batch):
+                            self._spool_waiters.extend(callbacks)
+                        else:
+                            ready = callbacks  # ردیف‌ها از دست رفتند؛ منتظرها معطل نمانند
+                    else:
+                        # دسته به ابتدای بافر برمی‌گردد (ترتیب زمانی حفظ می‌شود)
+                        batch.extend(self._buffer)
+                        self._buffer = batch
+                        self._waiters = callbacks + self._waiters
+                        self._oldest = time.monotonic()
+                self._cond.notify_all()
+            self._run_callbacks(ready)
+
+            if ok:
+                backoff = 0.5
+                continue
+            if self._stopping:
+                if self.spool is not None:
+                    # باقی بافر هم بدون انتظار روی دیسک می‌رود
+                    continue
+                shutdown_attempts += 1
+                if shutdown_attempts >= SHUTDOWN_ATTEMPTS:
+                    return
+            self._retry_at = time.monotonic() + backoff
+            if batch is not None or self.spool is None:
+                time.sleep(backoff)
+            backoff = min(MAX_BACKOFF_SECONDS, backoff * 2)
+
+    def _replay(self) -> bool:
+        try:
+            batch, position = self.spool.read(self.flush_rows)
+        except Exception as e:
+            logger.error(f"خواندن spool ناموفق: {e}")
+            return False
+        if batch is None:
+            return True
+        if not self._write(batch):
+            return False
+        self.spool.commit(position)
+        if not self.spool.backlog_rows:
+            logger.info(f"✅ spool خالی شد ({self.spool.replayed:,} خوانش دوباره درج شد)")
+        return True
+
+    def _write(self, batch: ReadingBatch) -> bool:
+        """False = خطای اتصال (دوباره تلاش شود)؛ خطای داده ردیف‌های خراب را جدا و لاگ می‌کند"""
+        from django.db import DataError, IntegrityError, connections
+
+        started = time.monotonic()
+        dropped = self.dropped
+        try:
+            self._insert(batch)
+        except (IntegrityError, DataError) as e:
+            logger.warning(f"خطای داده در نوشتن {len(batch)} خوانش، جداسازی ردیف‌های خراب: {e}")
+            self._insert_isolating(batch)
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"نوشتن {len(batch):,} خوانش ناموفق، تلاش مجدد: {e}")
+            # اتصال خراب بسته شود تا تلاش بعدی اتصال تازه بگیرد
+            connections[self.using].close()
+            return False
+        self.written += len(batch) - (self.dropped - dropped)
+        self.flushes += 1
+        self.last_flush_ms = (time.monotonic() - started) * 1000
+        return True
+
+    def _insert(self, batch: ReadingBatch):
+        from django.db import transaction
+        with transaction.atomic(using=self.using):
+            batch.insert(using=self.using)
+
+    def _insert_isolating(self, batch: ReadingBatch):
+        """نصف کردن دسته تا رسیدن به ردیف‌های خراب (log n تراکنش)"""
+        from django.db import DataError, IntegrityError
+
+        try:
+            self._insert(batch)
+            return
+        except (IntegrityError, DataError) as e:
+            if len(batch) == 1:
+                self.dropped += 1
+                logger.error(
+                    f"خوانش دستگاه #{batch.device_id[0]} @ {batch.timestamp[0]:.3f} نوشته نشد "
+                    f"(مجموع {self.dropped}): {e}"
+                )
+                return
+        half = len(batch) // 2
+        self._insert_isolating(batch.filter([i < half for i in range(len(batch))]))
+        self._insert_isolating(batch.filter([i >= half for i in range(len(batch))]))
+
+
+_writer: Optional[BulkWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_bulk_writer() -> BulkWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            from django.conf import settings
+            spool = None
+            spool_dir = getattr(settings, "SENSOR_SPOOL_DIR", "")
+            if spool_dir:
+                spool = ReadingSpool.open_slot(
+                    spool_dir,
+                    segment_bytes=getattr(settings, "SENSOR_SPOOL_SEGMENT_MB", 8) << 20,
+                    max_bytes=getattr(settings, "SENSOR_SPOOL_MAX_MB", 1024) << 20,
+                )
+            _writer = BulkWriter(
+                flush_ms=getattr(settings, "SENSOR_WRITE_FLUSH_MS", 200),
+                flush_rows=getattr(settings, "SENSOR_WRITE_FLUSH_ROWS", 1000),
+                max_rows=getattr(settings, "SENSOR_WRITE_MAX_ROWS", 100_000),
+                block_seconds=getattr(settings, "SENSOR_WRITE_BLOCK_SECONDS", 5.0),
+                spool=spool,
+            )
+            if spool is not None:
+                from core.metrics import get_registry
+                get_registry().add_spool(spool.directory.name, spool.stats)
+            if spool is not None and spool.backlog_rows:
+                # replay خوانش‌های اجرای قبلی بدون انتظار برای اولین add
+                _writer.start()
+            atexit.register(_writer.stop)
+        return _writer
@@ -152,6 +152,36 @@ class AlertChecker:
         }
     }
 
+    # (نوع دستگاه، نوع هشدار، شدت، فیلد SensorReading، جهت، کلید آستانه، پیام، فقط در وضعیت)
+    RULES = (
+        ('autoclave', 'temp_high', 'critical', 'temperature_c', '>', 'temp_high',
+         "دمای اتوکلاو {value}°C از حد {threshold}°C بالاتر است!", None),
+        ('autoclave', 'temp_low', 'warning', 'temperature_c', '<', 'temp_low',
+         "دمای اتوکلاو {value}°C از حد {threshold}°C پایین‌تر است!", 'sterilizing'),
+        ('autoclave', 'pressure_high', 'critical', 'pressure_bar', '>', 'pressure_high',
+         "فشار {value} bar از حد مجاز {threshold} bar بیشتر است!", None),
+        ('incinerator', 'co_high', 'critical', 'co_ppm', '>', 'co_high',
+         "غلظت CO: {value} ppm - بیش از حد مجاز {threshold} ppm!", None),
+        ('incinerator', 'nox_high', 'warning', 'nox_ppm', '>', 'nox_high',
+         "غلظت NOx: {value} ppm - بیش از حد مجاز {threshold} ppm", None),
+        ('incinerator', 'temp_low', 'warning', 'combustion_temp_c', '<', 'combustion_temp_low',
+         "دمای احتراق {value}°C زیر حد استاندارد {threshold}°C است", None),
+    )
+
+    @classmethod
+    def _violations(cls, device_type, values, status):
+        """(قانون، مقدار) قوانین نقض‌شده برای یک خوانش"""
+        thresholds = cls.THRESHOLDS.get(device_type, {})
+        for rule_type, alert_type, severity, field, op, key, message, only_status in cls.RULES:
+            if rule_type != device_type or thresholds.get(key) is None:
+                continue
+            value = values.get(field)
+            if value is None or value != value or (only_status and status != only_status):
+                continue
+            threshold = thresholds[key]
+            if (value > threshold) if op == '>' else (value < threshold):
+                yield (alert_type, severity, message, threshold), value
+
     @classmethod
     def check_reading(cls, reading):
         """بررسی یک داده سنسور و تولید هشدار در صورت نیاز"""
@@ -159,9 +189,11 @@ class AlertChecker:
 
         alerts_created = []
         device = reading.device
-        device_type = device.device_type
+        values = {rule[3]: getattr(reading, rule[3]) for rule in cls.RULES}
 
-        def create_alert(alert_type, severity, message, value, threshold):
+        for (alert_type, severity, message, threshold), value in cls._violations(
+            device.device_type, values, reading.device_status
+        ):
             # بررسی نداشتن هشدار مشابه باز
             existing = DeviceAlert.objects.filter(
                 device=device,
@@ -169,59 +201,84 @@ class AlertChecker:
                 is_resolved=False,
             ).exists()
             if not existing:
-                alert = DeviceAlert.objects.create(
+                alerts_created.append(DeviceAlert.objects.create(
                     device=device,
                     cycle=reading.cycle,
                     alert_type=alert_type,
                     severity=severity,
-                    message=message,
+                    message=message.format(value=value, threshold=threshold),
                     value=value,
                     threshold=threshold,
-                )
-                alerts_created.append(alert)
-                return alert
-            return None
-
-        if device_type == 'autoclave':
-            thresholds = cls.THRESHOLDS['autoclave']
-
-            if reading.temperature_c is not None:
-                if reading.temperature_c > thresholds['temp_high']:
-                    create_alert('temp_high', 'critical',
-                                 f"دمای اتوکلاو {reading.temperature_c}°C از حد {thresholds['temp_high']}°C بالاتر است!",
-                                 reading.temperature_c, thresholds['temp_high'])
-                elif reading.temperature_c < thresholds['temp_low'] and reading.device_status == 'sterilizing':
-                    create_alert('temp_low', 'warning',
-                                 f"دمای اتوکلاو {reading.temperature_c}°C از حد {thresholds['temp_low']}°C پایین‌تر است!",
-                                 reading.temperature_c, thresholds['temp_low'])
-
-            if reading.pressure_bar is not None:
-                if reading.pressure_bar > thresholds['pressure_high']:
-                    create_alert('pressure_high', 'critical',
-                                 f"فشار {reading.pressure_bar} bar از حد مجاز {thresholds['pressure_high']} bar بیشتر است!",
-                                 reading.pressure_bar, thresholds['pressure_high'])
-
-        elif device_type == 'incinerator':
-            thresholds = cls.THRESHOLDS['incinerator']
-
-            if reading.co_ppm is not None and reading.co_ppm > thresholds['co_high']:
-                create_alert('co_high', 'critical',
-                             f"غلظت CO: {reading.co_ppm} ppm - بیش از حد مجاز {thresholds['co_high']} ppm!",
-                             reading.co_ppm, thresholds['co_high'])
-
-            if reading.nox_ppm is not None and reading.nox_ppm > thresholds['nox_high']:
-                create_alert('nox_high', 'warning',
-                             f"غلظت NOx: {reading.nox_ppm} ppm - بیش از حد مجاز {thresholds['nox_high']} ppm",
-                             reading.nox_ppm, thresholds['nox_high'])
-
-            if reading.combustion_temp_c is not None:
-                if reading.combustion_temp_c < thresholds['combustion_temp_low']:
-                    create_alert('temp_low', 'warning',
-                                 f"دمای احتراق {reading.combustion_temp_c}°C زیر حد استاندارد {thresholds['combustion_temp_low']}°C است",
-                                 reading.combustion_temp_c, thresholds['combustion_temp_low'])
-
+                ))
         return alerts_created
 
+    @classmethod
+    def check_batch(cls, batch, device_types):
+        """
+        همان قوانین check_reading برای یک ReadingBatch کامل (مسیر دسته‌ای MQTT)
+        device_types: device_id → نوع دستگاه
+        مقایسه‌ها برداری (NumPy)؛ فقط اولین نقض هر (دستگاه، نوع هشدار) در دسته
+        بررسی می‌شود و هشدارهای باز با یک SELECT و هشدارهای جدید با یک
+        bulk_create ثبت می‌شوند
+        """
+        from apps.monitoring.models import DeviceAlert
+        from core.reading_batch import DEVICE_STATUSES, np
+
+        if not len(batch):
+            return []
+        # (device_id، نوع هشدار) → (ردیف، قانون، مقدار)
+        candidates = {}
+        if np is not None:
+            device_ids = batch.as_numpy('device_id')
+            statuses = batch.as_numpy('status')
+            by_type = {}
+            for device_id, device_type in device_types.items():
+                by_type.setdefault(device_type, []).append(device_id)
+            for rule_type, alert_type, severity, field, op, key, message, only_status in cls.RULES:
+                threshold = cls.THRESHOLDS.get(rule_type, {}).get(key)
+                if threshold is None or rule_type not in by_type:
+                    continue
+                column = batch.as_numpy(field)
+                hit = (column > threshold) if op == '>' else (column < threshold)
+                hit &= np.isin(device_ids, by_type[rule_type])
+                if only_status:
+                    hit &= statuses == DEVICE_STATUSES.index(only_status)
+                for row in np.flatnonzero(hit).tolist():
+                    candidates.setdefault(
+                        (int(device_ids[row]), alert_type),
+                        (row, (alert_type, severity, message, threshold), float(column[row])),
+                    )
+        else:
+            fields = {rule[3] for rule in cls.RULES}
+            for row in range(len(batch)):
+                device_id = batch.device_id[row]
+                values = {field: getattr(batch, field)[row] for field in fields}
+                status = DEVICE_STATUSES[batch.status[row]]
+                for rule, value in cls._violations(device_types.get(device_id), values, status):
+                    candidates.setdefault((device_id, rule[0]), (row, rule, value))
+        if not candidates:
+            return []
+
+        open_alerts = set(DeviceAlert.objects.filter(
+            device_id__in={device_id for device_id, _ in candidates},
+            alert_type__in={alert_type for _, alert_type in candidates},
+            is_resolved=False,
+        ).values_list('device_id', 'alert_type'))
+        alerts = [
+            DeviceAlert(
+                device_id=device_id,
+                cycle_id=batch.cycle_id[row] or None,
+                alert_type=alert_type,
+                severity=severity,
+                message=message.format(value=value, threshold=threshold),
+                value=value,
+                threshold=threshold,
+            )
+            for (device_id, _), (row, (alert_type, severity, message, threshold), value) in candidates.items()
+            if (device_id, alert_type) not in open_alerts
+        ]
+        return DeviceAlert.objects.bulk_create(alerts)
+
 
 class WasteStatistics:
     """آمار و تحلیل زباله"""
@@ -0,0 +1,99 @@
+"""
+============================================================
+Deadband Compression — ذخیره فقط هنگام تغییر معنادار سیگنال
+============================================================
+اتوکلاوی که ساعت‌ها در حالت idle روی 25°C مانده نیازی به یک ردیف
+SensorReading در هر ۵ ثانیه ندارد. برای هر دستگاه:
+
+- هر متریک یک deadband دارد (مثلاً دما ±0.5°C)؛ تا وقتی همه متریک‌ها
+  داخل deadband آخرین مقدار ذخیره‌شده هستند چیزی ذخیره نمی‌شود
+- تغییر وضعیت (cycle_status، در، کد هشدار) همیشه ذخیره می‌شود
+- heartbeat: حداکثر فاصله بین دو ردیف ذخیره‌شده (حتی بدون تغییر)
+
+صحت انتگرال انرژی (EnergyCalculator — روش ذوزنقه):
+وقتی بعد از یک بازه ثابت تغییری رخ می‌دهد، آخرین نمونه نگه‌داشته‌شده
+(انتهای بازه ثابت) هم قبل از نمونه جدید ذخیره می‌شود. بدون آن، ذوزنقه
+بین ابتدای بازه ثابت و نمونه جدید یک شیب ساختگی می‌سازد (مثلاً ۰ → 18kW
+در طول یک ساعت idle = 9kWh خطا).
+
+نمونه نگه‌داشته‌شده cycle_id زمان خواندن خودش را دارد (نه سیکل بعد از
+تغییر فاز poll جدید) و هنگام توقف polling با flush() ذخیره می‌شود.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+# (مقادیر decode‌شده RegisterMap، timestamp epoch، cycle_id زمان خواندن)
+Sample = Tuple[Dict[str, float], float, Optional[int]]
+
+# کلیدهای RegisterMap.decode → deadband پیش‌فرض
+DEFAULT_DEADBANDS: Dict[str, float] = {
+    "temperature_c": 0.5,         # °C
+    "pressure_bar": 0.02,         # bar
+    "power_consumption_kw": 0.5,  # kW
+    "steam_flow_kg_h": 0.3,       # kg/h
+    "water_level_pct": 2.0,       # %
+}
+
+# هر تغییری در این فیلدها بلافاصله ذخیره می‌شود
+STATE_FIELDS = ("cycle_status", "door_locked", "alarm_code", "cycle_number")
+
+
+class DeadbandCompressor:
+    """report-by-exception برای یک دستگاه"""
+
+    def __init__(self, deadbands: Optional[Dict[str, float]] = None, heartbeat_seconds: float = 300):
+        self.deadbands = dict(DEFAULT_DEADBANDS, **(deadbands or {}))
+        self.heartbeat = heartbeat_seconds
+        self._last_stored: Optional[Sample] = None
+        self._held: Optional[Sample] = None
+        self.offered = 0
+        self.stored = 0
+
+    def _changed(self, values: Dict[str, float], timestamp: float) -> bool:
+        last, last_time, _ = self._last_stored
+        if timestamp - last_time >= self.heartbeat:
+            return True
+        for field in STATE_FIELDS:
+            if values.get(field) != last.get(field):
+                return True
+        for field, band in self.deadbands.items():
+            if abs(values.get(field, 0.0) - last.get(field, 0.0)) > band:
+                return True
+        return False
+
+    def offer(self, values: Dict[str, float], timestamp: float, cycle_id: Optional[int] = None) -> List[Sample]:
+        """
+        نمونه جدید را بررسی می‌کند و لیست نمونه‌هایی که باید ذخیره شوند را
+        برمی‌گرداند: [] (داخل deadband)، [sample] یا [held, sample]
+        """
+        self.offered += 1
+        sample = (values, timestamp, cycle_id)
+        if self._last_stored is None or self._changed(values, timestamp):
+            to_store = [sample]
+            if self._held is not None:
+                to_store.insert(0, self._held)
+            self._held = None
+            self._last_stored = sample
+            self.stored += len(to_store)
+            return to_store
+
+        self._held = sample
+        return []
+
+    def flush(self) -> List[Sample]:
+        """نمونه نگه‌داشته‌شده (انتهای بازه ثابت) — هنگام توقف polling"""
+        held, self._held = self._held, None
+        if held is None:
+            return []
+        self.stored += 1
+        return [held]
+
+
+def compressor_from_settings() -> Optional[DeadbandCompressor]:
+    from django.conf import settings
+    if not getattr(settings, "PLC_COMPRESSION_ENABLED", True):
+        return None
+    return DeadbandCompressor(
+        deadbands=getattr(settings, "PLC_DEADBANDS", None),
+        heartbeat_seconds=getattr(settings, "PLC_HEARTBEAT_SECONDS", 300),
+    )
@@ -0,0 +1,314 @@
+"""
+============================================================
+Device State Tracker — وضعیت دستگاه و سیکل فعال در حافظه
+============================================================
+قبلاً هر poll و هر پیام MQTT یک Device.objects.get و یک فیلتر
+DeviceCycle برای سیکل فعال اجرا می‌کرد. tracker برای هر دستگاه ردیف
+Device و سیکل فعال را نگه می‌دارد و فقط در تغییر فاز به دیتابیس می‌رود:
+
+- idle/complete → heating:     باز کردن DeviceCycle جدید
+- heating → sterilizing → …:   به‌روزرسانی status سیکل
+- → complete:                  بستن سیکل؛ calculate_cycle_energy_task با
+                               dispatch_completed بعد از نوشته شدن خوانش‌ها
+                               (BulkWriter.on_written، بدون انتظار thread poll)
+- → idle (بدون complete):      سیکل aborted (توقف دستی روی PLC)
+- → error:                     سیکل error
+
+سیگنال‌های مدل (apps/devices/signals.py) کش را با تغییرات همین پروسه
+هم‌گام نگه می‌دارند؛ تغییرات پروسه‌های دیگر (مثلاً شروع دستی سیکل از
+پنل وب) حداکثر بعد از REFRESH_SECONDS دیده می‌شوند.
+
+    state = get_device_tracker().get(device_id)     # بدون SELECT در حالت پایدار
+    states = get_device_tracker().by_serials(serials)  # دسته MQTT: حداکثر دو SELECT
+    cycle = get_device_tracker().observe(state, "sterilizing", timestamp)
+    get_bulk_writer().add(batch); get_device_tracker().dispatch_completed()
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# فاز PLC/MQTT → status سیکل؛ burning زباله‌سوز همان مرحله اصلی تیمار است
+CYCLE_PHASES = {
+    "heating": "heating",
+    "sterilizing": "sterilizing",
+    "burning": "sterilizing",
+    "cooling": "cooling",
+}
+ACTIVE_CYCLE_STATUSES = ("heating", "sterilizing", "cooling")
+
+# بارگذاری مجدد دوره‌ای برای دیدن تغییرات پروسه‌های دیگر
+REFRESH_SECONDS = 300
+# دیتابیس در دسترس نیست: وضعیت قبلی تا این مدت دیگر استفاده می‌شود
+# (خوانش‌ها در spool نویسنده ذخیره می‌شوند به جای دور ریخته شدن)
+STALE_RETRY_SECONDS = 30
+
+
+class DeviceState:
+    __slots__ = ("device", "cycle", "phase", "loaded_at")
+
+    def __init__(self, device, cycle):
+        self.device = device
+        self.cycle = cycle
+        self.phase: Optional[str] = None
+        self.loaded_at = time.monotonic()
+
+    @property
+    def cycle_id(self) -> Optional[int]:
+        return self.cycle.pk if self.cycle else None
+
+
+class DeviceStateTracker:
+    def __init__(self):
+        self._states: Dict[int, DeviceState] = {}
+        self._by_serial: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # سیکل‌های complete که محاسبه انرژی‌شان هنوز در صف نرفته
+        self._completed: List[int] = []
+
+    # ── بارگذاری ──────────────────────────────────────────
+    def _load(self, device) -> DeviceState:
+        return self._load_many([device])[0]
+
+    def _load_many(self, devices: List) -> List[DeviceState]:
+        """سیکل فعال همه دستگاه‌ها با یک SELECT (جدیدترین سیکل هر دستگاه)"""
+        from apps.devices.models import DeviceCycle
+
+        cycles = {}
+        for cycle in DeviceCycle.objects.filter(
+            device__in=devices, status__in=ACTIVE_CYCLE_STATUSES
+        ).order_by("device_id", "-start_time"):
+            cycles.setdefault(cycle.device_id, cycle)
+
+        states = []
+        with self._lock:
+            for device in devices:
+                state = DeviceState(device, cycles.get(device.pk))
+                previous = self._states.get(device.pk)
+                if previous is not None:
+                    state.phase = previous.phase
+                self._states[device.pk] = state
+                self._by_serial[device.serial_number] = device.pk
+                states.append(state)
+        return states
+
+    def _fresh(self, state: Optional[DeviceState]) -> bool:
+        return state is not None and time.monotonic() - state.loaded_at < REFRESH_SECONDS
+
+    def get(self, device_id: int) -> DeviceState:
+        """Device.DoesNotExist اگر دستگاه وجود نداشته باشد"""
+        state = self._states.get(device_id)
+        if self._fresh(state):
+            return state
+        from apps.devices.models import Device
+        try:
+            return self._load(Device.objects.get(pk=device_id))
+        except Device.DoesNotExist:
+            raise
+        except Exception as e:
+            if state is None:
+                raise
+            return self._stale(state, e)
+
+    def by_serial(self, serial: str) -> Optional[DeviceState]:
+        """دستگاه فعال با این سریال (مسیر MQTT) یا None"""
+        state = self._states.get(self._by_serial.get(serial))
+        if not self._fresh(state):
+            from apps.devices.models import Device
+            try:
+                device = Device.objects.filter(serial_number=serial).first()
+                if device is None:
+                    return None
+                state = self._load(device)
+            except Exception as e:
+                if state is None:
+                    raise
+                state = self._stale(state, e)
+        return state if state.device.is_active else None
+
+    def by_serials(self, serials: Iterable[str]) -> Dict[str, DeviceState]:
+        """
+        serial → وضعیت دستگاه فعال برای یک دسته پیام MQTT
+        سریال‌های کش‌نشده با یک SELECT دستگاه + یک SELECT سیکل بارگذاری می‌شوند؛
+        سریال ناشناخته یا دستگاه غیرفعال در خروجی نیست
+        """
+        found: Dict[str, DeviceState] = {}
+        missing: Dict[str, Optional[DeviceState]] = {}
+        for serial in serials:
+            state = self._states.get(self._by_serial.get(serial))
+            if self._fresh(state):
+                found[serial] = state
+            else:
+                missing[serial] = state
+        if missing:
+            from apps.devices.models import Device
+            try:
+                devices = list(Device.objects.filter(serial_number__in=list(missing)))
+                for state in self._load_many(devices):
+                    found[state.device.serial_number] = state
+            except Exception as e:
+                for serial, state in missing.items():
+                    if state is not None:
+                        found[serial] = self._stale(state, e)
+        return {serial: state for serial, state in found.items() if state.device.is_active}
+
+    def _stale(self, state: DeviceState, error: Exception) -> DeviceState:
+        logger.warning(f"بارگذاری مجدد دستگاه #{state.device.pk} ناموفق، ادامه با وضعیت قبلی: {error}")
+        state.loaded_at = time.monotonic() - REFRESH_SECONDS + STALE_RETRY_SECONDS
+        return state
+
+    # ── تغییر فاز ─────────────────────────────────────────
+    def observe(self, state: DeviceState, phase: str, timestamp: datetime):
+        """
+        فاز گزارش‌شده PLC/سنسور → باز/بستن DeviceCycle در صورت نیاز
+        خروجی: سیکل فعال بعد از این خوانش (برای cycle_id)
+        فاز و سیکل در حافظه فقط بعد از نوشتن موفق در دیتابیس عوض می‌شوند؛
+        با قطعی دیتابیس خوانش بعدی همان تغییر را دوباره امتحان می‌کند
+        """
+        previous = state.phase
+        if phase == previous:
+            return state.cycle
+
+        try:
+            cycle_status = CYCLE_PHASES.get(phase)
+            if cycle_status:
+                if state.cycle is None:
+                    self._open(state, cycle_status, timestamp)
+                elif state.cycle.status != cycle_status:
+                    self._save_cycle(state.cycle, status=cycle_status)
+            elif state.cycle is not None and previous is not None:
+                end_status = {"complete": "complete", "error": "error"}.get(phase, "aborted")
+                self._close(state, end_status, timestamp)
+            elif state.cycle is not None and self._ran_on_plc(state.cycle):
+                # اولین خوانش بعد از راه‌اندازی: سیکلی که PLC قبل از restart اجرا
+                # می‌کرد و دیگر در جریان نیست بسته می‌شود تا سیکل بعدی PLC با آن
+                # ادغام نشود؛ سیکل شروع‌شده از پنل که PLC هنوز اجرا نکرده می‌ماند
+                self._close(state, "error" if phase == "error" else "aborted", timestamp)
+            state.phase = phase
+        except Exception as e:
+            logger.error(f"خطا در ثبت تغییر فاز دستگاه #{state.device.pk} ({previous} → {phase}): {e}")
+        return state.cycle
+
+    @staticmethod
+    def _ran_on_plc(cycle) -> bool:
+        """
+        آیا PLC این سیکل را اجرا کرده است؟ (فقط اولین خوانش بعد از بارگذاری)
+        پنل سیکل را با heating می‌سازد؛ sterilizing/cooling یا خوانش با فاز فعال
+        یعنی PLC آن را پیش برده است
+        """
+        if cycle.status != "heating":
+            return True
+        from apps.monitoring.models import SensorReading
+        return SensorReading.objects.filter(cycle=cycle, device_status__in=list(CYCLE_PHASES)).exists()
+
+    @staticmethod
+    def _save_cycle(cycle, **fields):
+        """ذخیره فیلدهای سیکل؛ با خطای دیتابیس نمونه حافظه به مقادیر قبلی برمی‌گردد"""
+        old = {name: getattr(cycle, name) for name in fields}
+        for name, value in fields.items():
+            setattr(cycle, name, value)
+        try:
+            cycle.save(update_fields=list(fields))
+        except Exception:
+            for name, value in old.items():
+                setattr(cycle, name, value)
+            raise
+
+    def _open(self, state: DeviceState, cycle_status: str, timestamp: datetime):
+        from django.db.models import Max
+        from apps.devices.models import DeviceCycle
+
+        last = DeviceCycle.objects.filter(device=state.device).aggregate(n=Max("cycle_number"))["n"]
+        state.cycle = DeviceCycle.objects.create(
+            device=state.device,
+            cycle_number=(last or 0) + 1,
+            status=cycle_status,
+            start_time=timestamp,
+            notes="شروع خودکار از وضعیت PLC",
+        )
+        logger.info(f"🔄 سیکل #{state.cycle.cycle_number} دستگاه #{state.device.pk} باز شد ({cycle_status})")
+
+    def _close(self, state: DeviceState, end_status: str, timestamp: datetime):
+        cycle = state.cycle
+        self._save_cycle(cycle, status=end_status, end_time=timestamp)
+        state.cycle = None
+        logger.info(f"🏁 سیکل #{cycle.cycle_number} دستگاه #{state.device.pk} بسته شد ({end_status})")
+        if end_status == "complete":
+            with self._lock:
+                self._completed.append(cycle.pk)
+
+    def dispatch_completed(self):
+        """
+        صف calculate_cycle_energy_task سیکل‌های complete — بعد از اضافه شدن
+        خوانش‌های همان poll/دسته (از جمله خوانش پایانی) به BulkWriter صدا زده
+        می‌شود؛ تسک در thread نویسنده و بعد از ذخیره آن خوانش‌ها صف می‌شود
+        """
+        if not self._completed:
+            return
+        with self._lock:
+            completed, self._completed = self._completed, []
+        from core.bulk_writer import get_bulk_writer
+        get_bulk_writer().on_written(lambda: _queue_energy(completed))
+
+    # ── سیگنال‌ها ──────────────────────────────────────────
+    def device_saved(self, device):
+        state = self._states.get(device.pk)
+        if state is None:
+            return
+        if state.device is not device:
+            # ردیف از جای دیگر ذخیره شده؛ نمونه جدید جایگزین شود
+            state.device = device
+        with self._lock:
+            self._by_serial[device.serial_number] = device.pk
+
+    def device_deleted(self, device):
+        with self._lock:
+            self._states.pop(device.pk, None)
+            self._by_serial.pop(device.serial_number, None)
+
+    def forget(self, device_id: int):
+        """حذف از کش بدون نمونه Device (مثلاً polling دستگاه در این پروسه متوقف شد)"""
+        with self._lock:
+            state = self._states.pop(device_id, None)
+            if state is not None:
+                self._by_serial.pop(state.device.serial_number, None)
+
+    def cycle_saved(self, cycle):
+        state = self._states.get(cycle.device_id)
+        if state is None:
+            return
+        if cycle.status in ACTIVE_CYCLE_STATUSES:
+            state.cycle = cycle
+        elif state.cycle is not None and state.cycle.pk == cycle.pk:
+            state.cycle = None
+
+    def cycle_deleted(self, cycle):
+        state = self._states.get(cycle.device_id)
+        if state is not None and state.cycle is not None and state.cycle.pk == cycle.pk:
+            state.cycle = None
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+            self._by_serial.clear()
+
+
+def _queue_energy(cycle_ids: List[int]):
+    """در thread نویسنده (BulkWriter.on_written) اجرا می‌شود"""
+    from apps.monitoring.tasks import calculate_cycle_energy_task
+    for cycle_id in cycle_ids:
+        try:
+            calculate_cycle_energy_task.delay(cycle_id)
+        except Exception as e:
+            logger.error(f"صف محاسبه انرژی سیکل {cycle_id} ناموفق: {e}")
+
+
+_tracker = DeviceStateTracker()
+
+
+def get_device_tracker() -> DeviceStateTracker:
+    return _tracker
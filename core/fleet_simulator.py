@@ -0,0 +1,349 @@
+"""
+============================================================
+Fleet Simulator — شبیه‌ساز برداری ناوگان اتوکلاو و زباله‌سوز (NumPy)
+============================================================
+AutoclaveSimulator و simulate_sensor_data هر بار یک خوانش با
+random.uniform می‌سازند و مدلی برای فیزیک زباله‌سوز ندارند. این
+شبیه‌ساز وضعیت هزاران دستگاه را در آرایه‌های NumPy نگه می‌دارد و هر
+tick همه را با چند عملیات برداری جلو می‌برد:
+
+- اتوکلاو: idle → heating (نرخ گرمایش هر دستگاه) → sterilizing
+  (121 یا 134°C، فشار از منحنی اشباع بخار) → cooling (سرمایش نیوتنی)
+  → complete → idle
+- زباله‌سوز: idle → heating (پیش‌گرم تا 850°C در محفظه ثانویه)
+  → burning (نوسان AR(1) دما، CO/NOx تابع دمای احتراق) → cooling
+- خرابی تصادفی (MTBF) → error + alarm_code، ریست بعد از چند دقیقه
+
+زمان شبیه‌سازی‌شده است (dt ثانیه در هر tick)، پس چند ساعت بار واقعی
+در چند ثانیه تولید می‌شود. با seed یکسان خروجی دقیقاً تکرار می‌شود.
+
+    fleet = FleetSimulator(autoclaves=5000, incinerators=500, seed=42)
+    fleet.step(dt=5)
+    batch = fleet.batch()            # ReadingBatch ستونی → batch.insert()
+    for serial, payload in fleet.payloads(): ...   # JSON هم‌شکل MQTT
+
+    python manage.py simulate_fleet --autoclaves 5000 --incinerators 500 --hours 4
+"""
+
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.reading_batch import DEVICE_STATUSES, FLAG_COLUMNS, ReadingBatch
+
+IDLE, HEATING, STERILIZING, COOLING, COMPLETE, ERROR, BURNING = (
+    DEVICE_STATUSES.index(s)
+    for s in ("idle", "heating", "sterilizing", "cooling", "complete", "error", "burning")
+)
+
+AMBIENT_C = 25.0
+SQRT3 = np.sqrt(3.0)
+POWER_FACTOR = 0.9
+
+# کلید payload MQTT (handle_sensor_data) → (ستون، رقم اعشار)
+PAYLOAD_FIELDS = {
+    "temp_c": ("temperature_c", 1),
+    "pressure": ("pressure_bar", 2),
+    "steam_flow": ("steam_flow_kg_h", 1),
+    "water_level": ("water_level_pct", 0),
+    "combustion_temp": ("combustion_temp_c", 0),
+    "post_combustion_temp": ("post_combustion_temp_c", 0),
+    "exhaust_temp": ("exhaust_temp_c", 0),
+    "co2": ("co2_ppm", 0),
+    "co": ("co_ppm", 0),
+    "nox": ("nox_ppm", 0),
+    "so2": ("so2_ppm", 0),
+    "fuel_flow": ("fuel_flow_lh", 1),
+    "power_kw": ("power_consumption_kw", 1),
+    "voltage": ("voltage_v", 0),
+    "current": ("current_a", 1),
+}
+
+
+def saturation_pressure_bar(temp_c):
+    """فشار gauge بخار اشباع (Antoine، آب 99..374°C)؛ زیر 100°C صفر"""
+    mmhg = 10 ** (8.14019 - 1810.94 / (244.485 + temp_c))
+    return np.maximum(0.0, mmhg / 750.062 - 1.01325)
+
+
+def _decay(dt: float, tau):
+    """ضریب نزدیک شدن به مقدار هدف در dt ثانیه با ثابت زمانی tau"""
+    return 1.0 - np.exp(-dt / tau)
+
+
+# ============================================================
+# BASE
+# ============================================================
+class _Fleet:
+    """وضعیت مشترک: فاز، زمان در فاز، شمارنده سیکل و هشدار"""
+
+    def __init__(self, n: int, rng: np.random.Generator, mean_idle_seconds: float, mtbf_hours: float):
+        self.n = n
+        self.rng = rng
+        self.mean_idle_seconds = mean_idle_seconds
+        self.mtbf_seconds = mtbf_hours * 3600
+        self.phase = np.zeros(n, dtype=np.uint8)
+        self.elapsed = np.zeros(n)
+        self.cycle_number = np.zeros(n, dtype=np.int64)
+        self.total_cycles = rng.integers(50, 2000, n)
+        self.alarm_code = np.zeros(n, dtype=np.int64)
+        self.power = np.zeros(n)
+
+    def _enter(self, mask, phase: int):
+        self.phase[mask] = phase
+        self.elapsed[mask] = 0.0
+
+    def _chance(self, dt: float, mean_seconds: float):
+        """رخداد Poisson با میانگین mean_seconds در این tick"""
+        return self.rng.random(self.n) < -np.expm1(-dt / mean_seconds)
+
+    def _transitions(self, dt: float, running, start_phase: int, unload_seconds: float = 300.0):
+        """شروع سیکل، تخلیه بعد از complete، خرابی و ریست هشدار"""
+        phase = self.phase
+        done = (phase == COMPLETE) & (self.elapsed >= unload_seconds)
+        self._enter(done, IDLE)
+
+        start = (phase == IDLE) & self._chance(dt, self.mean_idle_seconds)
+        self._enter(start, start_phase)
+        self.cycle_number[start] += 1
+        self.total_cycles[start] += 1
+
+        if self.mtbf_seconds:
+            fault = running & self._chance(dt, self.mtbf_seconds)
+            self.alarm_code[fault] = self.rng.integers(1, 10, int(fault.sum()))
+            self._enter(fault, ERROR)
+
+        reset = (phase == ERROR) & (self.elapsed >= 600)
+        self.alarm_code[reset] = 0
+        self._enter(reset, IDLE)
+
+    def _electrical(self, columns: Dict[str, np.ndarray], noise):
+        power = np.maximum(0.0, self.power + 0.3 * noise[0])
+        voltage = 380.0 + 2.0 * noise[1]
+        columns["power_consumption_kw"] = power
+        columns["voltage_v"] = voltage
+        columns["current_a"] = power * 1000 / (SQRT3 * voltage * POWER_FACTOR)
+
+
+# ============================================================
+# AUTOCLAVE
+# ============================================================
+class AutoclaveFleet(_Fleet):
+    def __init__(self, n: int, rng: np.random.Generator, mean_idle_seconds: float = 1800, mtbf_hours: float = 500):
+        super().__init__(n, rng, mean_idle_seconds, mtbf_hours)
+        self.setpoint = rng.choice([121.0, 134.0], n, p=[0.7, 0.3])
+        self.hold_seconds = np.where(self.setpoint == 121.0, 900.0, 240.0)
+        self.heat_rate = np.clip(rng.normal(0.1, 0.01, n), 0.05, None)      # °C/s
+        self.cool_tau = np.clip(rng.normal(650, 60, n), 300, None)          # s
+        self.rated_kw = rng.choice([12.0, 18.0, 24.0], n)
+        self.water_level = rng.uniform(70, 80, n)
+        self.temp = np.full(n, AMBIENT_C)
+
+    def step(self, dt: float):
+        phase, temp = self.phase, self.temp
+        self.elapsed += dt
+        self._transitions(dt, (phase == HEATING) | (phase == STERILIZING), HEATING)
+
+        heating = phase == HEATING
+        sterilizing = phase == STERILIZING
+        cooling = phase == COOLING
+        resting = ~(heating | sterilizing)
+
+        temp[heating] += self.heat_rate[heating] * dt
+        temp[sterilizing] = self.setpoint[sterilizing]
+        temp[resting] += (AMBIENT_C - temp[resting]) * _decay(dt, self.cool_tau[resting])
+
+        self.power = np.select(
+            [heating, sterilizing, cooling], [self.rated_kw, self.rated_kw * 0.45, 0.5], 0.1
+        )
+
+        self._enter(heating & (temp >= self.setpoint - 0.5), STERILIZING)
+        self._enter(sterilizing & (self.elapsed >= self.hold_seconds), COOLING)
+        self._enter(cooling & (temp <= 42.0), COMPLETE)
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        noise = self.rng.standard_normal((5, self.n))
+        phase = self.phase
+        in_cycle = (phase != IDLE) & (phase != COMPLETE)
+        temp = self.temp + 0.2 * noise[2]
+        columns = {
+            "status": phase,
+            "temperature_c": temp,
+            "pressure_bar": np.maximum(0.0, saturation_pressure_bar(self.temp) + 0.01 * noise[3]),
+            "steam_flow_kg_h": np.select(
+                [phase == HEATING, phase == STERILIZING], [10.0 + 0.5 * noise[4], 8.2 + 0.3 * noise[4]], 0.0
+            ),
+            "water_level_pct": self.water_level + noise[4],
+            "door_locked": in_cycle.astype(np.int8),
+            "heater_on": (phase == HEATING).astype(np.int8),
+            "pump_on": ((phase == HEATING) | (phase == STERILIZING)).astype(np.int8),
+            "cycle_number": self.cycle_number,
+            "total_cycles": self.total_cycles,
+            "alarm_code": self.alarm_code,
+        }
+        self._electrical(columns, noise)
+        return columns
+
+
+# ============================================================
+# INCINERATOR
+# ============================================================
+class IncineratorFleet(_Fleet):
+    def __init__(self, n: int, rng: np.random.Generator, mean_idle_seconds: float = 7200, mtbf_hours: float = 300):
+        super().__init__(n, rng, mean_idle_seconds, mtbf_hours)
+        self.preheat_rate = np.clip(rng.normal(0.5, 0.05, n), 0.2, None)    # °C/s
+        self.burn_seconds = rng.uniform(2 * 3600, 4 * 3600, n)
+        self.setpoint = rng.normal(900, 15, n)
+        self.so2_base = rng.uniform(30, 70, n)  # وابسته به ترکیب پسماند
+        self.temp = np.full(n, AMBIENT_C)        # محفظه اصلی
+        self.temp2 = np.full(n, AMBIENT_C)       # محفظه ثانویه (post-combustion)
+
+    def step(self, dt: float):
+        phase, temp, temp2 = self.phase, self.temp, self.temp2
+        self.elapsed += dt
+        self._transitions(dt, phase == BURNING, HEATING)
+
+        heating = phase == HEATING
+        burning = phase == BURNING
+        cooling = phase == COOLING
+        resting = ~(heating | burning)
+
+        temp[heating] += self.preheat_rate[heating] * dt
+        # AR(1) حول نقطه کار: ثابت زمانی ۵ دقیقه، انحراف معیار ایستا ۲۵°C
+        phi = np.exp(-dt / 300)
+        temp[burning] = (
+            self.setpoint[burning]
+            + (temp[burning] - self.setpoint[burning]) * phi
+            + 25 * np.sqrt(1 - phi ** 2) * self.rng.standard_normal(int(burning.sum()))
+        )
+        temp[resting] += (AMBIENT_C - temp[resting]) * _decay(dt, 3000.0)
+        # محفظه ثانویه با تأخیر ۲ دقیقه‌ای دمای محفظه اصلی (+ مشعل ثانویه) را دنبال می‌کند
+        target2 = np.where(heating | burning, temp * 1.05 + 20, temp)
+        temp2 += (target2 - temp2) * _decay(dt, 120.0)
+
+        self.power = np.select([heating, burning, cooling], [20.0, 25.0, 10.0], 0.5)
+
+        self._enter(heating & (temp >= 850) & (temp2 >= 850), BURNING)
+        self._enter(burning & (self.elapsed >= self.burn_seconds), COOLING)
+        self._enter(cooling & (temp <= 150), COMPLETE)
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        noise = self.rng.standard_normal((7, self.n))
+        phase, temp = self.phase, self.temp
+        heating = phase == HEATING
+        burning = phase == BURNING
+        firing = heating | burning
+        columns = {
+            "status": phase,
+            "combustion_temp_c": temp + 3 * noise[2],
+            "post_combustion_temp_c": self.temp2 + 3 * noise[3],
+            "exhaust_temp_c": AMBIENT_C + (self.temp2 - AMBIENT_C) * 0.19 + 2 * noise[4],
+            # احتراق ناقص در دمای پایین‌تر → CO بیشتر؛ NOx حرارتی با دما بالا می‌رود
+            "co_ppm": np.maximum(0.0, np.where(
+                burning, 30 * np.exp((900 - temp) / 60), np.where(heating, 20.0, 0.0)
+            ) + 3 * noise[5] * firing),
+            "nox_ppm": np.maximum(0.0, np.where(
+                burning, 150 + 0.8 * (temp - 900), np.where(heating, 80.0, 0.0)
+            ) + 5 * noise[6] * firing),
+            "so2_ppm": np.maximum(0.0, np.where(burning, self.so2_base, np.where(heating, 5.0, 0.0))
+                                  + 3 * noise[5] * firing),
+            "co2_ppm": np.maximum(0.0, np.select([burning, heating], [5000.0, 3000.0], 400.0) + 100 * noise[6]),
+            "fuel_flow_lh": np.select([heating, burning], [12.0, 8.0], 0.0) + 0.3 * noise[4] * firing,
+            "door_locked": ((phase != IDLE) & (phase != COMPLETE)).astype(np.int8),
+            "cycle_number": self.cycle_number,
+            "total_cycles": self.total_cycles,
+            "alarm_code": self.alarm_code,
+        }
+        self._electrical(columns, noise)
+        return columns
+
+
+# ============================================================
+# FLEET SIMULATOR
+# ============================================================
+class FleetSimulator:
+    """
+    اتوکلاوها اول، بعد زباله‌سوزها؛ ردیف i همیشه همان دستگاه است
+    device_ids / serials: شناسه Device متناظر هر ردیف (پیش‌فرض 1..N و AC-00001/IN-00001)
+    """
+
+    def __init__(
+        self,
+        autoclaves: int = 100,
+        incinerators: int = 10,
+        seed: int = 0,
+        start: Optional[float] = None,
+        device_ids: Optional[Sequence[int]] = None,
+        serials: Optional[Sequence[str]] = None,
+        autoclave_idle_seconds: float = 1800,
+        incinerator_idle_seconds: float = 7200,
+        mtbf_hours: float = 500,
+    ):
+        rng = np.random.default_rng(seed)
+        self.autoclaves = AutoclaveFleet(autoclaves, rng, autoclave_idle_seconds, mtbf_hours)
+        self.incinerators = IncineratorFleet(incinerators, rng, incinerator_idle_seconds, mtbf_hours)
+        self.size = autoclaves + incinerators
+        self.now = time.time() if start is None else start
+        # هر دستگاه در لحظه متفاوتی از tick نمونه می‌گیرد (مثل pollerهای مستقل)
+        self._offsets = rng.uniform(0, 1, self.size)
+        self._dt = 0.0
+
+        self.device_ids = np.asarray(device_ids if device_ids is not None else np.arange(1, self.size + 1),
+                                     dtype=np.int64)
+        self.serials = list(serials) if serials is not None else (
+            [f"AC-{i:05d}" for i in range(1, autoclaves + 1)]
+            + [f"IN-{i:05d}" for i in range(1, incinerators + 1)]
+        )
+        if len(self.device_ids) != self.size or len(self.serials) != self.size:
+            raise ValueError(f"تعداد شناسه‌ها با اندازه ناوگان ({self.size}) برابر نیست")
+
+    def step(self, dt: float = 1.0):
+        """جلو بردن کل ناوگان به اندازه dt ثانیه (زمان شبیه‌سازی‌شده)"""
+        self.autoclaves.step(dt)
+        self.incinerators.step(dt)
+        self.now += dt
+        self._dt = dt
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """یک خوانش برای هر دستگاه: ستون‌ها هم‌نام ReadingBatch/SensorReading؛ نامرتبط = NaN / -1"""
+        parts = (self.autoclaves.columns(), self.incinerators.columns())
+        sizes = (self.autoclaves.n, self.incinerators.n)
+        columns = {}
+        for name in set(parts[0]) | set(parts[1]):
+            missing = -1 if name in FLAG_COLUMNS else np.nan
+            pieces = [
+                part[name] if name in part else np.full(size, missing)
+                for part, size in zip(parts, sizes)
+            ]
+            columns[name] = np.concatenate(pieces)
+        columns["device_id"] = self.device_ids
+        columns["timestamp"] = self.now - self._dt * self._offsets
+        return columns
+
+    def batch(self, columns: Optional[Dict[str, np.ndarray]] = None) -> ReadingBatch:
+        """خروجی ستونی برای ReadingBatch.insert / valid_mask / messages"""
+        return ReadingBatch.from_columns(self.size, columns or self.columns())
+
+    def payloads(self, columns: Optional[Dict[str, np.ndarray]] = None) -> Iterator[Tuple[str, dict]]:
+        """(serial، payload) هم‌شکل simulate_sensor_data / handle_sensor_data"""
+        columns = columns or self.columns()
+        fields = [
+            (key, np.round(columns[name], digits).tolist())
+            for key, (name, digits) in PAYLOAD_FIELDS.items() if name in columns
+        ]
+        statuses = [DEVICE_STATUSES[s] for s in columns["status"].tolist()]
+        door_locked = columns["door_locked"].tolist()
+        timestamps = columns["timestamp"].tolist()
+
+        for i, serial in enumerate(self.serials):
+            payload = {"device_id": serial}
+            for key, values in fields:
+                value = values[i]
+                if value == value:  # NaN = فیلد این نوع دستگاه نیست
+                    payload[key] = value
+            payload["door_locked"] = door_locked[i] > 0
+            payload["status"] = statuses[i]
+            payload["timestamp"] = datetime.fromtimestamp(timestamps[i], timezone.utc).isoformat()
+            yield serial, payload
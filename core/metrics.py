@@ -0,0 +1,367 @@
+"""
+============================================================
+PLC Metrics — تله‌متری pollerها برای هر دستگاه و هر باس
+============================================================
+تا حالا تنها نشانه سلامت pollerها لاگ «خواندن ناموفق» بود. این ماژول
+در خود درایورها و PLCPollingService با سربار کم (بدون قفل، handleهای
+از پیش ساخته‌شده به ازای هر دستگاه — فقط یک bisect و چند جمع) جمع می‌کند:
+
+- هیستوگرام زمان رفت‌وبرگشت هر درخواست Modbus و زمان کل هر poll
+- خطاها به تفکیک نوع: crc ، short_read ، timeout ، connection ،
+  bad_response ، exception
+- اتصال مجدد، poll موفق/ناموفق، poll در ثانیه (میانگین نمایی ۶۰ ثانیه)
+- باس RS485: زمان اشغال خط، درصد استفاده (میانگین نمایی) و عمق صف
+
+خروجی:
+- HTTP (start_metrics_server): /metrics با فرمت متنی Prometheus و
+  /metrics.json برای صفحه مدیریت (devices/plc-metrics/)
+- supervisor چندپروسه‌ای snapshot همه workerها را ادغام و روی یک پورت
+  سرو می‌کند
+
+    metrics = get_registry().device(device_id, bus="rtu:/dev/ttyUSB0")
+    metrics.request.observe(0.012)
+    metrics.error("crc")
+"""
+
+import json
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# مرز bucketهای هیستوگرام (ثانیه) — از پاسخ TCP محلی تا timeout RTU
+LATENCY_BUCKETS = (0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+ERROR_KINDS = ("crc", "short_read", "timeout", "connection", "bad_response", "exception")
+# ثابت زمانی میانگین نمایی poll/s و درصد استفاده باس
+RATE_WINDOW_SECONDS = 60.0
+
+
+# ============================================================
+# انواع متریک
+# ============================================================
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Histogram:
+    """
+    bucketهای ثابت؛ بدون قفل (رقابت نادر دو thread روی یک دستگاه حداکثر
+    یک نمونه را گم می‌کند). count از جمع bucketها ساخته می‌شود تا خروجی
+    Prometheus همیشه سازگار باشد
+    """
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+    def snapshot(self) -> dict:
+        return {"counts": list(self.counts), "sum": self.sum}
+
+
+class Rate:
+    """نرخ رویداد در ثانیه با میانگین نمایی (برای busy-seconds = کسر زمان اشغال)"""
+    __slots__ = ("tau", "_value", "_updated")
+
+    def __init__(self, tau: float = RATE_WINDOW_SECONDS):
+        self.tau = tau
+        self._value = 0.0
+        self._updated = time.monotonic()
+
+    def _decay(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._value *= math.exp(-elapsed / self.tau)
+            self._updated = now
+
+    def add(self, amount: float = 1.0):
+        self._decay(time.monotonic())
+        self._value += amount / self.tau
+
+    def value(self) -> float:
+        self._decay(time.monotonic())
+        return self._value
+
+
+def request_error_kind(error: Exception) -> str:
+    """نوع خطای استثنای socket برای plc_errors_total"""
+    if isinstance(error, TimeoutError):
+        return "timeout"
+    if isinstance(error, OSError):
+        return "connection"
+    return "exception"
+
+
+def quantile(snapshot: dict, q: float) -> Optional[float]:
+    """تخمین صدک از bucketها (درون‌یابی خطی داخل bucket) — ثانیه"""
+    counts = snapshot["counts"]
+    total = sum(counts)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for i, count in enumerate(counts):
+        if seen + count >= rank and count:
+            low = LATENCY_BUCKETS[i - 1] if i > 0 else 0.0
+            high = LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else LATENCY_BUCKETS[-1]
+            return low + (high - low) * (rank - seen) / count
+        seen += count
+    return LATENCY_BUCKETS[-1]
+
+
+# ============================================================
+# handleهای دستگاه / باس
+# ============================================================
+class DeviceMetrics:
+    def __init__(self, device: str, bus: str):
+        self.device = device
+        self.bus = bus
+        self.request = Histogram()
+        self.poll = Histogram()
+        self.polls_ok = Counter()
+        self.polls_failed = Counter()
+        self.reconnects = Counter()
+        self.errors = {kind: Counter() for kind in ERROR_KINDS}
+        self.poll_rate = Rate()
+
+    def error(self, kind: str):
+        self.errors[kind].value += 1
+
+    def polled(self, seconds: float, ok: bool):
+        self.poll.observe(seconds)
+        (self.polls_ok if ok else self.polls_failed).value += 1
+        self.poll_rate.add()
+
+    def snapshot(self) -> dict:
+        return {
+            "bus": self.bus,
+            "request": self.request.snapshot(),
+            "poll": self.poll.snapshot(),
+            "polls_ok": self.polls_ok.value,
+            "polls_failed": self.polls_failed.value,
+            "reconnects": self.reconnects.value,
+            "errors": {kind: counter.value for kind, counter in self.errors.items()},
+            "polls_per_second": self.poll_rate.value(),
+        }
+
+
+class BusMetrics:
+    def __init__(self, bus: str):
+        self.bus = bus
+        self.busy_seconds = 0.0
+        self.requests = Counter()
+        self.utilization = Rate()
+        # عمق صف فعلی (RS485Bus.queue_depth)
+        self.depth: Optional[Callable[[], int]] = None
+
+    def busy_for(self, seconds: float):
+        self.busy_seconds += seconds
+        self.requests.value += 1
+        self.utilization.add(seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "busy_seconds": self.busy_seconds,
+            "requests": self.requests.value,
+            "utilization": min(1.0, self.utilization.value()),
+            "queue_depth": self.depth() if self.depth else 0,
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._devices: Dict[str, DeviceMetrics] = {}
+        self._buses: Dict[str, BusMetrics] = {}
+        # spool خوانش‌ها (core.spool): نام slot → stats()
+        self._spools: Dict[str, Callable[[], dict]] = {}
+        self._lock = threading.Lock()
+
+    def device(self, device_id, bus: str) -> DeviceMetrics:
+        key = str(device_id)
+        metrics = self._devices.get(key)
+        if metrics is None or metrics.bus != bus:
+            with self._lock:
+                metrics = self._devices.get(key)
+                if metrics is None:
+                    metrics = self._devices[key] = DeviceMetrics(key, bus)
+                else:
+                    # تنظیمات اتصال دستگاه عوض شده؛ شمارنده‌ها ادامه پیدا می‌کنند
+                    metrics.bus = bus
+        return metrics
+
+    def bus(self, name: str) -> BusMetrics:
+        metrics = self._buses.get(name)
+        if metrics is None:
+            with self._lock:
+                metrics = self._buses.setdefault(name, BusMetrics(name))
+        return metrics
+
+    def add_spool(self, name: str, stats: Callable[[], dict]):
+        with self._lock:
+            self._spools[name] = stats
+
+    def forget_device(self, device_id):
+        with self._lock:
+            self._devices.pop(str(device_id), None)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            devices, buses = list(self._devices.values()), list(self._buses.values())
+            spools = dict(self._spools)
+        return {
+            "devices": {m.device: m.snapshot() for m in devices},
+            "buses": {m.bus: m.snapshot() for m in buses},
+            "spools": {name: stats() for name, stats in spools.items()},
+        }
+
+
+# ============================================================
+# فرمت متنی Prometheus
+# ============================================================
+FAMILIES = (
+    ("plc_request_seconds", "histogram", "زمان رفت‌وبرگشت هر درخواست Modbus"),
+    ("plc_poll_seconds", "histogram", "زمان کل هر poll (خواندن + پردازش)"),
+    ("plc_polls_total", "counter", "تعداد poll به تفکیک نتیجه"),
+    ("plc_errors_total", "counter", "خطاهای ارتباط به تفکیک نوع"),
+    ("plc_reconnects_total", "counter", "تلاش‌های اتصال مجدد"),
+    ("plc_polls_per_second", "gauge", "poll در ثانیه (میانگین نمایی ۶۰ ثانیه)"),
+    ("plc_bus_busy_seconds_total", "counter", "زمان اشغال خط باس"),
+    ("plc_bus_requests_total", "counter", "تعداد تراکنش روی باس"),
+    ("plc_bus_utilization_ratio", "gauge", "کسر زمان اشغال خط (میانگین نمایی ۶۰ ثانیه)"),
+    ("plc_bus_queue_depth", "gauge", "درخواست‌های در صف باس"),
+    ("sensor_spool_backlog_rows", "gauge", "خوانش‌های spool‌شده در انتظار درج"),
+    ("sensor_spool_backlog_bytes", "gauge", "حجم رکوردهای در انتظار درج"),
+    ("sensor_spool_disk_bytes", "gauge", "حجم segmentهای spool روی دیسک"),
+    ("sensor_spool_lag_seconds", "gauge", "سن قدیمی‌ترین خوانش درج‌نشده"),
+    ("sensor_spool_spooled_rows_total", "counter", "خوانش‌های نوشته‌شده در spool"),
+    ("sensor_spool_replayed_rows_total", "counter", "خوانش‌های درج‌شده از spool"),
+    ("sensor_spool_dropped_rows_total", "counter", "خوانش‌های دور ریخته‌شده به خاطر سقف حجم"),
+)
+SPOOL_FIELDS = {
+    "sensor_spool_backlog_rows": "backlog_rows",
+    "sensor_spool_backlog_bytes": "backlog_bytes",
+    "sensor_spool_disk_bytes": "disk_bytes",
+    "sensor_spool_lag_seconds": "lag_seconds",
+    "sensor_spool_spooled_rows_total": "spooled",
+    "sensor_spool_replayed_rows_total": "replayed",
+    "sensor_spool_dropped_rows_total": "dropped",
+}
+
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+def _histogram_lines(name: str, labels: dict, snapshot: dict):
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS, snapshot["counts"]):
+        cumulative += count
+        yield f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}"
+    cumulative += snapshot["counts"][-1]
+    yield f"{name}_bucket{_labels(**labels, le='+Inf')} {cumulative}"
+    yield f"{name}_sum{_labels(**labels)} {snapshot['sum']:.6f}"
+    yield f"{name}_count{_labels(**labels)} {cumulative}"
+
+
+def render_prometheus(snapshot: dict) -> str:
+    samples = {name: [] for name, _, _ in FAMILIES}
+    for device, m in sorted(snapshot["devices"].items()):
+        labels = {"device": device, "bus": m["bus"]}
+        samples["plc_request_seconds"].extend(_histogram_lines("plc_request_seconds", labels, m["request"]))
+        samples["plc_poll_seconds"].extend(_histogram_lines("plc_poll_seconds", labels, m["poll"]))
+        samples["plc_polls_total"].append(f"plc_polls_total{_labels(**labels, result='ok')} {m['polls_ok']}")
+        samples["plc_polls_total"].append(f"plc_polls_total{_labels(**labels, result='failed')} {m['polls_failed']}")
+        for kind, value in m["errors"].items():
+            samples["plc_errors_total"].append(f"plc_errors_total{_labels(**labels, kind=kind)} {value}")
+        samples["plc_reconnects_total"].append(f"plc_reconnects_total{_labels(**labels)} {m['reconnects']}")
+        samples["plc_polls_per_second"].append(
+            f"plc_polls_per_second{_labels(**labels)} {m['polls_per_second']:.4f}"
+        )
+    for bus, m in sorted(snapshot["buses"].items()):
+        labels = _labels(bus=bus)
+        samples["plc_bus_busy_seconds_total"].append(f"plc_bus_busy_seconds_total{labels} {m['busy_seconds']:.6f}")
+        samples["plc_bus_requests_total"].append(f"plc_bus_requests_total{labels} {m['requests']}")
+        samples["plc_bus_utilization_ratio"].append(f"plc_bus_utilization_ratio{labels} {m['utilization']:.4f}")
+        samples["plc_bus_queue_depth"].append(f"plc_bus_queue_depth{labels} {m['queue_depth']}")
+    for spool, m in sorted(snapshot.get("spools", {}).items()):
+        labels = _labels(spool=spool)
+        for name, field in SPOOL_FIELDS.items():
+            samples[name].append(f"{name}{labels} {m[field]}")
+
+    lines = []
+    for name, kind, help_text in FAMILIES:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples[name])
+    return "\n".join(lines) + "\n"
+
+
+def merge_snapshots(snapshots) -> dict:
+    """ادغام snapshot چند worker (هر دستگاه/باس فقط در یک worker است)"""
+    merged = {"devices": {}, "buses": {}, "spools": {}}
+    for snapshot in snapshots:
+        merged["devices"].update(snapshot.get("devices", {}))
+        merged["buses"].update(snapshot.get("buses", {}))
+        merged["spools"].update(snapshot.get("spools", {}))
+    return merged
+
+
+# ============================================================
+# HTTP
+# ============================================================
+def start_metrics_server(port: int, host: str = "127.0.0.1",
+                         source: Optional[Callable[[], dict]] = None) -> ThreadingHTTPServer:
+    """
+    /metrics (Prometheus) و /metrics.json روی یک thread پس‌زمینه
+    source: تابع snapshot (پیش‌فرض رجیستری همین پروسه؛ supervisor ادغام workerها)
+    """
+    source = source or get_registry().snapshot
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/metrics":
+                body = render_prometheus(source()).encode()
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif path == "/metrics.json":
+                body = json.dumps(source()).encode()
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="plc-metrics", daemon=True).start()
+    logger.info(f"📈 متریک‌های PLC روی http://{host}:{port}/metrics")
+    return server
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    return _registry
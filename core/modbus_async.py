@@ -0,0 +1,432 @@
+"""
+============================================================
+Async Modbus TCP — polling همه PLCها روی یک event loop
+============================================================
+به جای یک thread به ازای هر دستگاه (PLCPollingService)، همه اتصال‌های
+Modbus TCP روی یک event loop باز می‌مانند و هر دستگاه فقط یک asyncio Task
+است. ذخیره در دیتابیس (Django ORM همگام است) در یک thread pool کوچک
+و مشترک انجام می‌شود تا loop هرگز block نشود.
+
+مقیاس: یک پروسه با ۱۰۰۰+ دستگاه TCP (هر دستگاه یک socket + یک Task).
+
+استفاده — از طریق همان API رجیستری:
+    from core.plc_driver import start_polling, stop_polling
+    start_polling(device)   # برای connection_type='tcp' خودکار async می‌شود
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from core import modbus_codec
+from core.metrics import get_registry
+from core.plc_connection import AsyncManagedDriver
+from core.plc_driver import AutoclaveReading, PLCPollingService, reading_from_values
+from core.register_map import DEFAULT_REGISTER_MAP, RegisterMap
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+# PIPELINED CONNECTION — چند درخواست هم‌زمان روی یک socket
+# ============================================================
+class ModbusTCPConnection:
+    """
+    یک اتصال TCP به PLC یا Gateway با چند درخواست در حال اجرا (pipelining)
+
+    - هر درخواست یک transaction id یکتا می‌گیرد و پاسخ بر اساس
+      (transaction id, unit id) به درخواست خودش تحویل داده می‌شود
+    - یک Task خواننده فریم‌ها را با MBAPReassembler بازسازی می‌کند
+    - دستگاه‌هایی که پشت یک Gateway هستند (slave ID متفاوت، IP/پورت یکسان)
+      همین اتصال را به اشتراک می‌گذارند
+    """
+
+    def __init__(self, host: str, port: int, timeout: float = 3.0, max_inflight: int = 8):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.max_inflight = max_inflight
+        self._users = 0
+        self._transaction_id = 0
+        self._pending: Dict[int, Tuple[int, asyncio.Future]] = {}
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._inflight: Optional[asyncio.Semaphore] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self) -> bool:
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+            self._inflight = asyncio.Semaphore(self.max_inflight)
+        async with self._connect_lock:
+            if self.connected:
+                return True
+            try:
+                self._reader, self._writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), timeout=self.timeout
+                )
+            except Exception as e:
+                logger.error(f"خطا در اتصال TCP (async) {self.host}:{self.port}: {e}")
+                self._reader = self._writer = None
+                return False
+            self._read_task = asyncio.get_running_loop().create_task(self._read_loop())
+            logger.info(f"Modbus TCP (async) متصل شد: {self.host}:{self.port}")
+            return True
+
+    async def close(self):
+        if self._read_task:
+            self._read_task.cancel()
+            self._read_task = None
+        if self._writer:
+            try:
+                self._writer.close()
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+        self._reader = self._writer = None
+        self._fail_pending()
+
+    def _fail_pending(self):
+        for _, future in self._pending.values():
+            if not future.done():
+                future.set_result(None)
+        self._pending.clear()
+
+    def _next_tid(self) -> int:
+        """transaction id بعدی که الان در حال انتظار نیست"""
+        while True:
+            self._transaction_id = (self._transaction_id + 1) % 65536
+            if self._transaction_id not in self._pending:
+                return self._transaction_id
+
+    async def request(self, unit_id: int, frame_for_tid, priority: bool = False) -> Optional[bytes]:
+        """
+        ارسال یک درخواست و انتظار برای PDU پاسخ
+        frame_for_tid: تابعی که با transaction id فریم کامل را از کدک می‌سازد
+        priority: فرمان‌ها (FC05) منتظر سهمیه max_inflight خواندن‌ها نمی‌مانند
+        """
+        if not self.connected:
+            return None
+        if priority:
+            return await self._send(unit_id, frame_for_tid)
+        async with self._inflight:
+            return await self._send(unit_id, frame_for_tid)
+
+    async def _send(self, unit_id: int, frame_for_tid) -> Optional[bytes]:
+        if not self.connected:
+            return None
+        tid = self._next_tid()
+        future = asyncio.get_running_loop().create_future()
+        self._pending[tid] = (unit_id, future)
+        try:
+            self._writer.write(frame_for_tid(tid))
+            await self._writer.drain()
+            return await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Timeout پاسخ Modbus {self.host}:{self.port} unit={unit_id} tid={tid}")
+            return None
+        except Exception as e:
+            logger.error(f"خطای TCP (async) {self.host}:{self.port}: {e}")
+            await self.close()
+            return None
+        finally:
+            self._pending.pop(tid, None)
+
+    async def _read_loop(self):
+        reassembler = modbus_codec.MBAPReassembler()
+        try:
+            while True:
+                data = await self._reader.read(4096)
+                if not data:
+                    logger.warning(f"اتصال Modbus TCP توسط {self.host}:{self.port} بسته شد")
+                    break
+                for adu in reassembler.feed(data):
+                    tid, unit_id = modbus_codec.frame_ids(adu)
+                    entry = self._pending.get(tid)
+                    if entry is None:
+                        logger.debug(f"پاسخ دیررس/ناشناخته tid={tid} از {self.host}:{self.port}")
+                        continue
+                    expected_unit, future = entry
+                    if unit_id != expected_unit:
+                        logger.warning(f"unit id ناهمخوان برای tid={tid}: {unit_id} ≠ {expected_unit}")
+                        continue
+                    if not future.done():
+                        future.set_result(adu[7:])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"خطا در دریافت Modbus TCP {self.host}:{self.port}: {e}")
+
+        # خواننده متوقف شد → اتصال بسته و همه منتظرها آزاد شوند
+        self._read_task = None
+        if self._writer:
+            self._writer.close()
+        self._reader = self._writer = None
+        self._fail_pending()
+
+
+# رجیستری اتصال‌ها — فقط از داخل event loop استفاده می‌شود (نیاز به قفل ندارد)
+_connections: Dict[Tuple[str, int], ModbusTCPConnection] = {}
+
+
+def acquire_connection(host: str, port: int, timeout: float = 3.0) -> ModbusTCPConnection:
+    conn = _connections.get((host, port))
+    if conn is None:
+        from django.conf import settings
+        conn = _connections[(host, port)] = ModbusTCPConnection(
+            host, port, timeout=timeout,
+            max_inflight=getattr(settings, "PLC_TCP_MAX_INFLIGHT", 8),
+        )
+    conn._users += 1
+    return conn
+
+
+async def release_connection(conn: ModbusTCPConnection):
+    conn._users -= 1
+    if conn._users <= 0:
+        _connections.pop((conn.host, conn.port), None)
+        await conn.close()
+
+
+# ============================================================
+# ASYNC MODBUS TCP DRIVER
+# ============================================================
+class AsyncCotrustModbusTCP:
+    """
+    نسخه asyncio درایور CotrustModbusTCP
+    همان نقشه رجیستر و همان decode (reading_from_values)؛
+    اتصال از ModbusTCPConnection مشترک (pipelined) گرفته می‌شود
+    """
+
+    def __init__(
+        self,
+        host: str = "192.168.1.100",
+        port: int = 502,
+        slave_id: int = 1,
+        timeout: float = 3.0,
+        register_map: Optional[RegisterMap] = None,
+        device_id: Optional[int] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.slave_id = slave_id
+        self.timeout = timeout
+        self.register_map = register_map or DEFAULT_REGISTER_MAP
+        self.bus_label = f"tcp:{host}:{port}"
+        self.metrics = get_registry().device(
+            device_id if device_id is not None else f"{host}:{port}#{slave_id}", self.bus_label
+        )
+        self._conn: Optional[ModbusTCPConnection] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._conn is not None and self._conn.connected
+
+    async def connect(self) -> bool:
+        if self._conn is None:
+            self._conn = acquire_connection(self.host, self.port, timeout=self.timeout)
+        return await self._conn.connect()
+
+    async def disconnect(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await release_connection(conn)
+
+    async def _transact(self, frame_for_tid, priority: bool = False) -> Optional[bytes]:
+        if self._conn is None:
+            return None
+        return await self._conn.request(self.slave_id, frame_for_tid, priority=priority)
+
+    async def _read_block(self, block) -> Optional[memoryview]:
+        """Modbus TCP FC03/FC01 یک بلوک نقشه رجیستر → بخش داده پاسخ"""
+        started = time.perf_counter()
+        response = await self._transact(
+            lambda tid: modbus_codec.tcp_read_request(
+                tid, self.slave_id, block.start, block.count, block.function
+            )
+        )
+        self.metrics.request.observe(time.perf_counter() - started)
+        if not response:
+            # timeout اتصال را باز نگه می‌دارد؛ خطای socket آن را می‌بندد
+            self.metrics.error("timeout" if self.connected else "connection")
+            return None
+        if response[0] != block.function or len(response) < 2 + block.payload_length:
+            self.metrics.error("bad_response")
+            return None
+        return memoryview(response)[2:]
+
+    async def _write_coil(self, addr: int, value: bool) -> bool:
+        response = await self._transact(
+            lambda tid: modbus_codec.tcp_write_coil_request(tid, self.slave_id, addr, value),
+            priority=True,
+        )
+        return bool(response) and response[0] == 0x05
+
+    async def read_values(self) -> Optional[Dict[str, float]]:
+        # بلوک‌های نقشه هم‌زمان روی اتصال pipelined فرستاده می‌شوند
+        payloads = await asyncio.gather(
+            *(self._read_block(block) for block in self.register_map.blocks)
+        )
+        if any(payload is None for payload in payloads):
+            return None
+        return self.register_map.decode(payloads)
+
+    async def read(self) -> Optional[AutoclaveReading]:
+        values = await self.read_values()
+        return None if values is None else reading_from_values(values)
+
+    async def remote_start(self) -> bool:
+        return await self._write_coil(addr=0, value=True)
+
+    async def remote_stop(self) -> bool:
+        return await self._write_coil(addr=1, value=True)
+
+    async def reset_alarm(self) -> bool:
+        return await self._write_coil(addr=3, value=True)
+
+
+# ============================================================
+# EVENT LOOP ENGINE — یک loop مشترک برای همه دستگاه‌ها
+# ============================================================
+class AsyncPollingEngine:
+    """
+    یک thread که event loop را اجرا می‌کند + یک ThreadPool کوچک برای ORM
+    """
+
+    def __init__(self, db_workers: int = 8):
+        self.db_workers = db_workers
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        self._ensure_started()
+        return self._loop
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        self._ensure_started()
+        return self._executor
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            _raise_nofile_limit()
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.db_workers, thread_name_prefix="plc-db"
+            )
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=self._loop.run_forever, name="plc-async-loop", daemon=True
+            )
+            self._thread.start()
+            logger.info(f"Async polling engine شروع شد ({self.db_workers} DB worker)")
+
+    def submit(self, coro):
+        """اجرای coroutine روی loop از هر thread → concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+_engine: Optional[AsyncPollingEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> AsyncPollingEngine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            from django.conf import settings
+            _engine = AsyncPollingEngine(
+                db_workers=getattr(settings, "PLC_ASYNC_DB_WORKERS", 8),
+            )
+        return _engine
+
+
+def _raise_nofile_limit():
+    """۱۰۰۰+ socket به سقف پیش‌فرض 1024 فایل‌باز می‌خورد"""
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != resource.RLIM_INFINITY and (hard == resource.RLIM_INFINITY or soft < hard):
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+# ============================================================
+# ASYNC POLLING SERVICE
+# ============================================================
+class AsyncPLCPollingService(PLCPollingService):
+    """
+    همان PLCPollingService (همان _process و همان رجیستری)،
+    ولی به جای thread اختصاصی یک Task روی event loop مشترک است
+    """
+
+    def __init__(self, device_id: int, driver: AsyncCotrustModbusTCP,
+                 interval_seconds: int = 5, engine: Optional[AsyncPollingEngine] = None, adaptive=None):
+        if not isinstance(driver, AsyncManagedDriver):
+            driver = AsyncManagedDriver(driver, device_id=device_id)
+        super().__init__(device_id=device_id, driver=driver, interval_seconds=interval_seconds,
+                         adaptive=adaptive)
+        self.engine = engine or get_engine()
+
+    def start(self):
+        if self._running:
+            return
+        from core.poll_scheduler import get_scheduler
+        self._running = True
+        get_scheduler().add(self)
+        logger.info(f"Polling (async) شروع شد — دستگاه #{self.device_id} هر {self.interval}s")
+
+    def _disconnect_driver(self):
+        # disconnect درایور async یک coroutine روی event loop موتور است
+        try:
+            self.engine.submit(self.driver.disconnect()).result(timeout=5)
+        except Exception as e:
+            logger.error(f"خطا در توقف polling async #{self.device_id}: {e}")
+
+    def submit_poll(self, executor):
+        """poll روی event loop موتور async؛ ThreadPool زمان‌بند درگیر نمی‌شود"""
+        return self.engine.submit(self._apoll())
+
+    async def _apoll(self) -> Optional[Dict[str, float]]:
+        values = None
+        skipped = self.breaker_state == "open"
+        started = time.perf_counter()
+        try:
+            # اتصال/اتصال مجدد داخل AsyncManagedDriver (backoff + circuit breaker)
+            values = await self.driver.read_values()
+            if values is not None:
+                await asyncio.get_running_loop().run_in_executor(
+                    self.engine.executor, self._process, values, time.time()
+                )
+            elif self.breaker_state == "closed":
+                logger.warning(f"خواندن ناموفق — دستگاه #{self.device_id}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"خطا در polling async: {e}")
+        self.record_poll(started, values, skipped)
+        return values
+
+
+def get_async_plc_driver(device) -> AsyncCotrustModbusTCP:
+    """معادل get_plc_driver برای دستگاه‌های TCP (اتصال داخل loop برقرار می‌شود)"""
+    return AsyncCotrustModbusTCP(
+        host=getattr(device, "plc_ip", "192.168.1.100"),
+        port=getattr(device, "plc_port", 502),
+        slave_id=getattr(device, "modbus_slave_id", 1),
+        register_map=RegisterMap.for_device(device),
+        device_id=getattr(device, "pk", None),
+    )
@@ -0,0 +1,174 @@
+"""
+============================================================
+Modbus Frame Codec — مشترک بین درایورهای RTU و TCP
+============================================================
+- CRC16 جدول‌محور (۲۵۶ خانه، یک بار ساخته می‌شود)
+- decode بلوک رجیسترها در core.register_map (ReadBlock: یک struct.Struct
+  از پیش کامپایل‌شده روی memoryview، بدون کپی و slice به ازای هر رجیستر)
+- فریم‌های درخواست برای هر (slave, start, count) یک بار ساخته و
+  دوباره استفاده می‌شوند
+
+بنچمارک: python benchmarks/bench_modbus_codec.py
+"""
+
+import struct
+from functools import lru_cache
+from typing import Tuple
+
+# ============================================================
+# CRC16 (Modbus, poly 0xA001)
+# ============================================================
+def _build_crc_table() -> Tuple[int, ...]:
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            if crc & 0x0001:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+        table.append(crc)
+    return tuple(table)
+
+
+_CRC_TABLE = _build_crc_table()
+_CRC = struct.Struct('<H')
+
+
+def crc16(data) -> int:
+    """CRC16 Modbus — data می‌تواند bytes، bytearray یا memoryview باشد"""
+    crc = 0xFFFF
+    table = _CRC_TABLE
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def crc16_bytes(data) -> bytes:
+    """CRC به صورت دو بایت little-endian (ترتیب ارسال روی سیم)"""
+    return _CRC.pack(crc16(data))
+
+
+def check_crc(frame) -> bool:
+    """بررسی CRC دو بایت آخر فریم RTU"""
+    if len(frame) < 4:
+        return False
+    view = memoryview(frame)
+    return crc16(view[:-2]) == _CRC.unpack_from(view, len(view) - 2)[0]
+
+
+# ============================================================
+# REGISTER DECODE
+# ============================================================
+FC_READ_COILS = 0x01
+FC_READ_HOLDING = 0x03
+
+
+def read_payload_length(function: int, count: int) -> int:
+    """طول بخش داده پاسخ: FC03 دو بایت به ازای هر رجیستر، FC01 یک بیت به ازای هر coil"""
+    if function == FC_READ_COILS:
+        return (count + 7) // 8
+    return count * 2
+
+
+# ============================================================
+# RTU FRAMES
+# ============================================================
+_RTU_HEADER = struct.Struct('>BBHH')
+
+
+@lru_cache(maxsize=4096)
+def rtu_read_request(slave_id: int, start_addr: int, count: int, function: int = FC_READ_HOLDING) -> bytes:
+    """FC03/FC01 — فریم کامل (با CRC)، یک بار ساخته می‌شود"""
+    frame = _RTU_HEADER.pack(slave_id, function, start_addr, count)
+    return frame + crc16_bytes(frame)
+
+
+@lru_cache(maxsize=4096)
+def rtu_write_coil_request(slave_id: int, addr: int, value: bool) -> bytes:
+    """FC05 — فریم کامل (با CRC)"""
+    frame = _RTU_HEADER.pack(slave_id, 0x05, addr, 0xFF00 if value else 0x0000)
+    return frame + crc16_bytes(frame)
+
+
+def rtu_read_response_length(count: int, function: int = FC_READ_HOLDING) -> int:
+    """[slave_id, fc, byte_count, data..., crc_lo, crc_hi]"""
+    return 5 + read_payload_length(function, count)
+
+
+# ============================================================
+# TCP (MBAP) FRAMES
+# ============================================================
+MBAP = struct.Struct('>HHHB')       # transaction, protocol, length, unit
+_TID = struct.Struct('>H')
+
+
+@lru_cache(maxsize=4096)
+def _tcp_tail(unit_id: int, pdu: bytes) -> bytes:
+    """همه فریم TCP به جز transaction id (protocol + length + unit + PDU)"""
+    return MBAP.pack(0, 0, len(pdu) + 1, unit_id)[2:] + pdu
+
+
+@lru_cache(maxsize=4096)
+def _read_pdu(start_addr: int, count: int, function: int) -> bytes:
+    return struct.pack('>BHH', function, start_addr, count)
+
+
+@lru_cache(maxsize=1024)
+def _write_coil_pdu(addr: int, value: bool) -> bytes:
+    return struct.pack('>BHH', 0x05, addr, 0xFF00 if value else 0x0000)
+
+
+def tcp_read_request(tid: int, unit_id: int, start_addr: int, count: int,
+                     function: int = FC_READ_HOLDING) -> bytes:
+    """FC03/FC01 روی TCP — فقط دو بایت transaction id در هر درخواست ساخته می‌شود"""
+    return _TID.pack(tid) + _tcp_tail(unit_id, _read_pdu(start_addr, count, function))
+
+
+def tcp_write_coil_request(tid: int, unit_id: int, addr: int, value: bool) -> bytes:
+    """FC05 روی TCP"""
+    return _TID.pack(tid) + _tcp_tail(unit_id, _write_coil_pdu(addr, value))
+
+
+# ============================================================
+# MBAP REASSEMBLER — بازسازی فریم کامل از stream TCP
+# ============================================================
+class ModbusFramingError(ValueError):
+    """header نامعتبر — stream از هم‌ترازی خارج شده و اتصال باید reset شود"""
+
+
+class MBAPReassembler:
+    """
+    یک recv() می‌تواند نصف فریم یا چند فریم را برگرداند؛ این کلاس
+    بایت‌ها را جمع می‌کند و بر اساس فیلد length در MBAP فقط فریم‌های
+    کامل (ADU = MBAP + PDU) را تحویل می‌دهد.
+    """
+    MAX_LENGTH = 254  # unit id + حداکثر PDU (253)
+
+    def __init__(self):
+        self._buf = bytearray()
+
+    def reset(self):
+        self._buf.clear()
+
+    def feed(self, data) -> list:
+        buf = self._buf
+        buf += data
+        frames = []
+        while len(buf) >= 7:
+            _, protocol, length, _ = MBAP.unpack_from(buf)
+            if protocol != 0 or not 2 <= length <= self.MAX_LENGTH:
+                buf.clear()
+                raise ModbusFramingError(f"MBAP نامعتبر: protocol={protocol} length={length}")
+            total = 6 + length
+            if len(buf) < total:
+                break
+            frames.append(bytes(buf[:total]))
+            del buf[:total]
+        return frames
+
+
+def frame_ids(adu) -> Tuple[int, int]:
+    """(transaction id, unit id) یک ADU کامل"""
+    tid, _, _, unit_id = MBAP.unpack_from(adu)
+    return tid, unit_id
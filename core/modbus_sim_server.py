@@ -0,0 +1,269 @@
+"""
+============================================================
+Modbus Slave Simulator — صدها PLC شبیه‌سازی‌شده روی Modbus واقعی
+============================================================
+AutoclaveSimulator داخل پروسه است و درایورهای CotrustModbusTCP/RTU را
+دور می‌زند. این سرور همان نقشه D0..D11 و coilهای M0..M3 را روی پروتکل
+واقعی ارائه می‌دهد تا کل پشته درایور (socket، framing، CRC، bus arbiter،
+pipelining) بدون سخت‌افزار تست و بنچمارک شود:
+
+- TCP: هر پورت localhost یک PLC یا یک Gateway با چند unit ID
+- RTU: یک جفت pty (خط RS485 مجازی) با چند slave ID
+
+هر PLC یک AutoclaveSimulator (مدل فاز سیکل) دارد که در هر tick یک بار
+جلو می‌رود؛ رجیسترها از قبل pack می‌شوند و پاسخ هر درخواست فقط یک slice است.
+
+    python manage.py run_plc_simulator --devices 200 --base-port 15020
+    python manage.py run_plc_simulator --rtu-units 8
+"""
+
+import asyncio
+import logging
+import os
+import random
+import struct
+from typing import Dict, List, Optional
+
+from core import modbus_codec
+from core.plc_driver import AutoclaveSimulator, CYCLE_STATUS
+
+logger = logging.getLogger(__name__)
+
+REGISTER_COUNT = 12
+COIL_COUNT = 16
+
+# Modbus exception codes
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_ADDRESS = 0x02
+GATEWAY_TARGET_FAILED = 0x0B
+
+_STATUS_CODE = {status: code for code, status in CYCLE_STATUS.items()}
+_REGISTERS = struct.Struct(f">{REGISTER_COUNT}H")
+_REQUEST = struct.Struct(">BHH")
+_RTU_REQUEST_LEN = 8  # FC01/FC03/FC05: slave + fc + addr + count/value + crc
+
+
+def _u16(value: float) -> int:
+    return max(0, min(0xFFFF, int(round(value))))
+
+
+# ============================================================
+# SIMULATED PLC
+# ============================================================
+class SimulatedPLC:
+    """یک PLC COTRUST: رجیسترهای D0..D11 از AutoclaveSimulator + coilهای M0..M3"""
+
+    def __init__(self, seed: Optional[int] = None, auto_cycle_seconds: Optional[float] = None):
+        self.sim = AutoclaveSimulator(seed=seed)
+        self.auto_cycle_seconds = auto_cycle_seconds
+        self._random = random.Random(seed)
+        self.coils = bytearray(COIL_COUNT)
+        self.registers = bytes(REGISTER_COUNT * 2)
+        self.requests = 0
+        self.tick(0.0)
+
+    def tick(self, dt: float):
+        """یک قدم مدل فاز + pack رجیسترها (مقادیر خام همان نقشه D0..D11)"""
+        if (
+            self.auto_cycle_seconds
+            and self.sim.phase in ("idle", "complete")
+            and self._random.random() < dt / self.auto_cycle_seconds
+        ):
+            self.sim.start_cycle()
+
+        r = self.sim.read()
+        self.registers = _REGISTERS.pack(
+            _u16(r.temperature_c * 10),
+            _u16(r.pressure_bar * 100),
+            _u16(r.steam_flow_kg_h * 10),
+            _u16(r.water_level_pct),
+            _u16(r.power_consumption_kw * 10),
+            _STATUS_CODE.get(r.cycle_status, 0),
+            int(r.door_locked),
+            int(r.heater_on),
+            int(r.pump_on),
+            _u16(r.cycle_number),
+            _u16(r.total_cycles),
+            _u16(r.alarm_code),
+        )
+
+    def handle_pdu(self, pdu: bytes) -> bytes:
+        """PDU درخواست → PDU پاسخ (یا exception)"""
+        self.requests += 1
+        function = pdu[0]
+        if len(pdu) < 5:
+            return bytes((function | 0x80, ILLEGAL_FUNCTION))
+        _, addr, value = _REQUEST.unpack_from(pdu)
+
+        if function == modbus_codec.FC_READ_HOLDING:
+            if addr + value > REGISTER_COUNT or value == 0:
+                return bytes((function | 0x80, ILLEGAL_ADDRESS))
+            data = self.registers[addr * 2:(addr + value) * 2]
+            return bytes((function, len(data))) + data
+
+        if function == modbus_codec.FC_READ_COILS:
+            if addr + value > COIL_COUNT or value == 0:
+                return bytes((function | 0x80, ILLEGAL_ADDRESS))
+            data = bytearray((value + 7) // 8)
+            for i in range(value):
+                if self.coils[addr + i]:
+                    data[i // 8] |= 1 << (i % 8)
+            return bytes((function, len(data))) + bytes(data)
+
+        if function == 0x05:
+            if addr >= COIL_COUNT:
+                return bytes((function | 0x80, ILLEGAL_ADDRESS))
+            self._write_coil(addr, value == 0xFF00)
+            return pdu[:5]  # echo درخواست
+
+        return bytes((function | 0x80, ILLEGAL_FUNCTION))
+
+    def _write_coil(self, addr: int, value: bool):
+        # M0/M1/M3 پالسی هستند (برنامه PLC بعد از اجرا reset می‌کند)
+        if addr == 0 and value:
+            self.sim.start_cycle()
+        elif addr == 1 and value:
+            self.sim.stop_cycle()
+        elif addr == 3 and value:
+            self.sim.reset_alarm()
+        else:
+            self.coils[addr] = int(value)
+        self.tick(0.0)
+
+
+# ============================================================
+# SERVER
+# ============================================================
+class PLCSimulatorServer:
+    """
+    devices PLC روی TCP (پورت‌های متوالی از base_port، هر پورت units_per_port
+    unit ID از 1) + rtu_units PLC روی یک pty
+    """
+
+    def __init__(
+        self,
+        devices: int = 10,
+        base_port: int = 15020,
+        host: str = "127.0.0.1",
+        units_per_port: int = 1,
+        rtu_units: int = 0,
+        tick_seconds: float = 1.0,
+        seed: int = 0,
+        auto_cycle_seconds: Optional[float] = None,
+        response_delay: float = 0.0,
+    ):
+        self.host = host
+        self.base_port = base_port
+        self.tick_seconds = tick_seconds
+        self.response_delay = response_delay
+        self.plcs: List[SimulatedPLC] = []
+        # پورت → unit id → PLC
+        self.tcp_plcs: Dict[int, Dict[int, SimulatedPLC]] = {}
+        self.rtu_plcs: Dict[int, SimulatedPLC] = {}
+        self.rtu_port: Optional[str] = None
+        self._servers = []
+        self._rtu_fd: Optional[int] = None
+        self._rtu_slave_fd: Optional[int] = None
+
+        for i in range(devices):
+            port = base_port + i // units_per_port
+            unit_id = i % units_per_port + 1
+            plc = SimulatedPLC(seed=seed + len(self.plcs), auto_cycle_seconds=auto_cycle_seconds)
+            self.tcp_plcs.setdefault(port, {})[unit_id] = plc
+            self.plcs.append(plc)
+        for unit_id in range(1, rtu_units + 1):
+            plc = SimulatedPLC(seed=seed + len(self.plcs), auto_cycle_seconds=auto_cycle_seconds)
+            self.rtu_plcs[unit_id] = plc
+            self.plcs.append(plc)
+
+    @property
+    def requests(self) -> int:
+        return sum(plc.requests for plc in self.plcs)
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        for port, units in self.tcp_plcs.items():
+            server = await asyncio.start_server(
+                lambda r, w, units=units: self._serve_tcp(r, w, units), self.host, port
+            )
+            self._servers.append(server)
+        if self.rtu_plcs:
+            self._open_pty(loop)
+        loop.create_task(self._tick_loop())
+        logger.info(
+            f"شبیه‌ساز Modbus: {sum(len(u) for u in self.tcp_plcs.values())} PLC روی "
+            f"{len(self.tcp_plcs)} پورت TCP، {len(self.rtu_plcs)} PLC روی RTU ({self.rtu_port or '-'})"
+        )
+
+    async def stop(self):
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        if self._rtu_fd is not None:
+            asyncio.get_running_loop().remove_reader(self._rtu_fd)
+            os.close(self._rtu_fd)
+            os.close(self._rtu_slave_fd)
+            self._rtu_fd = None
+
+    async def _tick_loop(self):
+        while True:
+            await asyncio.sleep(self.tick_seconds)
+            for plc in self.plcs:
+                plc.tick(self.tick_seconds)
+
+    # ── TCP ──────────────────────────────────────────────
+    async def _serve_tcp(self, reader, writer, units: Dict[int, SimulatedPLC]):
+        reassembler = modbus_codec.MBAPReassembler()
+        # پورت تک‌PLC: unit id را مثل اکثر PLCهای Ethernet نادیده می‌گیرد
+        single = next(iter(units.values())) if len(units) == 1 else None
+        try:
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    break
+                for adu in reassembler.feed(data):
+                    tid, unit_id = modbus_codec.frame_ids(adu)
+                    plc = single or units.get(unit_id)
+                    pdu = adu[7:]
+                    if plc is None:
+                        response = bytes((pdu[0] | 0x80, GATEWAY_TARGET_FAILED))
+                    else:
+                        response = plc.handle_pdu(pdu)
+                    if self.response_delay:
+                        await asyncio.sleep(self.response_delay)
+                    writer.write(modbus_codec.MBAP.pack(tid, 0, len(response) + 1, unit_id) + response)
+        except (ConnectionError, modbus_codec.ModbusFramingError) as e:
+            logger.debug(f"اتصال شبیه‌ساز بسته شد: {e}")
+        finally:
+            writer.close()
+
+    # ── RTU (pty) ────────────────────────────────────────
+    def _open_pty(self, loop):
+        import tty
+
+        master, slave = os.openpty()
+        tty.setraw(master)
+        tty.setraw(slave)
+        os.set_blocking(master, False)
+        self._rtu_fd = master
+        self.rtu_port = os.ttyname(slave)
+        self._rtu_slave_fd = slave  # باز می‌ماند تا pty بعد از قطع درایور از بین نرود
+        buffer = bytearray()
+        loop.add_reader(master, self._on_rtu_readable, buffer)
+
+    def _on_rtu_readable(self, buffer: bytearray):
+        try:
+            buffer += os.read(self._rtu_fd, 256)
+        except BlockingIOError:
+            return
+        while len(buffer) >= _RTU_REQUEST_LEN:
+            frame = bytes(buffer[:_RTU_REQUEST_LEN])
+            if not modbus_codec.check_crc(frame):
+                del buffer[0]  # هم‌ترازی مجدد با شروع فریم بعدی
+                continue
+            del buffer[:_RTU_REQUEST_LEN]
+            plc = self.rtu_plcs.get(frame[0])
+            if plc is None:
+                continue  # slave دیگری روی خط — سکوت
+            body = bytes((frame[0],)) + plc.handle_pdu(frame[1:6])
+            os.write(self._rtu_fd, body + modbus_codec.crc16_bytes(body))
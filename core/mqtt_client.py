@@ -1,53 +1,29 @@
 """
 MQTT Client - ارتباط با سنسورهای IoT
 """
-import json
 import logging
 import threading
+import time
 import django
 import os
 
+from core.mqtt_codec import decode_payload
+from core.mqtt_pipeline import get_pipeline
+from core.sensor_schema import PAYLOAD_COLUMNS, SENSOR_BOUNDS, get_validator  # noqa: F401
+
 logger = logging.getLogger(__name__)
 
-# ============================================================
-# محدوده‌های قابل‌قبول سنسور (مقادیر خارج این محدوده نادیده گرفته می‌شوند)
-# ============================================================
-SENSOR_BOUNDS = {
-    # اتوکلاو
-    'temp_c':            (0,    200),    # درجه سانتیگراد
-    'pressure':          (0,    10),     # بار
-    'power_kw':          (0,    500),    # کیلووات
-    'voltage':           (0,    1000),   # ولت
-    'current':           (0,    1000),   # آمپر
-    'steam_flow':        (0,    100),    # kg/h
-    'water_level':       (0,    100),    # درصد
-    # زباله‌سوز
-    'combustion_temp':   (0,    1600),   # درجه سانتیگراد
-    'post_combustion_temp': (0, 1600),
-    'exhaust_temp':      (0,    600),
-    'co2':               (0,    100000), # ppm
-    'co':                (0,    10000),  # ppm
-    'nox':               (0,    5000),   # ppm
-    'so2':               (0,    5000),   # ppm
-    'fuel_flow':         (0,    200),    # L/h
-}
+# محدوده‌ها و نگاشت کلید payload → فیلد SensorReading از core.sensor_schema
+# (SCHEMA)؛ اینجا برای سازگاری import‌های قبلی
 
 
 def validate_sensor_payload(data: dict) -> tuple[bool, list]:
     """
-    بررسی اعتبار داده سنسور
+    بررسی اعتبار داده سنسور (همه فیلدهای همه انواع دستگاه)؛ مسیر MQTT از
+    validator نوع هر دستگاه استفاده می‌کند: core.sensor_schema.get_validator
     Returns: (is_valid, list_of_errors)
     """
-    errors = []
-    for field, (min_val, max_val) in SENSOR_BOUNDS.items():
-        value = data.get(field)
-        if value is None:
-            continue  # فیلد اختیاری است
-        if not isinstance(value, (int, float)):
-            errors.append(f"{field}: مقدار باید عدد باشد، دریافت شد: {type(value).__name__}")
-            continue
-        if not (min_val <= value <= max_val):
-            errors.append(f"{field}: مقدار {value} خارج از محدوده [{min_val}, {max_val}]")
+    _, errors = get_validator(None).validate(data)
     return len(errors) == 0, errors
 
 
@@ -61,29 +37,31 @@ def get_mqtt_client():
 
     from django.conf import settings
 
-    def on_connect(client, userdata, flags, rc):
-        if rc == 0:
+    def on_connect(client, userdata, flags, reason_code, properties):
+        if not reason_code.is_failure:
             logger.info("✅ به MQTT Broker متصل شد")
             topic = f"{settings.MQTT_TOPIC_PREFIX}/#"
-            client.subscribe(topic)
-            logger.info(f"Subscribe شد روی: {topic}")
+            # QoS 1 مثل run_mqtt_consumer: وقتی صف pipeline پر است broker پیام‌ها را نگه می‌دارد
+            client.subscribe(topic, qos=1)
+            logger.info(f"Subscribe شد روی: {topic} (QoS 1)")
         else:
-            logger.error(f"❌ خطا در اتصال MQTT: code={rc}")
+            logger.error(f"❌ خطا در اتصال MQTT: code={reason_code}")
 
     def on_message(client, userdata, message):
+        # فقط decode و صف — پردازش در thread دسته‌ای core.mqtt_pipeline
         try:
-            payload = json.loads(message.payload.decode('utf-8'))
-            handle_sensor_data(payload, message.topic)
-        except json.JSONDecodeError as e:
+            payload = decode_payload(message.payload)
+            get_pipeline().submit(payload, message.topic)
+        except ValueError as e:
             logger.error(f"خطا در parse MQTT payload: {e}")
         except Exception as e:
             logger.error(f"خطا در پردازش MQTT message: {e}")
 
-    def on_disconnect(client, userdata, rc):
-        if rc != 0:
-            logger.warning(f"قطع ارتباط MQTT: code={rc}")
+    def on_disconnect(client, userdata, flags, reason_code, properties):
+        if reason_code.is_failure:
+            logger.warning(f"قطع ارتباط MQTT: code={reason_code}")
 
-    client = mqtt.Client(client_id=f"hospital_monitor_{os.getpid()}")
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=f"hospital_monitor_{os.getpid()}")
     client.on_connect = on_connect
     client.on_message = on_message
     client.on_disconnect = on_disconnect
@@ -95,85 +73,9 @@ def get_mqtt_client():
 
 
 def handle_sensor_data(data: dict, topic: str):
-    """پردازش داده سنسور و ذخیره در دیتابیس"""
-    from apps.devices.models import Device, DeviceCycle
-    from apps.monitoring.models import SensorReading
-    from core.calculators import AlertChecker
-    from asgiref.sync import async_to_sync
-    from channels.layers import get_channel_layer
-
+    """پردازش داده سنسور و ذخیره در دیتابیس (همگام، یک پیام — مسیر دسته‌ای: core.mqtt_pipeline)"""
     try:
-        device_serial = data.get('device_id') or data.get('serial_number')
-        if not device_serial:
-            logger.warning(f"داده بدون device_id: {data}")
-            return
-
-        # اعتبارسنجی محدوده داده‌های سنسور
-        is_valid, errors = validate_sensor_payload(data)
-        if not is_valid:
-            logger.warning(f"داده نامعتبر از {device_serial} (topic={topic}): {errors}")
-            return
-
-        device = Device.objects.get(serial_number=device_serial, is_active=True)
-
-        # پیدا کردن سیکل جاری
-        active_cycle = DeviceCycle.objects.filter(
-            device=device, status__in=['heating', 'sterilizing', 'cooling']
-        ).order_by('-start_time').first()
-
-        # ذخیره داده سنسور
-        reading = SensorReading.objects.create(
-            device=device,
-            cycle=active_cycle,
-            power_consumption_kw=data.get('power_kw', 0),
-            voltage_v=data.get('voltage', 0),
-            current_a=data.get('current', 0),
-            # اتوکلاو
-            temperature_c=data.get('temp_c'),
-            pressure_bar=data.get('pressure'),
-            steam_flow_kg_h=data.get('steam_flow'),
-            water_level_pct=data.get('water_level'),
-            door_locked=data.get('door_locked'),
-            # زباله‌سوز
-            combustion_temp_c=data.get('combustion_temp'),
-            post_combustion_temp_c=data.get('post_combustion_temp'),
-            exhaust_temp_c=data.get('exhaust_temp'),
-            co2_ppm=data.get('co2'),
-            co_ppm=data.get('co'),
-            nox_ppm=data.get('nox'),
-            so2_ppm=data.get('so2'),
-            fuel_flow_lh=data.get('fuel_flow'),
-            device_status=data.get('status', 'idle'),
-        )
-
-        # به‌روزرسانی وضعیت دستگاه
-        device.status = 'online'
-        device.save(update_fields=['status'])
-
-        # بررسی هشدار
-        AlertChecker.check_reading(reading)
-
-        # ارسال به WebSocket (real-time dashboard)
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f"device_{device.pk}",
-            {
-                'type': 'sensor_update',
-                'data': {
-                    'device_id': device.pk,
-                    'timestamp': reading.timestamp.isoformat(),
-                    'temperature': reading.temperature_c,
-                    'pressure': reading.pressure_bar,
-                    'power': reading.power_consumption_kw,
-                    'combustion_temp': reading.combustion_temp_c,
-                    'co_ppm': reading.co_ppm,
-                    'status': reading.device_status,
-                }
-            }
-        )
-
-    except Device.DoesNotExist:
-        logger.warning(f"دستگاه با serial {data.get('device_id')} پیدا نشد")
+        get_pipeline().process([(data, topic, time.time())])
     except Exception as e:
         logger.error(f"خطا در handle_sensor_data: {e}", exc_info=True)
 
@@ -187,6 +89,7 @@ def start_mqtt_listener():
         return
 
     try:
+        get_pipeline().start()
         client.connect(settings.MQTT_BROKER_HOST, settings.MQTT_BROKER_PORT, 60)
         thread = threading.Thread(target=client.loop_forever, daemon=True)
         thread.start()
@@ -0,0 +1,166 @@
+"""
+============================================================
+MQTT Payload Codec — قالب باینری نسخه‌دار در کنار JSON
+============================================================
+هر پیام سنسور JSON است (حدود ۳۰۰ بایت) و json.loads بیشترین CPU
+callback را می‌گیرد. قالب باینری v1 برای gatewayهای محدود:
+
+    header  <BBBBdB   نسخه (1)، نوع دستگاه، کد وضعیت، door_locked،
+                      timestamp (epoch، NaN = ندارد)، طول سریال
+    serial  ASCII
+    body    یک struct ثابت برای هر نوع دستگاه (LAYOUTS)
+
+- مقادیر مثل رجیسترهای PLC عدد صحیح مقیاس‌شده‌اند (مثلاً دما × 10)؛
+  بزرگ‌ترین مقدار نوع (0xFFFF، 0x7FFF، ...) = فیلد ندارد
+- کد وضعیت: ترتیب DEVICE_STATUSES؛ 0xFF = ندارد (مثل door_locked)
+- تشخیص قالب با بایت اول: JSON همیشه با '{' یا فاصله شروع می‌شود و بایت
+  نسخه (1..31) هیچ‌وقت شروع JSON معتبر نیست؛ پس JSON بدون تغییر کار می‌کند
+- خروجی decode همان dict کلیدهای payload JSON است (timestamp به صورت
+  epoch) تا اعتبارسنجی و ذخیره یک مسیر داشته باشند
+
+    raw = encode_binary(payload, 'autoclave')       # gateway / simulate_fleet --format binary
+    payload = decode_payload(message.payload)        # on_message (باینری یا JSON)
+
+بنچمارک: python benchmarks/bench_mqtt_codec.py
+"""
+
+import json
+import math
+import struct
+from typing import Dict, Tuple
+
+from core.mqtt_pipeline import parse_timestamp
+from core.reading_batch import DEVICE_STATUSES
+
+BINARY_VERSION = 1
+# بایت‌های اول JSON معتبر (فاصله‌ها، object، array)
+_JSON_START = frozenset(b' \t\r\n{[')
+
+_HEADER = struct.Struct('<BBBBdB')
+_NONE = 0xFF
+_STATUS_CODE = {status: code for code, status in enumerate(DEVICE_STATUSES)}
+
+# مقدار «ندارد» هر کد struct
+_ABSENT = {'h': 0x7FFF, 'H': 0xFFFF, 'I': 0xFFFFFFFF}
+
+# نوع دستگاه → فیلدها به ترتیب روی سیم: (کلید payload، کد struct، مقسوم‌علیه)
+LAYOUTS: Dict[str, Tuple[Tuple[str, str, int], ...]] = {
+    'autoclave': (
+        ('temp_c', 'h', 10),
+        ('pressure', 'H', 100),
+        ('steam_flow', 'H', 10),
+        ('water_level', 'H', 10),
+        ('power_kw', 'H', 10),
+        ('voltage', 'H', 10),
+        ('current', 'H', 10),
+    ),
+    'incinerator': (
+        ('combustion_temp', 'h', 10),
+        ('post_combustion_temp', 'h', 10),
+        ('exhaust_temp', 'h', 10),
+        ('co2', 'I', 1),
+        ('co', 'H', 1),
+        ('nox', 'H', 1),
+        ('so2', 'H', 1),
+        ('fuel_flow', 'H', 10),
+        ('power_kw', 'H', 10),
+        ('voltage', 'H', 10),
+        ('current', 'H', 10),
+    ),
+}
+DEVICE_TYPE_CODES = {device_type: code for code, device_type in enumerate(LAYOUTS)}
+
+
+class _Layout:
+    """struct و جدول فیلدهای از پیش محاسبه‌شده یک نوع دستگاه"""
+    __slots__ = ('device_type', 'body', 'fields')
+
+    def __init__(self, device_type: str, fields):
+        self.device_type = device_type
+        self.body = struct.Struct('<' + ''.join(code for _, code, _ in fields))
+        # (کلید، مقدار «ندارد»، مقسوم‌علیه)
+        self.fields = tuple((key, _ABSENT[code], scale) for key, code, scale in fields)
+
+    def decode(self, values, payload: dict):
+        """مقادیر struct → کلیدهای payload (فیلد «ندارد» اضافه نمی‌شود)"""
+        for (key, absent, scale), value in zip(self.fields, values):
+            if value != absent:
+                payload[key] = value / scale if scale != 1 else value
+
+
+_LAYOUTS = tuple(_Layout(device_type, fields) for device_type, fields in LAYOUTS.items())
+
+
+def encode_binary(payload: dict, device_type: str) -> bytes:
+    """
+    payload هم‌شکل JSON → قالب باینری v1؛ ValueError اگر مقداری در struct جا نشود
+    timestamp با همان قاعده parse_timestamp (ISO بدون منطقه زمانی = TIME_ZONE) به epoch تبدیل می‌شود
+    """
+    layout = _LAYOUTS[DEVICE_TYPE_CODES[device_type]]
+    serial = (payload.get('device_id') or payload.get('serial_number') or '').encode('ascii')
+    timestamp = payload.get('timestamp')
+    if timestamp is not None:
+        epoch = parse_timestamp(timestamp)
+        if epoch is None:
+            raise ValueError(f"timestamp نامعتبر برای قالب باینری v1: {timestamp!r}")
+        timestamp = epoch
+    door_locked = payload.get('door_locked')
+    values = []
+    for key, absent, scale in layout.fields:
+        value = payload.get(key)
+        values.append(absent if value is None else round(value * scale))
+    try:
+        return b''.join((
+            _HEADER.pack(
+                BINARY_VERSION,
+                DEVICE_TYPE_CODES[device_type],
+                _STATUS_CODE[payload['status']] if 'status' in payload else _NONE,
+                _NONE if door_locked is None else int(bool(door_locked)),
+                math.nan if timestamp is None else timestamp,
+                len(serial),
+            ),
+            serial,
+            layout.body.pack(*values),
+        ))
+    except (struct.error, KeyError) as e:
+        raise ValueError(f"payload در قالب باینری v1 جا نمی‌شود: {e}") from e
+
+
+def decode_binary(raw: bytes) -> dict:
+    """قالب باینری v1 → dict کلیدهای payload JSON"""
+    try:
+        version, type_code, status, door_locked, timestamp, serial_length = _HEADER.unpack_from(raw)
+        if version != BINARY_VERSION:
+            raise ValueError(f"نسخه قالب باینری پشتیبانی نمی‌شود: {version}")
+        layout = _LAYOUTS[type_code]
+        offset = _HEADER.size + serial_length
+        payload = {'device_id': raw[_HEADER.size:offset].decode('ascii')}
+        values = layout.body.unpack_from(raw, offset)
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"payload باینری نامعتبر ({len(raw)} بایت): {e}") from e
+    if offset + layout.body.size != len(raw):
+        raise ValueError(f"طول payload باینری {len(raw)} بایت است، {offset + layout.body.size} انتظار می‌رفت")
+
+    layout.decode(values, payload)
+    if status != _NONE:
+        if status >= len(DEVICE_STATUSES):
+            raise ValueError(f"کد وضعیت ناشناخته در payload باینری: {status}")
+        payload['status'] = DEVICE_STATUSES[status]
+    if door_locked != _NONE:
+        payload['door_locked'] = bool(door_locked)
+    if timestamp == timestamp:
+        payload['timestamp'] = timestamp
+    return payload
+
+
+def decode_payload(raw: bytes) -> dict:
+    """
+    payload پیام MQTT (bytes) → dict؛ باینری بر اساس بایت اول، وگرنه JSON
+    ValueError برای payload نامعتبر (JSONDecodeError و UnicodeDecodeError هم ValueError هستند)
+    """
+    if raw and raw[0] not in _JSON_START:
+        return decode_binary(raw)
+    payload = json.loads(raw.decode('utf-8'))
+    if not isinstance(payload, dict):
+        raise ValueError(f"payload JSON باید object باشد، دریافت شد: {type(payload).__name__}")
+    return payload
@@ -0,0 +1,300 @@
+"""
+============================================================
+MQTT Consumer — چند پروسه مصرف‌کننده با shared subscription (MQTT v5)
+============================================================
+start_mqtt_listener یک client و یک thread روی {MQTT_TOPIC_PREFIX}/# است؛
+کل ترافیک IoT روی یک هسته پردازش می‌شود. این ماژول دستگاه‌ها را
+بین N پروسه worker تقسیم می‌کند (crc32(topic یا serial) % N، پایدار بین اجراها)
+و هر worker فقط topic دستگاه‌های سهم خود را subscribe می‌کند:
+
+    $share/<group>/<MQTT_TOPIC_PREFIX>/<serial>/#     (یا Device.mqtt_topic)
+
+قرارداد topic (برخلاف start_mqtt_listener که کل {MQTT_TOPIC_PREFIX}/# را
+می‌گیرد): دستگاه یا روی {prefix}/{serial} و زیرشاخه‌های آن منتشر می‌کند، یا
+Device.mqtt_topic آن (هر layout، wildcard مجاز) تنظیم شده است. دستگاه بر
+اساس serial داخل payload شناسایی می‌شود، پس چند دستگاه می‌توانند یک
+mqtt_topic مشترک داشته باشند؛ همه در یک سهم و با یک subscription می‌مانند.
+دستگاهی که topic آن ساختنی نیست (سریال خالی یا دارای / + #، بدون
+mqtt_topic) subscribe نمی‌شود و لاگ می‌شود.
+
+- broker هر پیام را فقط به پروسه صاحب آن دستگاه می‌فرستد (بدون فیلتر
+  در مصرف‌کننده)؛ ترتیب پیام‌های هر دستگاه حفظ می‌شود چون یک پروسه،
+  یک thread شبکه و یک صف FIFO (core.mqtt_pipeline) آن را پردازش می‌کند
+- سیکل‌های هر دستگاه فقط در یک پروسه باز/بسته می‌شوند (DeviceStateTracker)
+- اجرای همین دستور روی سرور دیگری با همان group و تعداد worker، هر سهم را
+  بین دو پروسه تقسیم می‌کند (افزونگی)؛ در آن حالت ترتیب فقط داخل هر
+  پروسه تضمین می‌شود
+- هر worker هر RELOAD_SECONDS دستگاه‌های فعال را می‌خواند و فقط
+  topicهای اضافه/حذف‌شده را subscribe/unsubscribe می‌کند
+
+    supervisor = MqttConsumerSupervisor(workers=4)
+    supervisor.start()
+    while True:
+        supervisor.check()              # راه‌اندازی مجدد workerهای مرده
+        supervisor.loads()              # worker → آخرین گزارش بار
+"""
+
+import logging
+import os
+import signal
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Set
+
+from core.mqtt_codec import decode_payload
+from core.poller_supervisor import PollerSupervisor
+
+logger = logging.getLogger(__name__)
+
+# حداکثر topic در هر بسته SUBSCRIBE/UNSUBSCRIBE
+SUBSCRIBE_CHUNK = 200
+
+
+def serial_shard(serial: str, count: int) -> int:
+    """سهم worker هر دستگاه بر اساس سریال (پایدار بین اجراها و پروسه‌ها)"""
+    return zlib.crc32(serial.encode()) % count
+
+
+def device_topic(serial: str, mqtt_topic: str, prefix: str) -> Optional[str]:
+    """
+    topic دستگاه: Device.mqtt_topic در صورت تنظیم، وگرنه {prefix}/{serial}/#
+    (که خود {prefix}/{serial} را هم می‌گیرد)؛ None اگر سریال در topic نگنجد
+    """
+    if mqtt_topic:
+        return mqtt_topic
+    if not serial or any(char in serial for char in "/+#"):
+        return None
+    return f"{prefix}/{serial}/#"
+
+
+# ============================================================
+# WORKER (داخل پروسه فرزند)
+# ============================================================
+class MqttConsumerWorker:
+    """client MQTT v5 و subscriptionهای یک سهم (shard) داخل پروسه worker"""
+
+    def __init__(self, index: int, count: int, group: str):
+        self.index = index
+        self.count = count
+        self.group = group
+        self.topics: Dict[str, Set[int]] = {}  # topic filter → device_idها (topic مشترک)
+        self.unroutable: Set[str] = set()      # دستگاه‌های بدون topic (فقط worker 0 لاگ می‌کند)
+        self.connected = False
+        self.reloads = 0
+        self.decode_errors = 0
+        self.client = None
+        self._lock = threading.Lock()
+        self._cpu = (time.monotonic(), time.process_time())
+        self._processed = (time.monotonic(), 0)
+
+    def _shared(self, topic: str) -> str:
+        return f"$share/{self.group}/{topic}"
+
+    def wanted(self) -> Dict[str, Set[int]]:
+        """topic دستگاه‌های فعال این سهم → device_idها (یک SELECT)"""
+        from django.conf import settings
+        from apps.devices.models import Device
+
+        rows = Device.objects.filter(is_active=True).values_list("pk", "serial_number", "mqtt_topic")
+        wanted: Dict[str, Set[int]] = {}
+        unroutable = set()
+        for pk, serial, mqtt_topic in rows:
+            explicit = (mqtt_topic or "").strip()
+            topic = device_topic(serial, explicit, settings.MQTT_TOPIC_PREFIX)
+            if topic is None:
+                unroutable.add(f"#{pk} ({serial!r})")
+            # سهم بر اساس topic صریح: دستگاه‌های هم‌topic در یک پروسه
+            elif serial_shard(explicit or serial, self.count) == self.index:
+                wanted.setdefault(topic, set()).add(pk)
+        new = unroutable - self.unroutable
+        if new and self.index == 0:
+            logger.warning(
+                f"topic MQTT برای دستگاه‌های {', '.join(sorted(new))} ساخته نمی‌شود "
+                f"(سریال خالی یا دارای / + #)؛ Device.mqtt_topic را تنظیم کنید"
+            )
+        self.unroutable = unroutable
+        return wanted
+
+    def _subscribe(self, topics: List[str]):
+        import paho.mqtt.client as mqtt
+
+        for start in range(0, len(topics), SUBSCRIBE_CHUNK):
+            chunk = topics[start:start + SUBSCRIBE_CHUNK]
+            self.client.subscribe([(self._shared(topic), mqtt.SubscribeOptions(qos=1)) for topic in chunk])
+
+    def _unsubscribe(self, topics: List[str]):
+        for start in range(0, len(topics), SUBSCRIBE_CHUNK):
+            self.client.unsubscribe([self._shared(topic) for topic in topics[start:start + SUBSCRIBE_CHUNK]])
+
+    def start(self):
+        """ساخت client و اتصال غیرمسدود (paho خودش دوباره وصل می‌شود)"""
+        import paho.mqtt.client as mqtt
+        from django.conf import settings
+        from core.mqtt_pipeline import get_pipeline
+
+        pipeline = get_pipeline()
+        pipeline.start()
+
+        def on_connect(client, userdata, flags, reason_code, properties):
+            if reason_code.is_failure:
+                logger.error(f"❌ worker {self.index}: خطا در اتصال MQTT: code={reason_code}")
+                return
+            # clean start: subscriptionها بعد از هر اتصال دوباره ثبت می‌شوند
+            with self._lock:
+                self.connected = True
+                self._subscribe(list(self.topics))
+            logger.info(f"✅ worker {self.index}: به MQTT Broker متصل شد ({len(self.topics)} topic)")
+
+        def on_message(client, userdata, message):
+            try:
+                payload = decode_payload(message.payload)
+            except ValueError as e:
+                self.decode_errors += 1
+                logger.error(f"خطا در parse MQTT payload ({message.topic}): {e}")
+                return
+            pipeline.submit(payload, message.topic)
+
+        def on_disconnect(client, userdata, flags, reason_code, properties):
+            self.connected = False
+            if reason_code.is_failure:
+                logger.warning(f"worker {self.index}: قطع ارتباط MQTT: code={reason_code}")
+
+        client = mqtt.Client(
+            mqtt.CallbackAPIVersion.VERSION2,
+            client_id=f"hospital_monitor_{self.group}_{self.index}_{os.getpid()}",
+            protocol=mqtt.MQTTv5,
+        )
+        client.on_connect = on_connect
+        client.on_message = on_message
+        client.on_disconnect = on_disconnect
+        if settings.MQTT_USERNAME:
+            client.username_pw_set(settings.MQTT_USERNAME, settings.MQTT_PASSWORD)
+        client.reconnect_delay_set(1, 30)
+        self.client = client
+        client.connect_async(settings.MQTT_BROKER_HOST, settings.MQTT_BROKER_PORT, 60, clean_start=True)
+        client.loop_start()
+
+    def reload(self):
+        """هم‌گام کردن subscriptionها با دیتابیس؛ فقط topicهای تغییرکرده لمس می‌شوند"""
+        from core.device_state import get_device_tracker
+
+        wanted = self.wanted()
+        with self._lock:
+            removed = [topic for topic in self.topics if topic not in wanted]
+            added = [topic for topic in wanted if topic not in self.topics]
+            if self.connected:
+                if removed:
+                    self._unsubscribe(removed)
+                if added:
+                    self._subscribe(added)
+            tracker = get_device_tracker()
+            dropped = set().union(*self.topics.values()) - set().union(*wanted.values())
+            for device_id in dropped:
+                tracker.forget(device_id)
+            self.topics = wanted
+        if removed or added:
+            logger.info(f"🔄 worker {self.index}: {len(added)} topic اضافه، {len(removed)} topic حذف شد")
+        self.reloads += 1
+
+    def load(self) -> dict:
+        """گزارش بار این worker برای supervisor"""
+        import resource
+        from core.bulk_writer import get_bulk_writer
+        from core.mqtt_pipeline import get_pipeline
+        from core.ws_publisher import get_publisher
+
+        now, cpu = time.monotonic(), time.process_time()
+        wall_delta, cpu_delta = now - self._cpu[0], cpu - self._cpu[1]
+        self._cpu = (now, cpu)
+        pipeline = get_pipeline().stats()
+        rate_delta = now - self._processed[0]
+        rate = (pipeline["processed"] - self._processed[1]) / rate_delta if rate_delta > 0 else 0.0
+        self._processed = (now, pipeline["processed"])
+        writer = get_bulk_writer().stats()
+        return {
+            "worker": self.index,
+            "pid": os.getpid(),
+            "connected": self.connected,
+            "topics": len(self.topics),
+            "devices": sum(len(device_ids) for device_ids in self.topics.values()),
+            "messages_per_second": round(rate, 1),
+            "cpu_pct": round(100 * cpu_delta / wall_delta, 1) if wall_delta > 0 else 0.0,
+            "rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "decode_errors": self.decode_errors,
+            **{f"pipeline_{key}": value for key, value in pipeline.items()},
+            "written": writer["written"],
+            "pending": writer["pending"],
+            "spool_backlog": writer.get("spool", {}).get("backlog_rows", 0),
+            "ws_pending": get_publisher().pending,
+            "reported_at": time.time(),
+        }
+
+    def shutdown(self):
+        from core.bulk_writer import get_bulk_writer
+        from core.mqtt_pipeline import get_pipeline
+        from core.status_cache import get_status_cache
+        from core.ws_publisher import get_publisher
+
+        # اول قطع دریافت، بعد خالی کردن صف pipeline و بافرها
+        if self.client is not None:
+            self.client.disconnect()
+            self.client.loop_stop()
+        get_pipeline().stop()
+        get_bulk_writer().stop()
+        get_status_cache().stop()
+        get_publisher().stop()
+
+
+def run_worker(index: int, count: int, reload_seconds: float, group: str, loads):
+    """
+    نقطه ورود پروسه worker (spawn)؛ توقف با SIGTERM
+    گزارش بار روی Pipe اختصاصی همین worker (مثل core.poller_supervisor)
+    """
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    django.setup()
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda sig, frame: stop.set())
+
+    from django.db import close_old_connections
+
+    worker = MqttConsumerWorker(index, count, group)
+    logger.info(f"🚀 MQTT consumer {index}/{count} شروع شد (pid {os.getpid()}، group {group})")
+    try:
+        worker.start()
+        while not stop.is_set():
+            try:
+                worker.reload()
+            except Exception as e:
+                # دیتابیس در دسترس نیست: subscriptionهای فعلی ادامه می‌دهند
+                logger.error(f"MQTT consumer {index}: خطا در بارگذاری دستگاه‌ها: {e}")
+            close_old_connections()
+            try:
+                loads.send(worker.load())
+            except (BrokenPipeError, OSError):
+                # supervisor مرده؛ worker یتیم نماند
+                break
+            stop.wait(reload_seconds)
+    finally:
+        worker.shutdown()
+        logger.info(f"⏹ MQTT consumer {index} متوقف شد")
+
+
+# ============================================================
+# SUPERVISOR (پروسه والد)
+# ============================================================
+class MqttConsumerSupervisor(PollerSupervisor):
+    """همان راه‌اندازی مجدد با backoff و گزارش بار PollerSupervisor، با worker مصرف‌کننده MQTT"""
+
+    worker_target = staticmethod(run_worker)
+    worker_name = "mqtt-consumer"
+
+    def __init__(self, workers=None, reload_seconds: float = 10.0, group: str = "hospital_monitor"):
+        super().__init__(workers=workers, reload_seconds=reload_seconds)
+        self.group = group
+
+    def _worker_args(self, index: int, loads) -> tuple:
+        return (index, self.count, self.reload_seconds, self.group, loads)
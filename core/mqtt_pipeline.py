@@ -0,0 +1,444 @@
+"""
+============================================================
+MQTT Ingest Pipeline — پردازش دسته‌ای پیام‌های سنسور MQTT
+============================================================
+قبلاً handle_sensor_data روی thread شبکه paho برای هر پیام چند کوئری
+اجرا می‌کرد (دستگاه، سیکل فعال، INSERT، UPDATE دستگاه، exists() هشدارها)
+به علاوه یک group_send؛ یک کوئری کند کل حلقه MQTT را متوقف می‌کرد.
+
+callback paho فقط پیام decode‌شده را در صف می‌گذارد و یک thread پردازش
+هر LINGER_MS (یا هر MAX_BATCH پیام، هر کدام زودتر) کل صف را یک‌جا
+پردازش می‌کند:
+
+- دستگاه و سیکل فعال همه سریال‌ها: DeviceStateTracker.by_serials
+  (در حالت پایدار بدون کوئری، سریال‌های جدید با یک SELECT)
+- اعتبارسنجی محدوده‌ها برای خوانش‌های هر نوع دستگاه یک‌جا
+  (core.sensor_schema.get_validator) و ستون‌ها مستقیم در ReadingBatch
+- یک ReadingBatch → BulkWriter (یک executemany)
+- هشدارها: AlertChecker.check_batch (مقایسه برداری، یک SELECT هشدارهای
+  باز و یک bulk_create)
+- وضعیت دستگاه‌ها در status cache و آخرین پیام هر دستگاه در publisher
+- صف محدود (MAX_QUEUE خوانش): وقتی پر باشد callback تا BLOCK_SECONDS
+  منتظر می‌ماند (broker پیام‌های QoS 1 را نگه می‌دارد) و بعد پیام رد و
+  شمرده می‌شود
+- زمان هر خوانش timestamp خود payload است (epoch ثانیه/میلی‌ثانیه یا
+  ISO 8601؛ بدون منطقه زمانی = TIME_ZONE)؛ بدون timestamp = زمان دریافت.
+  خوانش بیش از MAX_CLOCK_SKEW ثانیه در آینده رد می‌شود
+
+پیام دسته‌ای gateway (بافر زمان قطعی شبکه، مثلاً یک ساعت داده 1Hz در یک
+publish): کلیدهای بیرونی برای همه خوانش‌ها مشترک‌اند و هر خوانش باید
+timestamp داشته باشد؛ readings آرایه خوانش‌ها یا ستونی (آرایه‌های هم‌طول،
+مقدار تکی = برای همه):
+
+    {"device_id": "AC-00001", "readings": [{"timestamp": 1760000000, "temp_c": 121.4}, ...]}
+    {"device_id": "AC-00001", "status": "sterilizing",
+     "readings": {"timestamp": [1760000000, 1760000001], "temp_c": [121.4, 121.6]}}
+
+    get_pipeline().submit(payload, topic)      # on_message
+    get_pipeline().process([(payload, topic, time.time())])   # همگام (تسک شبیه‌ساز)
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional, Tuple
+
+from core.reading_batch import DEVICE_STATUSES, status_code
+from core.sensor_schema import validator_stats
+
+logger = logging.getLogger(__name__)
+
+# (payload، topic، زمان دریافت epoch)
+Message = Tuple[dict, str, float]
+
+# timestamp عددی بزرگ‌تر از این میلی‌ثانیه است (سال ۵۱۳۸ به ثانیه)
+_EPOCH_MS_THRESHOLD = 1e11
+
+
+def reading_count(data: dict) -> int:
+    """تعداد خوانش یک پیام (پیام دسته‌ای: طول readings)"""
+    readings = data.get('readings')
+    if isinstance(readings, list):
+        return len(readings) or 1
+    if isinstance(readings, dict):
+        timestamps = readings.get('timestamp')
+        return len(timestamps) if isinstance(timestamps, list) and timestamps else 1
+    return 1
+
+
+def expand_readings(data: dict) -> List[dict]:
+    """پیام دسته‌ای → یک dict هم‌شکل پیام تکی برای هر خوانش؛ ValueError برای شکل نامعتبر"""
+    shared = {key: value for key, value in data.items() if key != 'readings'}
+    readings = data['readings']
+    if isinstance(readings, list):
+        if not all(isinstance(reading, dict) for reading in readings):
+            raise ValueError("هر عضو readings باید object باشد")
+        return [{**shared, **reading} for reading in readings]
+    if not isinstance(readings, dict):
+        raise ValueError(f"readings باید آرایه یا object ستونی باشد، دریافت شد: {type(readings).__name__}")
+
+    timestamps = readings.get('timestamp')
+    if not isinstance(timestamps, list):
+        raise ValueError("readings ستونی باید آرایه timestamp داشته باشد")
+    columns = {}
+    for key, value in readings.items():
+        if isinstance(value, list):
+            if len(value) != len(timestamps):
+                raise ValueError(f"طول ستون {key} ({len(value)}) با timestamp ({len(timestamps)}) برابر نیست")
+            columns[key] = value
+        else:
+            shared[key] = value
+    keys = tuple(columns)
+    return [{**shared, **dict(zip(keys, values))} for values in zip(*columns.values())]
+
+
+def parse_timestamp(value) -> Optional[float]:
+    """timestamp payload → epoch ثانیه؛ None اگر قابل تبدیل نباشد"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        value = float(value)
+        if value != value:
+            return None
+        return value / 1000 if value > _EPOCH_MS_THRESHOLD else value
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            from django.utils import timezone as django_timezone
+            parsed = django_timezone.make_aware(parsed)
+        return parsed.timestamp()
+    return None
+
+
+def _sensor_message(batch, row: int, device_id: int) -> dict:
+    """همان شکل پیام WebSocket مسیر قبلی MQTT"""
+    def value(name):
+        v = getattr(batch, name)[row]
+        return None if v != v else v
+
+    return {
+        'device_id': device_id,
+        'timestamp': datetime.fromtimestamp(batch.timestamp[row], timezone.utc).isoformat(),
+        'temperature': value('temperature_c'),
+        'pressure': value('pressure_bar'),
+        'power': value('power_consumption_kw'),
+        'combustion_temp': value('combustion_temp_c'),
+        'co_ppm': value('co_ppm'),
+        'status': DEVICE_STATUSES[batch.status[row]],
+    }
+
+
+class MqttIngestPipeline:
+    def __init__(self, max_batch: int = 2000, linger_ms: int = 20,
+                 max_queue: int = 50_000, block_seconds: float = 1.0,
+                 max_readings: int = 86_400, max_clock_skew: float = 300.0):
+        # max_batch و max_queue بر حسب خوانش (پیام دسته‌ای = چند خوانش)
+        self.max_batch = max_batch
+        self.linger_seconds = linger_ms / 1000
+        self.max_queue = max_queue
+        self.block_seconds = block_seconds
+        self.max_readings = max_readings
+        self.max_clock_skew = max_clock_skew
+
+        # (پیام، تعداد خوانش)
+        self._queue: Deque[Tuple[Message, int]] = deque()
+        self._queued = 0
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.received = 0
+        self.processed = 0
+        self.invalid = 0
+        self.future = 0
+        self.unknown = 0
+        self.rejected = 0
+        self.batches = 0
+        self.alerts = 0
+        self.last_batch_ms = 0.0
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="mqtt-ingest", daemon=True)
+            self._thread.start()
+
+    # ── callback paho ──────────────────────────────────────
+    def submit(self, data: dict, topic: str, received_at: Optional[float] = None) -> bool:
+        """False = صف تا block_seconds پر ماند و پیام رد شد"""
+        if received_at is None:
+            received_at = time.time()
+        if self._thread is None:
+            self.start()
+        rows = reading_count(data)
+        with self._cond:
+            # پیام بزرگ‌تر از کل سقف در صف خالی پذیرفته می‌شود
+            if self._queue and self._queued + rows > self.max_queue:
+                deadline = time.monotonic() + self.block_seconds
+                while self._queue and self._queued + rows > self.max_queue:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or self._stopping:
+                        self.rejected += 1
+                        if self.rejected % 1000 == 1:
+                            logger.error(
+                                f"صف پردازش MQTT پر است ({self._queued:,} خوانش) — "
+                                f"{self.rejected:,} پیام رد شد"
+                            )
+                        return False
+                    self._cond.wait(remaining)
+            self._queue.append(((data, topic, received_at), rows))
+            self._queued += rows
+            self.received += 1
+            if len(self._queue) == 1 or self._queued >= self.max_batch:
+                self._cond.notify_all()
+        return True
+
+    @property
+    def pending(self) -> int:
+        return self._queued
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "received": self.received,
+            "processed": self.processed,
+            "invalid": self.invalid,
+            "future": self.future,
+            "unknown": self.unknown,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "avg_batch": round(self.processed / self.batches, 1) if self.batches else 0,
+            "alerts": self.alerts,
+            "last_batch_ms": round(self.last_batch_ms, 1),
+            "rejections": validator_stats(),
+        }
+
+    # ── thread پردازش ──────────────────────────────────────
+    def _run(self):
+        from django.db import close_old_connections
+
+        while True:
+            with self._cond:
+                while not self._queue:
+                    if self._stopping:
+                        return
+                    self._cond.wait()
+                if self.linger_seconds and not self._stopping:
+                    # چند میلی‌ثانیه صبر تا دسته بزرگ‌تر شود
+                    self._cond.wait_for(
+                        lambda: self._queued >= self.max_batch or self._stopping, self.linger_seconds
+                    )
+                # حداقل یک پیام، تا max_batch خوانش
+                messages, rows = [], 0
+                while self._queue and (not messages or rows + self._queue[0][1] <= self.max_batch):
+                    message, count = self._queue.popleft()
+                    messages.append(message)
+                    rows += count
+                self._queued -= rows
+                self._cond.notify_all()  # جا برای callbackهای منتظر
+
+            try:
+                self.process(messages)
+            except Exception as e:
+                logger.error(f"خطا در پردازش دسته {len(messages)} پیام MQTT: {e}", exc_info=True)
+            close_old_connections()
+
+    def process(self, messages: List[Message]) -> int:
+        """پردازش یک دسته پیام؛ خروجی: تعداد خوانش ثبت‌شده"""
+        from core.bulk_writer import get_bulk_writer
+        from core.calculators import AlertChecker
+        from core.device_state import get_device_tracker
+        from core.reading_batch import ReadingBatch
+        from core.sensor_schema import get_validator
+        from core.status_cache import get_status_cache
+        from core.ws_publisher import get_publisher
+
+        started = time.perf_counter()
+        latest_allowed = time.time() + self.max_clock_skew
+        # (serial، خوانش، زمان خوانش، زمان دریافت)
+        valid = []
+        for data, topic, received_at in messages:
+            serial = data.get('device_id') or data.get('serial_number')
+            if not serial:
+                self.invalid += 1
+                logger.warning(f"داده بدون device_id: {str(data)[:200]}")
+                continue
+            if 'readings' not in data:
+                readings, default_time = [data], received_at
+            else:
+                try:
+                    readings = expand_readings(data)
+                except ValueError as e:
+                    self.invalid += 1
+                    logger.warning(f"پیام دسته‌ای نامعتبر از {serial} (topic={topic}): {e}")
+                    continue
+                if len(readings) > self.max_readings:
+                    self.invalid += len(readings)
+                    logger.warning(
+                        f"پیام دسته‌ای {serial} با {len(readings):,} خوانش بیش از سقف "
+                        f"{self.max_readings:,} است — رد شد"
+                    )
+                    continue
+                # در پیام دسته‌ای timestamp هر خوانش الزامی است
+                default_time = None
+
+            rows, errors, invalid = [], None, 0
+            for reading in readings:
+                when = parse_timestamp(reading['timestamp']) if 'timestamp' in reading else default_time
+                if when is None:
+                    invalid += 1
+                    errors = errors or [f"timestamp نامعتبر: {reading.get('timestamp')!r}"]
+                    continue
+                if when > latest_allowed:
+                    self.future += 1
+                    invalid += 1
+                    errors = errors or [f"timestamp {when:.0f} بیش از {self.max_clock_skew:g}s در آینده است"]
+                    continue
+                rows.append((when, reading))
+            if invalid:
+                self.invalid += invalid
+                logger.warning(
+                    f"داده نامعتبر از {serial} (topic={topic})"
+                    + (f"، {invalid:,} از {len(readings):,} خوانش" if len(readings) > 1 else "")
+                    + f": {errors}"
+                )
+            if len(rows) > 1:
+                # gateway ممکن است نامرتب بفرستد؛ تغییر فاز سیکل به ترتیب زمان دیده شود
+                rows.sort(key=lambda row: row[0])
+            valid.extend((serial, reading, when, received_at) for when, reading in rows)
+        if not valid:
+            return 0
+
+        tracker = get_device_tracker()
+        states = tracker.by_serials({serial for serial, _, _, _ in valid})
+        # نوع دستگاه → (وضعیت دستگاه، serial، خوانش، زمان خوانش، زمان دریافت) به ترتیب ورود
+        groups: Dict[str, list] = {}
+        missing = set()
+        for entry in valid:
+            state = states.get(entry[0])
+            if state is None:
+                self.unknown += 1
+                missing.add(entry[0])
+                continue
+            groups.setdefault(state.device.device_type, []).append((state,) + entry)
+        if missing:
+            logger.warning(f"دستگاه با serial {', '.join(sorted(missing))} پیدا نشد")
+
+        batch = ReadingBatch()
+        # device_id → (ردیف جدیدترین خوانش، زمان آن، زمان دریافت)
+        latest: Dict[int, Tuple[int, float, float]] = {}
+        for device_type, entries in groups.items():
+            columns, mask, errors = get_validator(device_type).validate_batch(
+                [data for _, _, data, _, _ in entries]
+            )
+            device_ids, timestamps, statuses, cycle_ids, rejected = [], [], [], [], []
+            row = len(batch)
+            for (state, serial, data, when, received_at), is_valid in zip(entries, mask):
+                device_ids.append(state.device.pk)
+                timestamps.append(when)
+                statuses.append(status_code(data.get('status', 'idle')))
+                if not is_valid:
+                    cycle_ids.append(0)
+                    rejected.append(serial)
+                    continue
+                cycle = state.cycle
+                if 'status' in data:
+                    # فقط وضعیت صریح سنسور سیکل را باز/بسته می‌کند (نه پیش‌فرض idle)؛
+                    # خوانشی که سیکل را می‌بندد جزو همان سیکل است
+                    cycle = tracker.observe(state, data['status'], datetime.fromtimestamp(when, timezone.utc)) or cycle
+                cycle_ids.append(cycle.pk if cycle else 0)
+                previous = latest.get(state.device.pk)
+                if previous is None or when >= previous[1]:
+                    latest[state.device.pk] = (row, when, received_at)
+                row += 1
+            if rejected:
+                self.invalid += len(rejected)
+                serials = sorted(set(rejected))
+                logger.warning(
+                    f"داده نامعتبر از {', '.join(serials[:5])}{'، ...' if len(serials) > 5 else ''} "
+                    f"({len(rejected):,} از {len(entries):,} خوانش {device_type}): {errors}"
+                )
+            batch.extend(ReadingBatch.from_columns(len(entries), {
+                **columns,
+                'device_id': device_ids,
+                'cycle_id': cycle_ids,
+                'timestamp': timestamps,
+                'status': statuses,
+            }).filter(mask))
+        if not len(batch):
+            return 0
+
+        # ذخیره — در بافر نویسنده دسته‌ای (core.bulk_writer)؛ بعد محاسبه انرژی سیکل‌های تمام‌شده
+        get_bulk_writer().add(batch)
+        tracker.dispatch_completed()
+
+        # وضعیت دستگاه‌ها (تغییر وضعیت فوری، last_seen دسته‌ای)؛ last_seen = زمان دریافت
+        # (بارگذاری بافر قدیمی gateway یعنی دستگاه همین الان در دسترس است)
+        status_cache = get_status_cache()
+        for device_id, (_, _, received_at) in latest.items():
+            status_cache.record(device_id, 'online', datetime.fromtimestamp(received_at, timezone.utc))
+
+        try:
+            self.alerts += len(AlertChecker.check_batch(
+                batch, {state.device.pk: state.device.device_type for state in states.values()}
+            ))
+        except Exception as e:
+            logger.error(f"خطا در بررسی هشدار دسته {len(batch)} خوانش MQTT: {e}")
+
+        # WebSocket — فقط آخرین خوانش هر دستگاه، در صف publisher
+        publisher = get_publisher()
+        for device_id, (row, _, _) in latest.items():
+            publisher.publish(f"device_{device_id}", {
+                'type': 'sensor_update',
+                'data': _sensor_message(batch, row, device_id),
+            })
+
+        self.processed += len(batch)
+        self.batches += 1
+        self.last_batch_ms = (time.perf_counter() - started) * 1000
+        return len(batch)
+
+    def stop(self, timeout: float = 10.0):
+        """پردازش پیام‌های باقی‌مانده صف و توقف"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._queue:
+            logger.error(f"⚠️ {len(self._queue):,} پیام MQTT هنگام توقف پردازش نشد")
+
+
+_pipeline: Optional[MqttIngestPipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline() -> MqttIngestPipeline:
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            from django.conf import settings
+            from core.bulk_writer import get_bulk_writer
+            from core.status_cache import get_status_cache
+            from core.ws_publisher import get_publisher
+
+            # مصرف‌کننده‌ها زودتر ساخته شوند تا atexit (LIFO) آن‌ها را بعد از
+            # خالی شدن صف pipeline متوقف کند
+            get_bulk_writer(), get_status_cache(), get_publisher()
+            _pipeline = MqttIngestPipeline(
+                max_batch=getattr(settings, "MQTT_BATCH_MAX", 2000),
+                linger_ms=getattr(settings, "MQTT_BATCH_LINGER_MS", 20),
+                max_queue=getattr(settings, "MQTT_QUEUE_MAX", 50_000),
+                block_seconds=getattr(settings, "MQTT_QUEUE_BLOCK_SECONDS", 1.0),
+                max_readings=getattr(settings, "MQTT_BATCH_MAX_READINGS", 86_400),
+                max_clock_skew=getattr(settings, "MQTT_MAX_CLOCK_SKEW_SECONDS", 300.0),
+            )
+            atexit.register(_pipeline.stop)
+        return _pipeline
@@ -0,0 +1,254 @@
+"""
+============================================================
+PLC Commands — فرمان‌های اولویت‌دار (شروع/توقف/ریست هشدار)
+============================================================
+فرمان توقف نباید پشت یک خواندن کند + timeout دو ثانیه‌ای RTU بماند:
+
+- RS485: صف فرمان RS485Bus جلوتر از همه خواندن‌های در صف
+- TCP همگام: PriorityLock — فرمان منتظر قفل، قبل از خواندن‌های منتظر قفل را می‌گیرد
+- TCP async: فرمان منتظر سهمیه max_inflight خواندن‌ها نمی‌ماند
+
+مسیر WebSocket (صفحه مانیتور دستگاه):
+
+    مرورگر ──ws──▶ DeviceConsumer ──group_send("plc_commands_<id>")──▶
+    CommandListener (پروسه polling) ── driver.remote_stop() ──▶ PLC
+    ◀── command_result (موفق/ناموفق + latency) ── channel_layer.send(reply_channel)
+
+هر پروسه polling یک CommandListener دارد و channel خودش را در گروه
+دستگاه‌هایی که poll می‌کند ثبت می‌کند؛ پس فرمان به همان پروسه‌ای
+می‌رسد که مالک اتصال PLC است.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# نام فرمان WebSocket → متد درایور
+COMMANDS = {
+    "start": "remote_start",
+    "stop": "remote_stop",
+    "reset_alarm": "reset_alarm",
+}
+
+# حداکثر زمان اجرای یک فرمان روی درایور async
+COMMAND_TIMEOUT = 10.0
+# عضویت گروه در channels_redis منقضی می‌شود (group_expiry) → ثبت دوباره
+GROUP_REFRESH_SECONDS = 3600
+# قطعی channel layer: فاصله تلاش مجدد دریافت از 1 ثانیه دو برابر می‌شود تا این سقف
+RECEIVE_BACKOFF_MAX_SECONDS = 30.0
+
+
+def command_group(device_id: int) -> str:
+    return f"plc_commands_{device_id}"
+
+
+# ============================================================
+# PRIORITY LOCK (درایور TCP همگام)
+# ============================================================
+class PriorityLock:
+    """قفلی که در آن فرمان‌های منتظر قبل از خواندن‌های منتظر قفل را می‌گیرند"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._locked = False
+        self._waiting_priority = 0
+
+    def acquire(self, priority: bool = False):
+        with self._cond:
+            if priority:
+                self._waiting_priority += 1
+                self._cond.wait_for(lambda: not self._locked)
+                self._waiting_priority -= 1
+            else:
+                self._cond.wait_for(lambda: not self._locked and not self._waiting_priority)
+            self._locked = True
+
+    def release(self):
+        with self._cond:
+            self._locked = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def hold(self, priority: bool = False):
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+# ============================================================
+# LATENCY
+# ============================================================
+class LatencyStats:
+    """آخرین N زمان رفت‌وبرگشت فرمان‌ها (ثانیه)"""
+
+    def __init__(self, size: int = 500):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {"count": 0}
+        return {
+            "count": len(samples),
+            "p50_ms": samples[len(samples) // 2] * 1000,
+            "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+            "max_ms": samples[-1] * 1000,
+        }
+
+
+command_latency = LatencyStats()
+
+
+def execute_command(driver, command: str, engine=None) -> bool:
+    """اجرای فرمان روی درایور همگام یا async (روی event loop موتور polling)"""
+    method = getattr(driver, COMMANDS[command], None)
+    if method is None:
+        return False
+    result = method()
+    if asyncio.iscoroutine(result):
+        result = engine.submit(result).result(timeout=COMMAND_TIMEOUT)
+    return bool(result)
+
+
+# ============================================================
+# COMMAND LISTENER — دریافت فرمان از channel layer در پروسه polling
+# ============================================================
+class CommandListener:
+    def __init__(self):
+        self._devices: Set[int] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._channel: Optional[str] = None
+        self._layer = None
+
+    def start(self):
+        if self._thread:
+            return
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="plc-commands", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._run(), self._loop)
+
+    def watch(self, device_id: int):
+        """این پروسه مالک polling دستگاه است → فرمان‌هایش را دریافت کند"""
+        self._devices.add(device_id)
+        self.start()
+        asyncio.run_coroutine_threadsafe(self._join(device_id), self._loop)
+
+    def unwatch(self, device_id: int):
+        self._devices.discard(device_id)
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._leave(device_id), self._loop)
+
+    async def _join(self, device_id: int):
+        if self._channel:
+            await self._layer.group_add(command_group(device_id), self._channel)
+
+    async def _leave(self, device_id: int):
+        if self._channel:
+            await self._layer.group_discard(command_group(device_id), self._channel)
+
+    async def _run(self):
+        from channels.layers import get_channel_layer
+
+        self._layer = get_channel_layer()
+        if self._layer is None:
+            logger.warning("Channel layer تنظیم نشده — فرمان‌های WebSocket غیرفعال است")
+            return
+        self._channel = await self._layer.new_channel("plc-commands")
+        self._loop.create_task(self._refresh_groups())
+
+        # فقط اولین خطای هر قطعی لاگ می‌شود (مثل ChannelPublisher)
+        failing = False
+        backoff = 1.0
+        while True:
+            try:
+                message = await self._layer.receive(self._channel)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not failing:
+                    logger.error(f"خطا در دریافت فرمان PLC (تلاش مجدد با backoff): {e}")
+                    failing = True
+                await asyncio.sleep(backoff)
+                backoff = min(RECEIVE_BACKOFF_MAX_SECONDS, backoff * 2)
+                continue
+            if failing:
+                logger.info("✅ دریافت فرمان‌های PLC دوباره برقرار شد")
+                failing = False
+                backoff = 1.0
+                # عضویت گروه‌ها ممکن است در قطعی منقضی شده باشد
+                self._loop.create_task(self._join_all())
+            self._loop.create_task(self._handle(message))
+
+    async def _join_all(self):
+        for device_id in list(self._devices):
+            try:
+                await self._join(device_id)
+            except Exception:
+                return  # channel layer هنوز در دسترس نیست؛ _run قطعی را لاگ می‌کند
+
+    async def _refresh_groups(self):
+        while True:
+            await self._join_all()
+            await asyncio.sleep(GROUP_REFRESH_SECONDS)
+
+    async def _handle(self, message: dict):
+        from core.plc_driver import get_all_pollers
+
+        device_id = message.get("device_id")
+        command = message.get("command")
+        poller = get_all_pollers().get(device_id)
+
+        started = time.monotonic()
+        success = False
+        if poller is not None and command in COMMANDS:
+            try:
+                success = await self._loop.run_in_executor(
+                    None, execute_command, poller.driver, command, getattr(poller, "engine", None)
+                )
+            except Exception as e:
+                logger.error(f"خطا در اجرای فرمان {command} — دستگاه #{device_id}: {e}")
+        bus_ms = (time.monotonic() - started) * 1000
+        latency_ms = (time.time() - message.get("sent_at", time.time())) * 1000
+        command_latency.record(latency_ms / 1000)
+
+        logger.info(
+            f"🎛 فرمان {command} — دستگاه #{device_id} ({message.get('user', '?')}): "
+            f"{'موفق' if success else 'ناموفق'} | {latency_ms:.0f}ms (PLC {bus_ms:.0f}ms)"
+        )
+        if message.get("reply_channel"):
+            await self._layer.send(message["reply_channel"], {
+                "type": "command_result",
+                "request_id": message.get("request_id"),
+                "command": command,
+                "success": success,
+                "latency_ms": round(latency_ms, 1),
+                "bus_ms": round(bus_ms, 1),
+            })
+
+
+_listener: Optional[CommandListener] = None
+_listener_lock = threading.Lock()
+
+
+def get_command_listener() -> CommandListener:
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = CommandListener()
+        return _listener
@@ -0,0 +1,275 @@
+"""
+============================================================
+Connection Manager — Backoff نمایی + Circuit Breaker برای PLCها
+============================================================
+وقتی یک PLC از برق کشیده شده یا کابلش قطع است، درایور نباید در هر
+poll دوباره connect() همگام بزند و thread را برای timeout کامل socket
+بلاک کند. این ماژول دور درایورها یک لایه مدیریت اتصال می‌گذارد:
+
+    CLOSED     → عادی؛ بعد از N خطای پشت‌سرهم → OPEN
+    OPEN       → هیچ I/O انجام نمی‌شود (read فوراً None برمی‌گرداند)
+                 تا زمان backoff (2s, 4s, 8s, ... تا سقف) برسد → HALF_OPEN
+    HALF_OPEN  → یک تلاش آزمایشی (اتصال مجدد + خواندن)
+                 موفق → CLOSED ، ناموفق → OPEN با backoff دو برابر
+
+اتصال مجدد در پس‌زمینه انجام می‌شود تا thread polling هرگز منتظر
+timeout اتصال نماند. تغییر وضعیت فقط یک بار لاگ و در Device.status
+ثبت می‌شود (OPEN → offline ، HALF_OPEN → reconnecting).
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+# CIRCUIT BREAKER
+# ============================================================
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        base_delay: float = 2.0,
+        max_delay: float = 300.0,
+        jitter: float = 0.2,
+    ):
+        self.failure_threshold = failure_threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.state = self.CLOSED
+        self.failures = 0
+        self.consecutive_opens = 0
+        self.next_attempt_at = 0.0
+        # callback(old_state, new_state) — فقط هنگام تغییر وضعیت صدا زده می‌شود
+        self.on_transition: Optional[Callable[[str, str], None]] = None
+        self._lock = threading.Lock()
+
+    def backoff_delay(self) -> float:
+        """2^n × base با سقف max_delay و jitter تا PLCهای یک خط هم‌زمان تلاش نکنند"""
+        delay = min(self.max_delay, self.base_delay * (2 ** max(0, self.consecutive_opens - 1)))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    # thread poll و thread اتصال مجدد هم‌زمان صدا می‌زنند: وضعیت، شمارنده‌ها و
+    # callback تغییر وضعیت زیر یک قفل‌اند تا شمارش از دست نرود و هر تغییر
+    # فقط یک بار (و به ترتیب) ثبت شود
+
+    def allow_request(self) -> bool:
+        """آیا الان اجازه I/O داریم؟ (در حالت OPEN تقریباً بدون هزینه)"""
+        if self.state != self.OPEN:
+            return True
+        with self._lock:
+            if self.state != self.OPEN:
+                return True
+            if time.monotonic() < self.next_attempt_at:
+                return False
+            self._transition(self.HALF_OPEN)
+        return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self.consecutive_opens = 0
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.failures >= self.failure_threshold
+            ):
+                self.consecutive_opens += 1
+                self.next_attempt_at = time.monotonic() + self.backoff_delay()
+                self._transition(self.OPEN)
+
+    def _transition(self, new_state: str):
+        """با قفل _lock صدا زده می‌شود"""
+        old_state, self.state = self.state, new_state
+        if old_state != new_state and self.on_transition:
+            self.on_transition(old_state, new_state)
+
+
+def breaker_from_settings() -> CircuitBreaker:
+    from django.conf import settings
+    return CircuitBreaker(
+        failure_threshold=getattr(settings, "PLC_BREAKER_FAILURES", 3),
+        base_delay=getattr(settings, "PLC_BACKOFF_BASE_SECONDS", 2.0),
+        max_delay=getattr(settings, "PLC_BACKOFF_MAX_SECONDS", 300.0),
+    )
+
+
+# وضعیت breaker → Device.status
+BREAKER_DEVICE_STATUS = {
+    CircuitBreaker.OPEN: "offline",
+    CircuitBreaker.HALF_OPEN: "reconnecting",
+    CircuitBreaker.CLOSED: "online",
+}
+
+
+def update_device_status(device_id: int, old_state: str, new_state: str):
+    """ثبت وضعیت breaker در Device.status — فقط هنگام تغییر وضعیت"""
+    from core.status_cache import get_status_cache
+
+    if new_state == CircuitBreaker.OPEN:
+        logger.warning(f"🔌 دستگاه #{device_id} پاسخ نمی‌دهد — مدار باز شد ({old_state} → {new_state})")
+    else:
+        logger.info(f"🔌 دستگاه #{device_id}: {old_state} → {new_state}")
+    # از مسیر کش وضعیت تا کش بداند مقدار دیتابیس عوض شده
+    get_status_cache().set_status(device_id, BREAKER_DEVICE_STATUS[new_state])
+
+
+# ============================================================
+# MANAGED DRIVER (درایورهای همگام RTU/TCP)
+# ============================================================
+class ManagedDriver:
+    """
+    پوشش درایور همگام با breaker و اتصال مجدد غیرمسدودکننده
+    بقیه متدها (remote_start و ...) مستقیماً به درایور اصلی می‌رسند
+    """
+
+    def __init__(self, driver, device_id: int, breaker: Optional[CircuitBreaker] = None,
+                 on_state_change: Callable[[int, str, str], None] = update_device_status):
+        self.driver = driver
+        self.device_id = device_id
+        self.breaker = breaker or breaker_from_settings()
+        self.breaker.on_transition = lambda old, new: on_state_change(device_id, old, new)
+        self._reconnecting = False
+        # بعد از disconnect (توقف polling) هیچ اتصال مجددی شروع یا نگه داشته نمی‌شود
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+    @property
+    def state(self) -> str:
+        return self.breaker.state
+
+    def read_values(self):
+        return self._guarded(self.driver.read_values)
+
+    def read(self):
+        return self._guarded(self.driver.read)
+
+    def _guarded(self, read):
+        if self._closed or not self.breaker.allow_request():
+            return None
+        if not self.driver.connected:
+            self._reconnect_in_background()
+            return None
+
+        result = read()
+        if result is None:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return result
+
+    def _reconnect_in_background(self):
+        if self._reconnecting or self._closed:
+            return
+        self._reconnecting = True
+        threading.Thread(target=self._reconnect, daemon=True).start()
+
+    def _reconnect(self):
+        metrics = getattr(self.driver, "metrics", None)
+        if metrics is not None:
+            metrics.reconnects.inc()
+        try:
+            if not self.driver.connect():
+                self.breaker.record_failure()
+                if metrics is not None:
+                    metrics.error("connection")
+            elif self._closed:
+                # disconnect در حین اتصال صدا زده شد؛ اتصال تازه نگه داشته نشود
+                self.driver.disconnect()
+        except Exception as e:
+            logger.error(f"خطا در اتصال مجدد دستگاه #{self.device_id}: {e}")
+            self.breaker.record_failure()
+            if metrics is not None:
+                metrics.error("connection")
+        finally:
+            self._reconnecting = False
+
+    def disconnect(self):
+        """قطع درایور و لغو اتصال مجدد (thread اتصال در جریان نتیجه‌اش را دور می‌ریزد)"""
+        self._closed = True
+        self.driver.disconnect()
+
+
+# ============================================================
+# ASYNC MANAGED DRIVER (AsyncCotrustModbusTCP)
+# ============================================================
+class AsyncManagedDriver:
+    """
+    همان منطق ManagedDriver برای درایور asyncio
+    اتصال مجدد یک Task جداست تا poll بعدی منتظر timeout نماند
+    """
+
+    def __init__(self, driver, device_id: int, breaker: Optional[CircuitBreaker] = None,
+                 on_state_change: Callable[[int, str, str], None] = update_device_status):
+        self.driver = driver
+        self.device_id = device_id
+        self.breaker = breaker or breaker_from_settings()
+        # ثبت در دیتابیس همگام است → خارج از event loop اجرا می‌شود
+        self.breaker.on_transition = lambda old, new: asyncio.get_running_loop().run_in_executor(
+            None, on_state_change, device_id, old, new
+        )
+        self._reconnect_task: Optional[asyncio.Task] = None
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+    @property
+    def state(self) -> str:
+        return self.breaker.state
+
+    async def read_values(self):
+        return await self._guarded(self.driver.read_values)
+
+    async def read(self):
+        return await self._guarded(self.driver.read)
+
+    async def _guarded(self, read):
+        if not self.breaker.allow_request():
+            return None
+        if not self.driver.connected:
+            if self._reconnect_task is None or self._reconnect_task.done():
+                self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+            return None
+
+        result = await read()
+        if result is None:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return result
+
+    async def _reconnect(self):
+        metrics = getattr(self.driver, "metrics", None)
+        if metrics is not None:
+            metrics.reconnects.inc()
+        try:
+            if not await self.driver.connect():
+                self.breaker.record_failure()
+                if metrics is not None:
+                    metrics.error("connection")
+        except Exception as e:
+            logger.error(f"خطا در اتصال مجدد دستگاه #{self.device_id}: {e}")
+            self.breaker.record_failure()
+            if metrics is not None:
+                metrics.error("connection")
+
+    async def disconnect(self):
+        if self._reconnect_task and not self._reconnect_task.done():
+            self._reconnect_task.cancel()
+        await self.driver.disconnect()
@@ -21,6 +21,9 @@ D9  → Current Cycle Number
 D10 → Total Cycles (lifetime)
 D11 → Alarm Code                0=Normal, see ALARM_CODES below
 
+(نقشه پیش‌فرض — برای برنامه‌های PLC دیگر، نقشه هر دستگاه در
+DeviceRegister تعریف می‌شود؛ core.register_map)
+
 COIL MAP:
 M0  → Remote Start Cycle
 M1  → Remote Stop/Abort
@@ -28,13 +31,16 @@ M2  → Remote Door Lock Command
 M3  → Alarm Reset
 """
 
-import struct
 import logging
 import time
-import threading
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional, Dict, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+from core import modbus_codec
+from core.metrics import get_registry, request_error_kind
+from core.plc_commands import PriorityLock
+from core.register_map import DEFAULT_REGISTER_MAP, RegisterMap
 
 logger = logging.getLogger(__name__)
 
@@ -73,7 +79,7 @@ CYCLE_STATUS = {
 # ============================================================
 # DATA CLASS
 # ============================================================
-@dataclass
+@dataclass(slots=True)
 class AutoclaveReading:
     temperature_c: float
     pressure_bar: float
@@ -91,6 +97,8 @@ class AutoclaveReading:
     alarm_severity: Optional[str]
     timestamp: datetime
     is_valid: bool = True
+    # رجیسترهای اضافی نقشه (فیلدهایی که در AutoclaveReading نیستند)
+    extras: Dict[str, float] = field(default_factory=dict)
 
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -108,9 +116,47 @@ class AutoclaveReading:
             "alarm_code": self.alarm_code,
             "alarm_message": self.alarm_message,
             "timestamp": self.timestamp.isoformat(),
+            "extras": self.extras,
         }
 
 
+# فیلدهایی از AutoclaveReading که از رجیستر خوانده می‌شوند
+REGISTER_FIELDS = (
+    "temperature_c", "pressure_bar", "steam_flow_kg_h", "water_level_pct",
+    "power_consumption_kw", "cycle_status", "door_locked", "heater_on", "pump_on",
+    "cycle_number", "total_cycles", "alarm_code",
+)
+
+
+def reading_from_values(values: Dict[str, float]) -> AutoclaveReading:
+    """
+    تبدیل مقادیر decode‌شده نقشه رجیستر به AutoclaveReading
+    (مشترک بین درایورهای RTU، TCP و Async TCP)
+    """
+    get = values.get
+    alarm_code = int(get("alarm_code", 0))
+    alarm_info = ALARM_CODES.get(alarm_code, ("خطای ناشناخته", "critical"))
+
+    return AutoclaveReading(
+        temperature_c=get("temperature_c", 0.0),
+        pressure_bar=get("pressure_bar", 0.0),
+        steam_flow_kg_h=get("steam_flow_kg_h", 0.0),
+        water_level_pct=get("water_level_pct", 0.0),
+        power_consumption_kw=get("power_consumption_kw", 0.0),
+        cycle_status=CYCLE_STATUS.get(int(get("cycle_status", 0)), "idle"),
+        door_locked=bool(get("door_locked", 0)),
+        heater_on=bool(get("heater_on", 0)),
+        pump_on=bool(get("pump_on", 0)),
+        cycle_number=int(get("cycle_number", 0)),
+        total_cycles=int(get("total_cycles", 0)),
+        alarm_code=alarm_code,
+        alarm_message=alarm_info[0] if alarm_code else None,
+        alarm_severity=alarm_info[1] if alarm_code else None,
+        timestamp=datetime.now(),
+        extras={k: v for k, v in values.items() if k not in REGISTER_FIELDS},
+    )
+
+
 # ============================================================
 # MODBUS RTU DRIVER (RS485)
 # ============================================================
@@ -137,137 +183,110 @@ class CotrustModbusRTU:
         slave_id: int = 1,
         baudrate: int = 9600,
         timeout: float = 2.0,
+        bus=None,
+        register_map: Optional[RegisterMap] = None,
+        device_id: Optional[int] = None,
     ):
+        from core.rs485_bus import get_bus
+
         self.port = port
         self.slave_id = slave_id
         self.baudrate = baudrate
         self.timeout = timeout
-        self._serial = None
-        self._lock = threading.Lock()
+        self.register_map = register_map or DEFAULT_REGISTER_MAP
+        # پورت سریال متعلق به bus مشترک است، نه به این درایور:
+        # چند PLC روی یک خط RS485 از طریق یک RS485Bus نوبت می‌گیرند
+        self._bus = bus or get_bus(port, baudrate=baudrate, timeout=timeout)
+        self._connected = False
+        # زمان هر درخواست شامل انتظار نوبت روی باس است؛ اشغال خود خط در RS485Bus
+        self.bus_label = f"rtu:{port}"
+        self.metrics = get_registry().device(
+            device_id if device_id is not None else f"{port}#{slave_id}", self.bus_label
+        )
+
+    @property
+    def connected(self) -> bool:
+        return self._connected and self._bus.is_open
 
     def connect(self) -> bool:
-        try:
-            import serial
-            self._serial = serial.Serial(
-                port=self.port,
-                baudrate=self.baudrate,
-                bytesize=serial.EIGHTBITS,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE,
-                timeout=self.timeout,
-            )
-            logger.info(f"RS485 متصل شد: {self.port} @ {self.baudrate} baud")
-            return True
-        except Exception as e:
-            logger.error(f"خطا در اتصال RS485: {e}")
-            return False
+        if self._connected and not self._bus.is_open:
+            # bus بعد از خطای پورت failed شده؛ سهم این درایور آزاد و دوباره open می‌شود
+            self.disconnect()
+        if not self._connected:
+            self._connected = self._bus.open()
+        return self._connected
 
     def disconnect(self):
-        if self._serial and self._serial.is_open:
-            self._serial.close()
-            logger.info("RS485 قطع شد")
-
-    @staticmethod
-    def _crc16(data: bytes) -> bytes:
-        crc = 0xFFFF
-        for byte in data:
-            crc ^= byte
-            for _ in range(8):
-                if crc & 0x0001:
-                    crc = (crc >> 1) ^ 0xA001
-                else:
-                    crc >>= 1
-        return struct.pack('<H', crc)
-
-    def _read_holding_registers(self, start_addr: int, count: int) -> Optional[list]:
-        """FC03 — Read Holding Registers"""
-        if not self._serial or not self._serial.is_open:
-            return None
-
-        with self._lock:
-            # Build request frame
-            frame = struct.pack('>BBHH', self.slave_id, 0x03, start_addr, count)
-            frame += self._crc16(frame)
+        if self._connected:
+            self._connected = False
+            self._bus.close()
 
-            try:
-                self._serial.reset_input_buffer()
-                self._serial.write(frame)
-                time.sleep(0.05)
+    def _read_block(self, block) -> Optional[memoryview]:
+        """FC03/FC01 یک بلوک نقشه رجیستر → بخش داده پاسخ"""
+        if not self._connected or not self._bus.is_open:
+            return None
 
-                # Response: [slave_id, fc, byte_count, data..., crc_lo, crc_hi]
-                expected_len = 5 + count * 2
-                response = self._serial.read(expected_len)
+        # فریم درخواست از cache کدک (برای هر slave/start/count یک بار ساخته می‌شود)
+        frame = modbus_codec.rtu_read_request(self.slave_id, block.start, block.count, block.function)
 
-                if len(response) < expected_len:
-                    logger.warning(f"پاسخ ناقص: {len(response)} بایت (انتظار {expected_len})")
-                    return None
+        try:
+            # Response: [slave_id, fc, byte_count, data..., crc_lo, crc_hi]
+            expected_len = modbus_codec.rtu_read_response_length(block.count, block.function)
+            started = time.perf_counter()
+            response = self._bus.transact(self.slave_id, frame, expected_len) or b""
+            self.metrics.request.observe(time.perf_counter() - started)
+
+            if len(response) < expected_len:
+                self.metrics.error("short_read" if response else "timeout")
+                logger.warning(f"پاسخ ناقص: {len(response)} بایت (انتظار {expected_len})")
+                return None
 
-                # Validate CRC
-                recv_crc = response[-2:]
-                calc_crc = self._crc16(response[:-2])
-                if recv_crc != calc_crc:
-                    logger.error("خطای CRC در پاسخ Modbus")
-                    return None
+            if not modbus_codec.check_crc(response):
+                self.metrics.error("crc")
+                logger.error("خطای CRC در پاسخ Modbus")
+                return None
 
-                # Parse registers
-                byte_count = response[2]
-                registers = []
-                for i in range(count):
-                    reg = struct.unpack('>H', response[3 + i*2: 5 + i*2])[0]
-                    registers.append(reg)
+            if response[1] != block.function:
+                self.metrics.error("bad_response")
+                logger.warning(f"پاسخ exception از PLC: FC=0x{response[1]:02X}")
+                return None
 
-                return registers
+            return memoryview(response)[3:]
 
-            except Exception as e:
-                logger.error(f"خطا در خواندن رجیسترها: {e}")
-                return None
+        except Exception as e:
+            self.metrics.error("exception")
+            logger.error(f"خطا در خواندن رجیسترها: {e}")
+            return None
 
     def _write_coil(self, addr: int, value: bool) -> bool:
         """FC05 — Write Single Coil"""
-        if not self._serial or not self._serial.is_open:
+        if not self._connected or not self._bus.is_open:
             return False
 
-        with self._lock:
-            val = 0xFF00 if value else 0x0000
-            frame = struct.pack('>BBHH', self.slave_id, 0x05, addr, val)
-            frame += self._crc16(frame)
+        frame = modbus_codec.rtu_write_coil_request(self.slave_id, addr, value)
 
-            try:
-                self._serial.reset_input_buffer()
-                self._serial.write(frame)
-                time.sleep(0.05)
-                response = self._serial.read(8)
-                return len(response) == 8
-            except Exception as e:
-                logger.error(f"خطا در نوشتن کویل: {e}")
-                return False
+        try:
+            # صف فرمان bus: جلوتر از همه خواندن‌های در صف
+            response = self._bus.transact(self.slave_id, frame, 8, priority=True) or b""
+            return len(response) == 8
+        except Exception as e:
+            logger.error(f"خطا در نوشتن کویل: {e}")
+            return False
 
-    def read(self) -> Optional[AutoclaveReading]:
-        """خواندن تمام پارامترها از D0 تا D11"""
-        regs = self._read_holding_registers(start_addr=0, count=12)
-        if regs is None or len(regs) < 12:
-            return None
+    def read_values(self) -> Optional[Dict[str, float]]:
+        """خواندن تمام رجیسترهای نقشه (پیش‌فرض D0 تا D11 در یک درخواست) → RegisterMap.decode"""
+        payloads = []
+        for block in self.register_map.blocks:
+            payload = self._read_block(block)
+            if payload is None:
+                return None
+            payloads.append(payload)
+        return self.register_map.decode(payloads)
 
-        alarm_code = regs[11]
-        alarm_info = ALARM_CODES.get(alarm_code, ("خطای ناشناخته", "critical"))
-
-        return AutoclaveReading(
-            temperature_c=regs[0] / 10.0,
-            pressure_bar=regs[1] / 100.0,
-            steam_flow_kg_h=regs[2] / 10.0,
-            water_level_pct=regs[3],
-            power_consumption_kw=regs[4] / 10.0,
-            cycle_status=CYCLE_STATUS.get(regs[5], "idle"),
-            door_locked=bool(regs[6]),
-            heater_on=bool(regs[7]),
-            pump_on=bool(regs[8]),
-            cycle_number=regs[9],
-            total_cycles=regs[10],
-            alarm_code=alarm_code,
-            alarm_message=alarm_info[0] if alarm_code else None,
-            alarm_severity=alarm_info[1] if alarm_code else None,
-            timestamp=datetime.now(),
-        )
+    def read(self) -> Optional[AutoclaveReading]:
+        """read_values به صورت AutoclaveReading (تست اتصال پنل)"""
+        values = self.read_values()
+        return None if values is None else reading_from_values(values)
 
     def remote_start(self) -> bool:
         """فرمان شروع سیکل از راه دور → M0"""
@@ -299,26 +318,46 @@ class CotrustModbusTCP:
         port: int = 502,
         slave_id: int = 1,
         timeout: float = 3.0,
+        register_map: Optional[RegisterMap] = None,
+        device_id: Optional[int] = None,
     ):
         self.host = host
         self.port = port
         self.slave_id = slave_id
         self.timeout = timeout
+        self.register_map = register_map or DEFAULT_REGISTER_MAP
+        self.bus_label = f"tcp:{host}:{port}"
+        self.metrics = get_registry().device(
+            device_id if device_id is not None else f"{host}:{port}#{slave_id}", self.bus_label
+        )
         self._transaction_id = 0
         self._sock = None
-        self._lock = threading.Lock()
+        self._rx = modbus_codec.MBAPReassembler()
+        # فرمان‌ها (FC05) قبل از خواندن‌های منتظر قفل را می‌گیرند
+        self._lock = PriorityLock()
 
     def connect(self) -> bool:
+        """
+        socket فقط بعد از connect موفق در self._sock قرار می‌گیرد: تا آن موقع
+        connected برابر False است و poll روی socket نیمه‌باز نمی‌خواند
+        """
         import socket
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         try:
-            self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self._sock.settimeout(self.timeout)
-            self._sock.connect((self.host, self.port))
-            logger.info(f"Modbus TCP متصل شد: {self.host}:{self.port}")
-            return True
+            sock.settimeout(self.timeout)
+            sock.connect((self.host, self.port))
         except Exception as e:
+            sock.close()
             logger.error(f"خطا در اتصال TCP: {e}")
             return False
+        self._rx.reset()
+        self._sock = sock
+        logger.info(f"Modbus TCP متصل شد: {self.host}:{self.port}")
+        return True
+
+    @property
+    def connected(self) -> bool:
+        return self._sock is not None
 
     def disconnect(self):
         if self._sock:
@@ -332,84 +371,73 @@ class CotrustModbusTCP:
         self._transaction_id = (self._transaction_id + 1) % 65536
         return self._transaction_id
 
-    def _read_holding_registers(self, start_addr: int, count: int) -> Optional[list]:
-        """Modbus TCP FC03"""
+    def _exchange(self, tid: int, frame: bytes) -> bytes:
+        """
+        ارسال فریم و دریافت ADU کامل با همان transaction id و unit id
+        پاسخ‌های دیررسیده درخواست‌های قبلی (بعد از timeout) دور ریخته می‌شوند
+        """
+        self._sock.sendall(frame)
+        while True:
+            data = self._sock.recv(260)
+            if not data:
+                raise ConnectionError("اتصال توسط PLC بسته شد")
+            for adu in self._rx.feed(data):
+                if modbus_codec.frame_ids(adu) == (tid, self.slave_id):
+                    return adu
+                logger.warning(f"پاسخ نامرتبط دور ریخته شد (tid/unit={modbus_codec.frame_ids(adu)})")
+
+    def _read_block(self, block) -> Optional[memoryview]:
+        """Modbus TCP FC03/FC01 یک بلوک نقشه رجیستر → بخش داده پاسخ"""
         if not self._sock:
             return None
 
-        with self._lock:
+        with self._lock.hold():
+            # MBAP Header + PDU (فقط transaction id در هر درخواست ساخته می‌شود)
             tid = self._next_tid()
-            # MBAP Header + PDU
-            pdu = struct.pack('>BHH', 0x03, start_addr, count)
-            mbap = struct.pack('>HHHB', tid, 0, len(pdu) + 1, self.slave_id)
-            frame = mbap + pdu
+            frame = modbus_codec.tcp_read_request(tid, self.slave_id, block.start, block.count, block.function)
 
+            started = time.perf_counter()
             try:
-                self._sock.sendall(frame)
-                response = self._sock.recv(256)
-
-                if len(response) < 9:
+                response = self._exchange(tid, frame)
+                self.metrics.request.observe(time.perf_counter() - started)
+                if response[7] != block.function or len(response) < 9 + block.payload_length:
+                    self.metrics.error("bad_response")
+                    logger.warning(f"پاسخ نامعتبر از PLC: FC=0x{response[7]:02X}")
                     return None
-
-                # Parse
-                byte_count = response[8]
-                registers = []
-                for i in range(count):
-                    offset = 9 + i * 2
-                    if offset + 2 <= len(response):
-                        reg = struct.unpack('>H', response[offset:offset+2])[0]
-                        registers.append(reg)
-
-                return registers if len(registers) == count else None
+                return memoryview(response)[9:]
 
             except Exception as e:
+                self.metrics.error(request_error_kind(e))
                 logger.error(f"خطای TCP: {e}")
-                self._sock = None
+                self.disconnect()
                 return None
 
     def _write_coil(self, addr: int, value: bool) -> bool:
         if not self._sock:
             return False
-        with self._lock:
+        with self._lock.hold(priority=True):
             tid = self._next_tid()
-            val = 0xFF00 if value else 0x0000
-            pdu = struct.pack('>BHH', 0x05, addr, val)
-            mbap = struct.pack('>HHHB', tid, 0, len(pdu) + 1, self.slave_id)
+            frame = modbus_codec.tcp_write_coil_request(tid, self.slave_id, addr, value)
             try:
-                self._sock.sendall(mbap + pdu)
-                resp = self._sock.recv(12)
+                resp = self._exchange(tid, frame)
                 return len(resp) == 12
             except Exception as e:
                 logger.error(f"خطای TCP write coil: {e}")
                 return False
 
-    def read(self) -> Optional[AutoclaveReading]:
-        regs = self._read_holding_registers(start_addr=0, count=12)
-        if regs is None or len(regs) < 12:
-            # Try reconnect
-            self.connect()
-            return None
+    def read_values(self) -> Optional[Dict[str, float]]:
+        # اتصال مجدد با core.plc_connection.ManagedDriver (backoff + circuit breaker)
+        payloads = []
+        for block in self.register_map.blocks:
+            payload = self._read_block(block)
+            if payload is None:
+                return None
+            payloads.append(payload)
+        return self.register_map.decode(payloads)
 
-        alarm_code = regs[11]
-        alarm_info = ALARM_CODES.get(alarm_code, ("خطای ناشناخته", "critical"))
-
-        return AutoclaveReading(
-            temperature_c=regs[0] / 10.0,
-            pressure_bar=regs[1] / 100.0,
-            steam_flow_kg_h=regs[2] / 10.0,
-            water_level_pct=regs[3],
-            power_consumption_kw=regs[4] / 10.0,
-            cycle_status=CYCLE_STATUS.get(regs[5], "idle"),
-            door_locked=bool(regs[6]),
-            heater_on=bool(regs[7]),
-            pump_on=bool(regs[8]),
-            cycle_number=regs[9],
-            total_cycles=regs[10],
-            alarm_code=alarm_code,
-            alarm_message=alarm_info[0] if alarm_code else None,
-            alarm_severity=alarm_info[1] if alarm_code else None,
-            timestamp=datetime.now(),
-        )
+    def read(self) -> Optional[AutoclaveReading]:
+        values = self.read_values()
+        return None if values is None else reading_from_values(values)
 
     def remote_start(self) -> bool:
         return self._write_coil(addr=0, value=True)
@@ -429,7 +457,7 @@ class AutoclaveSimulator:
     شبیه‌ساز واقع‌گرایانه یک سیکل اتوکلاو
     برای تست نرم‌افزار بدون اتصال به PLC واقعی
     """
-    def __init__(self):
+    def __init__(self, seed: Optional[int] = None):
         self._phase = "idle"
         self._start_time = None
         self._temp = 25.0
@@ -439,7 +467,8 @@ class AutoclaveSimulator:
         self._total_cycles = 142  # شروع از یه عدد واقع‌گرایانه
         self._alarm = 0
         import random
-        self._random = random
+        # seed: نویز تکرارپذیر (مثلاً برای شبیه‌ساز Modbus با صدها PLC)
+        self._random = random.Random(seed) if seed is not None else random
 
     def _simulate_phase(self) -> tuple:
         """شبیه‌سازی واقع‌گرایانه مراحل سیکل"""
@@ -488,6 +517,10 @@ class AutoclaveSimulator:
 
         return status
 
+    @property
+    def phase(self) -> str:
+        return self._phase
+
     def start_cycle(self):
         if self._phase in ("idle", "complete"):
             self._phase = "heating"
@@ -500,26 +533,40 @@ class AutoclaveSimulator:
         self._phase = "idle"
         self._start_time = None
 
-    def read(self) -> AutoclaveReading:
+    # همان رابط فرمان درایورهای واقعی (برای تست دکمه‌های صفحه مانیتور)
+    def remote_start(self) -> bool:
+        self.start_cycle()
+        return True
+
+    def remote_stop(self) -> bool:
+        self.stop_cycle()
+        return True
+
+    def reset_alarm(self) -> bool:
+        self._alarm = 0
+        return True
+
+    def read_values(self) -> Dict[str, float]:
+        """یک قدم شبیه‌سازی → همان کلیدهای RegisterMap.decode (cycle_status به صورت کد)"""
         status_code = self._simulate_phase()
         rnd = self._random
-        return AutoclaveReading(
-            temperature_c=round(self._temp, 1),
-            pressure_bar=round(self._pressure, 2),
-            steam_flow_kg_h=round(8.2 + rnd.uniform(-0.3, 0.3), 1) if self._phase == "sterilizing" else 0.0,
-            water_level_pct=round(74 + rnd.uniform(-2, 2), 0),
-            power_consumption_kw=round(self._power, 1),
-            cycle_status=CYCLE_STATUS.get(status_code, "idle"),
-            door_locked=self._phase not in ("idle", "complete"),
-            heater_on=self._phase == "heating",
-            pump_on=self._phase in ("heating", "sterilizing"),
-            cycle_number=self._cycle_num,
-            total_cycles=self._total_cycles,
-            alarm_code=self._alarm,
-            alarm_message=None,
-            alarm_severity=None,
-            timestamp=datetime.now(),
-        )
+        return {
+            "temperature_c": round(self._temp, 1),
+            "pressure_bar": round(self._pressure, 2),
+            "steam_flow_kg_h": round(8.2 + rnd.uniform(-0.3, 0.3), 1) if self._phase == "sterilizing" else 0.0,
+            "water_level_pct": round(74 + rnd.uniform(-2, 2), 0),
+            "power_consumption_kw": round(self._power, 1),
+            "cycle_status": status_code,
+            "door_locked": int(self._phase not in ("idle", "complete")),
+            "heater_on": int(self._phase == "heating"),
+            "pump_on": int(self._phase in ("heating", "sterilizing")),
+            "cycle_number": self._cycle_num,
+            "total_cycles": self._total_cycles,
+            "alarm_code": self._alarm,
+        }
+
+    def read(self) -> AutoclaveReading:
+        return reading_from_values(self.read_values())
 
 
 # ============================================================
@@ -529,106 +576,163 @@ class PLCPollingService:
     """
     سرویس polling: هر N ثانیه داده می‌خونه،
     ذخیره می‌کنه، و از طریق WebSocket ارسال می‌کنه
+    موعد pollها با زمان‌بند مرکزی (core.poll_scheduler) است، نه thread اختصاصی
     """
 
-    def __init__(self, device_id: int, driver, interval_seconds: int = 5):
+    def __init__(self, device_id: int, driver, interval_seconds: int = 5, adaptive=None):
         self.device_id = device_id
         self.driver = driver
         self.interval = interval_seconds
-        self._thread = None
+        # core.adaptive_polling.AdaptivePollRate — None = فاصله ثابت
+        self.adaptive = adaptive
         self._running = False
         self._last_alarm_code = 0
+        # report-by-exception: فقط تغییرات معنادار ذخیره می‌شوند (None = همه)
+        from core.compression import compressor_from_settings
+        self.compressor = compressor_from_settings()
+        # بافر ستونی همین poller: هر poll خالی و دوباره پر می‌شود
+        # (BulkWriter و publisher از ردیف‌ها کپی می‌گیرند)
+        from core.reading_batch import ReadingBatch
+        self._batch = ReadingBatch()
+        # شبیه‌ساز درایور متریک ندارد → فقط متریک‌های poll با باس "sim"
+        self.metrics = getattr(driver, "metrics", None) or get_registry().device(device_id, "sim")
 
     def start(self):
         if self._running:
             return
+        from core.poll_scheduler import get_scheduler
         self._running = True
-        self._thread = threading.Thread(target=self._loop, daemon=True)
-        self._thread.start()
+        get_scheduler().add(self)
         logger.info(f"Polling شروع شد — دستگاه #{self.device_id} هر {self.interval}s")
 
     def stop(self):
+        from core.poll_scheduler import get_scheduler
         self._running = False
-        if self._thread:
-            self._thread.join(timeout=5)
-
-    def _loop(self):
-        # Import داخل thread تا از circular import جلوگیری بشه
-        import django
-        from django.utils import timezone
-        from asgiref.sync import async_to_sync
-        from channels.layers import get_channel_layer
+        # منتظر poll در حال اجرا؛ بعد از آن compressor دیگر تغییر نمی‌کند
+        get_scheduler().remove(self)
+        self._disconnect_driver()
+        self._flush_held()
+
+    def _disconnect_driver(self):
+        """
+        socket TCP / سهم RS485Bus آزاد شود (hot reload و stop_polling درایور
+        جدید می‌سازند)؛ ManagedDriver اتصال مجدد در جریان را هم لغو می‌کند
+        """
+        disconnect = getattr(self.driver, "disconnect", None)
+        if disconnect is None:
+            return  # شبیه‌ساز
+        try:
+            disconnect()
+        except Exception as e:
+            logger.error(f"خطا در قطع اتصال درایور دستگاه #{self.device_id}: {e}")
 
-        while self._running:
-            try:
-                reading = self.driver.read()
-                if reading and reading.is_valid:
-                    self._process(reading)
-                else:
-                    logger.warning(f"خواندن ناموفق — دستگاه #{self.device_id}")
-            except Exception as e:
-                logger.error(f"خطا در polling: {e}")
-            time.sleep(self.interval)
+    def _flush_held(self):
+        """نمونه نگه‌داشته‌شده deadband (انتهای بازه ثابت) با توقف polling از دست نرود"""
+        held = self.compressor.flush() if self.compressor else []
+        if not held:
+            return
+        from core.bulk_writer import get_bulk_writer
+        from core.reading_batch import ReadingBatch
+        batch = ReadingBatch()
+        for values, timestamp, cycle_id in held:
+            batch.append(self.device_id, timestamp, values, cycle_id=cycle_id)
+        get_bulk_writer().add(batch)
+
+    @property
+    def breaker_state(self) -> str:
+        """وضعیت circuit breaker درایور (شبیه‌ساز همیشه closed)"""
+        return getattr(self.driver, "state", "closed")
+
+    def next_interval(self, values: Optional[Dict[str, float]]) -> float:
+        """فاصله تا poll بعدی (ثابت یا بر اساس فاز سیکل)"""
+        if self.adaptive is None:
+            return self.interval
+        return self.adaptive.next_interval(values)
+
+    def submit_poll(self, executor):
+        """اجرای یک poll روی ThreadPool زمان‌بند → concurrent.futures.Future[values]"""
+        return executor.submit(self.poll_once)
+
+    def poll_once(self) -> Optional[Dict[str, float]]:
+        values = None
+        skipped = self.breaker_state == "open"
+        started = time.perf_counter()
+        try:
+            values = self.driver.read_values()
+            if values is not None:
+                self._process(values, time.time())
+            elif self.breaker_state == "closed":
+                # وقتی مدار باز است خطا فقط یک بار (هنگام باز شدن) لاگ می‌شود
+                logger.warning(f"خواندن ناموفق — دستگاه #{self.device_id}")
+        except Exception as e:
+            logger.error(f"خطا در polling: {e}")
+        self.record_poll(started, values, skipped)
+        return values
 
-    def _process(self, reading: AutoclaveReading):
-        from django.utils import timezone
-        from channels.layers import get_channel_layer
-        from asgiref.sync import async_to_sync
-        from apps.devices.models import Device, DeviceCycle
-        from apps.monitoring.models import SensorReading, DeviceAlert
+    def record_poll(self, started: float, values, skipped: bool):
+        """poll رد‌شده توسط مدار باز (بدون تماس با PLC) شمرده نمی‌شود"""
+        if skipped and self.breaker_state == "open":
+            return
+        self.metrics.polled(time.perf_counter() - started, ok=values is not None)
+
+    def _process(self, values: Dict[str, float], timestamp: float):
+        """
+        مقادیر decode‌شده یک poll → ردیف‌های بافر ستونی poller → BulkWriter و WebSocket
+        (بدون AutoclaveReading و to_dict به ازای هر poll)
+        """
+        from apps.monitoring.models import DeviceAlert
+        from core.bulk_writer import get_bulk_writer
+        from core.device_state import get_device_tracker
+        from core.status_cache import get_status_cache
+        from core.ws_publisher import get_publisher
 
         try:
-            device = Device.objects.get(pk=self.device_id)
-
-            # فعال‌ترین سیکل
-            active_cycle = DeviceCycle.objects.filter(
-                device=device,
-                status__in=["heating", "sterilizing", "cooling"]
-            ).first()
-
-            # ذخیره در دیتابیس
-            SensorReading.objects.create(
-                device=device,
-                cycle=active_cycle,
-                timestamp=timezone.now(),
-                temperature_c=reading.temperature_c,
-                pressure_bar=reading.pressure_bar,
-                steam_flow_kg_h=reading.steam_flow_kg_h,
-                water_level_pct=reading.water_level_pct,
-                power_consumption_kw=reading.power_consumption_kw,
-                door_locked=reading.door_locked,
-                device_status=reading.cycle_status,
-            )
-
-            # آپدیت وضعیت دستگاه
-            device.status = "online" if reading.cycle_status != "error" else "error"
-            device.last_seen = timezone.now()
-            device.save(update_fields=["status", "last_seen"])
+            status = CYCLE_STATUS.get(int(values.get("cycle_status", 0)), "idle")
+            # دستگاه و سیکل فعال از حافظه؛ تغییر فاز PLC سیکل را باز/بسته می‌کند
+            tracker = get_device_tracker()
+            state = tracker.get(self.device_id)
+            previous_cycle_id = state.cycle_id
+            active_cycle = tracker.observe(state, status, datetime.fromtimestamp(timestamp, timezone.utc))
+            # خوانشی که سیکل را می‌بندد (complete/error/idle) جزو همان سیکل است
+            cycle_id = active_cycle.pk if active_cycle else previous_cycle_id
+
+            # ذخیره در دیتابیس — نمونه‌های داخل deadband ذخیره نمی‌شوند
+            # (هر نمونه با timestamp خودش؛ نمونه نگه‌داشته‌شده چند poll قبل خوانده شده)
+            batch = self._batch
+            batch.clear()
+            sample = (values, timestamp, cycle_id)
+            to_store = self.compressor.offer(*sample) if self.compressor else [sample]
+            for row_values, row_time, row_cycle_id in to_store:
+                batch.append(self.device_id, row_time, row_values, cycle_id=row_cycle_id)
+            if to_store:
+                get_bulk_writer().add(batch)
+            else:
+                # داخل deadband: ذخیره نمی‌شود ولی پنل مقدار زنده را می‌گیرد
+                batch.append(self.device_id, timestamp, values, status=status, cycle_id=cycle_id)
+            # محاسبه انرژی سیکل تمام‌شده بعد از رسیدن خوانش پایانی به BulkWriter
+            tracker.dispatch_completed()
+
+            # وضعیت دستگاه: تغییر وضعیت فوری، last_seen دسته‌ای (core.status_cache)
+            get_status_cache().record(self.device_id, "online" if status != "error" else "error")
 
             # بررسی هشدار جدید
-            if reading.alarm_code and reading.alarm_code != self._last_alarm_code:
+            alarm_code = int(values.get("alarm_code", 0))
+            if alarm_code and alarm_code != self._last_alarm_code:
+                message, severity = ALARM_CODES.get(alarm_code) or ("خطای ناشناخته", "critical")
                 DeviceAlert.objects.create(
-                    device=device,
+                    device=state.device,
                     cycle=active_cycle,
                     alert_type="sensor",
-                    severity=reading.alarm_severity or "warning",
-                    message=reading.alarm_message or "هشدار دستگاه",
-                    value=str(reading.alarm_code),
+                    severity=severity,
+                    message=message,
+                    value=str(alarm_code),
                 )
-                self._last_alarm_code = reading.alarm_code
-            elif not reading.alarm_code:
+                self._last_alarm_code = alarm_code
+            elif not alarm_code:
                 self._last_alarm_code = 0
 
-            # ارسال به WebSocket
-            channel_layer = get_channel_layer()
-            if channel_layer:
-                async_to_sync(channel_layer.group_send)(
-                    f"device_{self.device_id}",
-                    {
-                        "type": "sensor_update",
-                        "data": reading.to_dict(),
-                    }
-                )
+            # ارسال به WebSocket — آخرین ردیف بافر، در صف publisher (بدون انتظار برای Redis)
+            get_publisher().publish_batch(batch)
 
         except Exception as e:
             logger.error(f"خطا در پردازش داده PLC: {e}")
@@ -637,7 +741,7 @@ class PLCPollingService:
 # ============================================================
 # FACTORY — انتخاب خودکار درایور بر اساس تنظیمات
 # ============================================================
-def get_plc_driver(device):
+def get_plc_driver(device, connect: bool = True):
     """
     بر اساس تنظیمات دستگاه، درایور مناسب رو برمی‌گردونه
     
@@ -645,9 +749,9 @@ def get_plc_driver(device):
         'rtu'  → RS485 (مبدل USB-RS485)
         'tcp'  → Ethernet
         'sim'  → شبیه‌ساز (برای تست)
-    """
-    from django.conf import settings
 
+    connect=False: اتصال به عهده ManagedDriver (در پس‌زمینه) است
+    """
     conn_type = getattr(device, "connection_type", "sim")
 
     if conn_type == "rtu":
@@ -655,8 +759,11 @@ def get_plc_driver(device):
             port=getattr(device, "serial_port", "/dev/ttyUSB0"),
             slave_id=getattr(device, "modbus_slave_id", 1),
             baudrate=getattr(device, "baud_rate", 9600),
+            register_map=RegisterMap.for_device(device),
+            device_id=getattr(device, "pk", None),
         )
-        driver.connect()
+        if connect:
+            driver.connect()
         return driver
 
     elif conn_type == "tcp":
@@ -664,8 +771,11 @@ def get_plc_driver(device):
             host=getattr(device, "plc_ip", "192.168.1.100"),
             port=getattr(device, "plc_port", 502),
             slave_id=getattr(device, "modbus_slave_id", 1),
+            register_map=RegisterMap.for_device(device),
+            device_id=getattr(device, "pk", None),
         )
-        driver.connect()
+        if connect:
+            driver.connect()
         return driver
 
     else:
@@ -679,19 +789,46 @@ _active_pollers: Dict[int, PLCPollingService] = {}
 
 
 def start_polling(device) -> PLCPollingService:
-    """شروع polling برای یک دستگاه"""
+    """
+    شروع polling برای یک دستگاه
+    دستگاه‌های TCP (اگر PLC_ASYNC_TCP فعال باشد) روی event loop مشترک
+    core.modbus_async اجرا می‌شوند، بقیه (RTU، شبیه‌ساز و TCP همگام) روی
+    thread pool مشترک PollScheduler (PLC_POLL_WORKERS thread)
+    """
+    from django.conf import settings
+
     device_id = device.pk
     if device_id in _active_pollers:
         _active_pollers[device_id].stop()
 
-    driver = get_plc_driver(device)
-    poller = PLCPollingService(
-        device_id=device_id,
-        driver=driver,
-        interval_seconds=getattr(device, "polling_interval", 5),
-    )
+    interval = getattr(device, "polling_interval", 5)
+    from core.adaptive_polling import adaptive_rate_from_settings
+    adaptive = adaptive_rate_from_settings(getattr(device, "device_type", "autoclave"), interval)
+    if getattr(device, "connection_type", "sim") == "tcp" and getattr(settings, "PLC_ASYNC_TCP", True):
+        from core.modbus_async import AsyncPLCPollingService, get_async_plc_driver
+        poller = AsyncPLCPollingService(
+            device_id=device_id,
+            driver=get_async_plc_driver(device),
+            interval_seconds=interval,
+            adaptive=adaptive,
+        )
+    else:
+        driver = get_plc_driver(device, connect=False)
+        if not isinstance(driver, AutoclaveSimulator):
+            from core.plc_connection import ManagedDriver
+            driver = ManagedDriver(driver, device_id=device_id)
+        poller = PLCPollingService(
+            device_id=device_id,
+            driver=driver,
+            interval_seconds=interval,
+            adaptive=adaptive,
+        )
     poller.start()
     _active_pollers[device_id] = poller
+
+    # فرمان‌های WebSocket این دستگاه به این پروسه برسند
+    from core.plc_commands import get_command_listener
+    get_command_listener().watch(device_id)
     return poller
 
 
@@ -699,7 +836,14 @@ def stop_polling(device_id: int):
     if device_id in _active_pollers:
         _active_pollers[device_id].stop()
         del _active_pollers[device_id]
+        from core.plc_commands import get_command_listener
+        get_command_listener().unwatch(device_id)
 
 
 def get_all_pollers() -> Dict[int, PLCPollingService]:
     return _active_pollers
+
+
+def get_poller_states() -> Dict[int, str]:
+    """وضعیت circuit breaker هر دستگاه در حال polling"""
+    return {device_id: poller.breaker_state for device_id, poller in _active_pollers.items()}
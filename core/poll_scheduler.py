@@ -0,0 +1,205 @@
+"""
+============================================================
+Poll Scheduler — زمان‌بند مرکزی poll همه دستگاه‌ها (heap موعدها)
+============================================================
+قبلاً هر PLCPollingService یک thread داشت که بعد از خواندن
+interval ثانیه می‌خوابید: هر poll به اندازه زمان خواندن عقب می‌افتاد
+(drift) و همه pollerها که با start_polling با هم شروع شده بودند هم‌زمان
+به دیتابیس و باس RS485 فشار می‌آوردند.
+
+PollScheduler موعد poll بعدی همه دستگاه‌ها را در یک heap نگه می‌دارد:
+
+- بدون drift: موعد بعدی = موعد برنامه‌ریزی‌شده قبلی + فاصله (نه پایان
+  خواندن + فاصله)؛ اگر خواندن از فاصله طولانی‌تر شود، نوبت‌های ازدست‌رفته
+  رد و شمرده می‌شوند (skipped) به جای poll پشت‌سرهم برای جبران
+- پخش یکنواخت: فاز شروع هر دستگاه با دنباله نسبت طلایی در طول فاصله‌اش
+  پخش می‌شود (بدون توجه به تعداد دستگاه‌ها همیشه یکنواخت)
+- jitter: هر poll تا JITTER × فاصله دیرتر از خط زمانی پایه (که خودش
+  ثابت می‌ماند) تا دستگاه‌های هم‌فاز قفل نشوند
+- اجرا: یک thread زمان‌بند + ThreadPool مشترک (به جای یک thread به ازای
+  هر دستگاه)؛ pollerهای async روی event loop موتور async اجرا می‌شوند
+- تأخیر هر poll (زمان اجرای واقعی − موعد) برای هر دستگاه و به صورت
+  صدک‌ها گزارش می‌شود
+
+    get_scheduler().add(poller)         # PLCPollingService.start
+    get_scheduler().remove(poller)      # PLCPollingService.stop
+    get_scheduler().stats()             # {"p95_ms": …, "skipped": …}
+"""
+
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from typing import Dict, Optional
+
+from core.plc_commands import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+# کسر طلایی برای پخش فاز شروع (دنباله کم‌اختلاف)
+GOLDEN_RATIO_FRACTION = 0.6180339887498949
+
+
+class _Entry:
+    __slots__ = ("poller", "base", "due", "active", "future", "lateness")
+
+    def __init__(self, poller, base: float, due: float):
+        self.poller = poller
+        self.base = base          # خط زمانی بدون jitter
+        self.due = due            # موعد این نوبت (با jitter)
+        self.active = True
+        self.future = None
+        self.lateness: Optional[float] = None
+
+
+class PollScheduler:
+    def __init__(self, workers: int = 32, jitter: float = 0.1):
+        self.workers = workers
+        self.jitter = jitter
+        self._heap = []
+        self._entries: Dict[object, _Entry] = {}
+        self._seq = itertools.count()
+        self._phase = itertools.count(1)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self.lateness = LatencyStats(size=2000)
+        self.polls = 0
+        self.skipped = 0
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="plc-poll")
+            self._thread = threading.Thread(target=self._run, name="poll-scheduler", daemon=True)
+            self._thread.start()
+            logger.info(f"زمان‌بند poll شروع شد ({self.workers} worker، jitter {self.jitter:.0%})")
+
+    # ── ثبت دستگاه‌ها ──────────────────────────────────────
+    def add(self, poller):
+        self.start()
+        interval = float(poller.interval)
+        now = time.monotonic()
+        with self._cond:
+            phase = (next(self._phase) * GOLDEN_RATIO_FRACTION) % 1.0
+            base = now + phase * interval
+            entry = _Entry(poller, base, self._jittered(base, interval))
+            previous = self._entries.get(poller)
+            if previous is not None:
+                previous.active = False
+            self._entries[poller] = entry
+            self._push(entry)
+
+    def remove(self, poller, timeout: float = 5.0):
+        """حذف از زمان‌بند و انتظار برای poll در حال اجرا (مثل join thread قبلی)"""
+        with self._cond:
+            entry = self._entries.pop(poller, None)
+            if entry is None:
+                return
+            entry.active = False
+            future = entry.future
+        if future is not None:
+            wait([future], timeout=timeout)
+
+    def _jittered(self, base: float, interval: float) -> float:
+        return base + random.uniform(0, self.jitter * interval) if self.jitter else base
+
+    def _push(self, entry: _Entry):
+        heapq.heappush(self._heap, (entry.due, next(self._seq), entry))
+        if self._heap[0][2] is entry:
+            self._cond.notify()
+
+    # ── اجرا ───────────────────────────────────────────────
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    due, _, entry = self._heap[0]
+                    remaining = due - time.monotonic()
+                    if remaining > 0:
+                        self._cond.wait(remaining)
+                        continue
+                    heapq.heappop(self._heap)
+                    if entry.active:
+                        break
+                entry.lateness = time.monotonic() - due
+            self.lateness.record(max(0.0, entry.lateness))
+            try:
+                entry.future = entry.poller.submit_poll(self._executor)
+            except Exception as e:
+                logger.error(f"خطا در اجرای poll دستگاه #{entry.poller.device_id}: {e}")
+                self._reschedule(entry, None)
+                continue
+            entry.future.add_done_callback(partial(self._done, entry))
+
+    def _done(self, entry: _Entry, future):
+        values = None
+        if not future.cancelled() and future.exception() is None:
+            values = future.result()
+        self.polls += 1
+        self._reschedule(entry, values)
+
+    def _reschedule(self, entry: _Entry, values):
+        try:
+            interval = max(0.001, float(entry.poller.next_interval(values)))
+        except Exception as e:
+            logger.error(f"خطا در محاسبه فاصله poll دستگاه #{entry.poller.device_id}: {e}")
+            interval = float(entry.poller.interval)
+        now = time.monotonic()
+        with self._cond:
+            if not entry.active:
+                return
+            entry.base += interval
+            if entry.base < now:
+                # خواندن یا صف worker از فاصله طولانی‌تر شد: نوبت‌های ازدست‌رفته رد می‌شوند
+                missed = int((now - entry.base) // interval) + 1
+                self.skipped += missed
+                entry.base += missed * interval
+            entry.due = self._jittered(entry.base, interval)
+            self._push(entry)
+
+    # ── گزارش ──────────────────────────────────────────────
+    def stats(self) -> dict:
+        with self._cond:
+            entries = list(self._entries.values())
+        return {
+            "scheduled": len(entries),
+            "inflight": sum(1 for e in entries if e.future is not None and not e.future.done()),
+            "polls": self.polls,
+            "skipped": self.skipped,
+            **self.lateness.summary(),
+        }
+
+    def lateness_by_device(self) -> Dict[int, float]:
+        """device_id → تأخیر آخرین poll (میلی‌ثانیه)"""
+        with self._cond:
+            entries = list(self._entries.values())
+        return {
+            e.poller.device_id: round(e.lateness * 1000, 1)
+            for e in entries if e.lateness is not None
+        }
+
+
+_scheduler: Optional[PollScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> PollScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            from django.conf import settings
+            _scheduler = PollScheduler(
+                workers=getattr(settings, "PLC_POLL_WORKERS", 32),
+                jitter=getattr(settings, "PLC_POLL_JITTER", 0.1),
+            )
+        return _scheduler
@@ -0,0 +1,306 @@
+"""
+============================================================
+Poller Supervisor — پخش pollerها روی چند پروسه + بارگذاری مجدد تنظیمات
+============================================================
+start_polling همه pollerها را در یک پروسه (پشت GIL) اجرا می‌کند و
+تغییر تنظیمات PLC در پنل وب تا راه‌اندازی مجدد دستور دیده نمی‌شود.
+supervisor دستگاه‌ها را بین N پروسه worker تقسیم می‌کند (pk % N؛ همه
+دستگاه‌های یک پورت RS485 در یک worker، چون فقط یک پروسه می‌تواند مالک
+پورت سریال و زمان‌بند round-robin آن باشد):
+
+- هر worker هر RELOAD_SECONDS اثر انگشت تنظیمات دستگاه‌های سهم خود را
+  از دیتابیس می‌خواند (یک SELECT) و فقط pollerهای تغییرکرده را
+  دوباره می‌سازد؛ دستگاه جدید/فعال‌شده شروع و غیرفعال/حذف‌شده متوقف می‌شود
+- worker بار خود (تعداد poller، poll مورد انتظار در ثانیه، CPU، حافظه،
+  صف نویسنده) و snapshot متریک‌ها (core.metrics) را روی Pipe اختصاصی
+  خود به supervisor گزارش می‌کند؛ supervisor متریک‌های ادغام‌شده را روی
+  یک پورت HTTP سرو می‌کند
+- worker از کار افتاده دوباره راه‌اندازی می‌شود؛ اگر پشت‌سرهم زود بمیرد
+  با backoff نمایی (crash loop باعث بار روی PLCها نشود)
+
+    supervisor = PollerSupervisor(workers=4)
+    supervisor.start()
+    while True:
+        supervisor.check()              # راه‌اندازی مجدد workerهای مرده
+        supervisor.loads()              # worker → آخرین گزارش بار
+"""
+
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import threading
+import time
+import zlib
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# فیلدهایی که تغییرشان poller را دوباره می‌سازد
+FINGERPRINT_FIELDS = (
+    "connection_type", "plc_ip", "plc_port", "modbus_slave_id",
+    "serial_port", "baud_rate", "polling_interval", "device_type",
+)
+
+
+def shard_of(device_id: int, connection_type: str, serial_port: str, count: int) -> int:
+    """سهم worker هر دستگاه؛ دستگاه‌های RTU بر اساس پورت سریال (پایدار بین اجراها)"""
+    if connection_type == "rtu":
+        return zlib.crc32((serial_port or "").encode()) % count
+    return device_id % count
+
+
+# worker که زودتر از این بمیرد crash loop حساب می‌شود
+MIN_UPTIME_SECONDS = 30
+MAX_RESTART_BACKOFF_SECONDS = 60
+
+
+# ============================================================
+# WORKER (داخل پروسه فرزند)
+# ============================================================
+class PollerWorker:
+    """مدیریت pollerهای یک سهم (shard) داخل پروسه worker"""
+
+    def __init__(self, index: int, count: int):
+        self.index = index
+        self.count = count
+        self.fingerprints: Dict[int, Tuple] = {}
+        self.reloads = 0
+        self.restarts = 0
+        self._cpu = (time.monotonic(), time.process_time())
+
+    def wanted(self) -> Dict[int, Tuple]:
+        """دستگاه‌های فعال این سهم → اثر انگشت تنظیمات (یک SELECT)"""
+        from apps.devices.models import Device
+
+        rows = Device.objects.filter(is_active=True).values_list("pk", *FINGERPRINT_FIELDS)
+        connection_type, serial_port = FINGERPRINT_FIELDS.index("connection_type"), FINGERPRINT_FIELDS.index("serial_port")
+        return {
+            row[0]: row[1:] for row in rows
+            if shard_of(row[0], row[1 + connection_type], row[1 + serial_port], self.count) == self.index
+        }
+
+    def reload(self):
+        """هم‌گام کردن pollerها با دیتابیس؛ فقط دستگاه‌های تغییرکرده لمس می‌شوند"""
+        from apps.devices.models import Device
+        from core.device_state import get_device_tracker
+        from core.metrics import get_registry
+        from core.plc_driver import start_polling, stop_polling
+        from core.status_cache import get_status_cache
+
+        wanted = self.wanted()
+        for device_id in set(self.fingerprints) - set(wanted):
+            stop_polling(device_id)
+            get_device_tracker().forget(device_id)
+            get_registry().forget_device(device_id)
+            get_status_cache().set_status(device_id, "offline")
+            del self.fingerprints[device_id]
+            logger.info(f"⏹ worker {self.index}: polling دستگاه #{device_id} متوقف شد (غیرفعال/حذف)")
+
+        changed = [pk for pk, fingerprint in wanted.items() if self.fingerprints.get(pk) != fingerprint]
+        if changed:
+            tracker = get_device_tracker()
+            for device in Device.objects.filter(pk__in=changed):
+                restarted = device.pk in self.fingerprints
+                # سیگنال post_save فقط در پروسه ذخیره‌کننده اجرا شده؛ نمونه تازه جایگزین شود
+                tracker.device_saved(device)
+                start_polling(device)
+                self.fingerprints[device.pk] = wanted[device.pk]
+                if restarted:
+                    self.restarts += 1
+                    logger.info(f"🔄 worker {self.index}: تنظیمات دستگاه #{device.pk} عوض شد، poller دوباره ساخته شد")
+        self.reloads += 1
+
+    def load(self) -> dict:
+        """گزارش بار این worker برای supervisor"""
+        import resource
+        from core.bulk_writer import get_bulk_writer
+        from core.metrics import get_registry
+        from core.plc_driver import get_all_pollers, get_poller_states
+        from core.poll_scheduler import get_scheduler
+        from core.ws_publisher import get_publisher
+
+        now, cpu = time.monotonic(), time.process_time()
+        wall_delta, cpu_delta = now - self._cpu[0], cpu - self._cpu[1]
+        self._cpu = (now, cpu)
+        pollers = get_all_pollers()
+        writer = get_bulk_writer().stats()
+        schedule = get_scheduler().stats()
+        return {
+            "worker": self.index,
+            "pid": os.getpid(),
+            "pollers": len(pollers),
+            "unreachable": sum(1 for state in get_poller_states().values() if state != "closed"),
+            # poll مورد انتظار در ثانیه با فاصله پایه هر دستگاه
+            "polls_per_second": round(sum(1 / max(p.interval, 0.001) for p in pollers.values()), 2),
+            "cpu_pct": round(100 * cpu_delta / wall_delta, 1) if wall_delta > 0 else 0.0,
+            "rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "written": writer["written"],
+            "pending": writer["pending"],
+            "spool_backlog": writer.get("spool", {}).get("backlog_rows", 0),
+            "spool_lag_s": writer.get("spool", {}).get("lag_seconds", 0.0),
+            "ws_pending": get_publisher().pending,
+            "late_p95_ms": round(schedule.get("p95_ms", 0.0), 1),
+            "skipped": schedule["skipped"],
+            "restarts": self.restarts,
+            "reported_at": time.time(),
+            "metrics": get_registry().snapshot(),
+        }
+
+    def shutdown(self):
+        from core.bulk_writer import get_bulk_writer
+        from core.plc_driver import get_all_pollers, stop_polling
+        from core.status_cache import get_status_cache
+        from core.ws_publisher import get_publisher
+
+        for device_id in list(get_all_pollers()):
+            stop_polling(device_id)
+        get_bulk_writer().stop()
+        get_status_cache().stop()
+        get_publisher().stop()
+
+
+def run_worker(index: int, count: int, reload_seconds: float, loads):
+    """
+    نقطه ورود پروسه worker (spawn — بدون اتصال دیتابیس به ارث رسیده از والد)
+    توقف با SIGTERM؛ گزارش بار روی Pipe اختصاصی همین worker
+    (Event/Queue مشترک بعد از kill -9 یک worker ممکن است قفل بماند)
+    """
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    django.setup()
+    stop = threading.Event()
+    # Ctrl+C به کل گروه پروسه می‌رسد؛ توقف فقط با SIGTERM از supervisor
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda sig, frame: stop.set())
+
+    from django.db import close_old_connections
+
+    worker = PollerWorker(index, count)
+    logger.info(f"🚀 worker {index}/{count} شروع شد (pid {os.getpid()})")
+    try:
+        while not stop.is_set():
+            try:
+                worker.reload()
+            except Exception as e:
+                # دیتابیس در دسترس نیست: pollerهای فعلی ادامه می‌دهند
+                logger.error(f"worker {index}: خطا در بارگذاری تنظیمات دستگاه‌ها: {e}")
+            close_old_connections()
+            try:
+                loads.send(worker.load())
+            except (BrokenPipeError, OSError):
+                # supervisor مرده؛ worker یتیم نماند
+                break
+            stop.wait(reload_seconds)
+    finally:
+        worker.shutdown()
+        logger.info(f"⏹ worker {index} متوقف شد")
+
+
+# ============================================================
+# SUPERVISOR (پروسه والد)
+# ============================================================
+class PollerSupervisor:
+    # زیرکلاس‌ها (مثل core.mqtt_consumer) پروسه worker دیگری اجرا می‌کنند
+    worker_target = staticmethod(run_worker)
+    worker_name = "plc-worker"
+
+    def __init__(self, workers: Optional[int] = None, reload_seconds: float = 10.0):
+        self.count = workers or os.cpu_count() or 1
+        self.reload_seconds = reload_seconds
+        self._ctx = multiprocessing.get_context("spawn")
+        self._stopping = False
+        self._pipes: Dict[int, multiprocessing.connection.Connection] = {}
+        self._processes: Dict[int, multiprocessing.Process] = {}
+        self._started_at: Dict[int, float] = {}
+        self._crashes: Dict[int, int] = {}
+        self._restart_at: Dict[int, float] = {}
+        self._latest: Dict[int, dict] = {}
+        # loads() هم از حلقه اصلی و هم از thread سرور متریک صدا زده می‌شود
+        self._loads_lock = threading.Lock()
+        self.restarts = 0
+
+    def start(self):
+        for index in range(self.count):
+            self._spawn(index)
+
+    def _spawn(self, index: int):
+        receiver, sender = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(
+            target=self.worker_target,
+            args=self._worker_args(index, sender),
+            name=f"{self.worker_name}-{index}",
+            daemon=False,
+        )
+        process.start()
+        sender.close()
+        if index in self._pipes:
+            self._pipes[index].close()
+        self._pipes[index] = receiver
+        self._processes[index] = process
+        self._started_at[index] = time.monotonic()
+        self._restart_at.pop(index, None)
+
+    def _worker_args(self, index: int, loads) -> tuple:
+        return (index, self.count, self.reload_seconds, loads)
+
+    def check(self):
+        """workerهای مرده را (با backoff در crash loop) دوباره راه می‌اندازد"""
+        if self._stopping:
+            return
+        # خالی کردن Pipeها تا send در worker مسدود نشود
+        self.loads()
+        now = time.monotonic()
+        for index, process in list(self._processes.items()):
+            if process.is_alive():
+                continue
+            if index not in self._restart_at:
+                uptime = now - self._started_at[index]
+                self._crashes[index] = self._crashes.get(index, 0) + 1 if uptime < MIN_UPTIME_SECONDS else 0
+                delay = min(MAX_RESTART_BACKOFF_SECONDS, 2 ** self._crashes[index]) if self._crashes[index] else 0
+                self._restart_at[index] = now + delay
+                with self._loads_lock:
+                    self._latest.pop(index, None)
+                logger.error(
+                    f"❌ worker {index} (pid {process.pid}) با کد {process.exitcode} متوقف شد — "
+                    f"راه‌اندازی مجدد {'فوری' if not delay else f'بعد از {delay}s'}"
+                )
+            if now >= self._restart_at[index]:
+                self.restarts += 1
+                self._spawn(index)
+
+    def loads(self) -> Dict[int, dict]:
+        """worker → آخرین گزارش بار"""
+        with self._loads_lock:
+            for index, pipe in list(self._pipes.items()):
+                try:
+                    while pipe.poll():
+                        self._latest[index] = pipe.recv()
+                except (EOFError, OSError):
+                    # worker مرده؛ check() آن را دوباره راه می‌اندازد
+                    continue
+            return dict(sorted(self._latest.items()))
+
+    def metrics(self) -> dict:
+        """متریک‌های ادغام‌شده همه workerها (آخرین گزارش هر کدام)"""
+        from core.metrics import merge_snapshots
+        return merge_snapshots(load.get("metrics", {}) for load in self.loads().values())
+
+    def alive(self) -> int:
+        return sum(1 for process in self._processes.values() if process.is_alive())
+
+    def stop(self, timeout: float = 15.0):
+        self._stopping = True
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()  # SIGTERM → توقف منظم pollerها و خالی شدن بافر نویسنده
+        deadline = time.monotonic() + timeout
+        for process in self._processes.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+        for index, process in self._processes.items():
+            if process.is_alive():
+                logger.error(f"worker {index} تا {timeout}s متوقف نشد — kill")
+                process.kill()
+                process.join(5)
@@ -0,0 +1,278 @@
+"""
+============================================================
+ReadingBatch — دسته ستونی خوانش‌ها (array تایپ‌دار به جای شیء به ازای هر ردیف)
+============================================================
+در نرخ‌های زیر ثانیه با صدها دستگاه، ساخت یک AutoclaveReading + یک dict
+برای to_dict() + یک نمونه مدل SensorReading به ازای هر poll بیشتر
+پروفایل را به تخصیص حافظه و GC می‌دهد. ReadingBatch هر ستون را در یک
+array.array نگه می‌دارد:
+
+- اعداد اعشاری: 'd' (NULL = NaN)
+- door_locked / heater_on / pump_on: 'b' (NULL = -1)
+- وضعیت: کد عددی 'B' (ترتیب DEVICE_STATUSES)؛ وضعیت خارج از لیست = "unknown"
+  (یک بار برای هر مقدار لاگ می‌شود، بی‌صدا idle نمی‌شود)
+- timestamp: ثانیه epoch به صورت 'd'
+
+    batch = ReadingBatch()
+    batch.append(device_id, time.time(), values)      # خروجی RegisterMap.decode
+    batch = batch.filter(batch.valid_mask(bounds))     # اعتبارسنجی برداری (NumPy اگر نصب باشد)
+    batch.insert()                                     # یک executemany، بدون نمونه مدل
+    for group, payload in batch.messages(): ...        # آخرین ردیف هر دستگاه برای WebSocket
+
+NumPy اختیاری است: as_numpy() بدون کپی روی همان بافرهای array ساخته می‌شود.
+"""
+
+import logging
+import math
+from array import array
+from datetime import datetime, timezone
+from itertools import compress
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy اختیاری است؛ مسیر array خالص کار می‌کند
+    np = None
+
+logger = logging.getLogger(__name__)
+
+NAN = math.nan
+
+# ستون‌های اعشاری — هم‌نام فیلدهای SensorReading
+FLOAT_COLUMNS = (
+    "temperature_c", "pressure_bar", "steam_flow_kg_h", "water_level_pct",
+    "combustion_temp_c", "post_combustion_temp_c", "exhaust_temp_c",
+    "co_ppm", "nox_ppm", "so2_ppm", "co2_ppm", "fuel_flow_lh",
+    "power_consumption_kw", "voltage_v", "current_a",
+)
+# ستون‌های بولی (-1 = نامشخص)؛ فقط door_locked در SensorReading ذخیره می‌شود
+FLAG_COLUMNS = ("door_locked", "heater_on", "pump_on")
+# ستون‌های شمارنده PLC (فقط برای WebSocket)
+COUNTER_COLUMNS = ("cycle_number", "total_cycles", "alarm_code")
+
+# ترتیب ثابت است (کد در spool و قالب باینری MQTT)؛ مقدار جدید فقط به انتها اضافه شود
+DEVICE_STATUSES = ("idle", "heating", "sterilizing", "cooling", "complete", "error", "burning", "unknown")
+_STATUS_CODE = {status: code for code, status in enumerate(DEVICE_STATUSES)}
+UNKNOWN_STATUS = _STATUS_CODE["unknown"]
+_unknown_seen = set()
+
+
+def status_code(status: str) -> int:
+    """کد ستون status؛ وضعیت ناشناخته → "unknown" با یک هشدار برای هر مقدار"""
+    code = _STATUS_CODE.get(status) if isinstance(status, str) else None
+    if code is None:
+        code = UNKNOWN_STATUS
+        key = repr(status)[:50]
+        if key not in _unknown_seen and len(_unknown_seen) < 100:
+            _unknown_seen.add(key)
+            logger.warning(f"وضعیت دستگاه ناشناخته {key} به صورت 'unknown' ذخیره می‌شود")
+    return code
+
+
+_cycle_status: Optional[Dict[int, str]] = None
+
+
+def _cycle_status_map() -> Dict[int, str]:
+    """CYCLE_STATUS درایور — import تنبل (یک بار) تا این ماژول به plc_driver وابسته نشود"""
+    global _cycle_status
+    if _cycle_status is None:
+        from core.plc_driver import CYCLE_STATUS
+        _cycle_status = CYCLE_STATUS
+    return _cycle_status
+
+
+TYPECODES = {
+    "device_id": "q",
+    "cycle_id": "q",   # 0 = بدون سیکل
+    "timestamp": "d",
+    "status": "B",
+    **{name: "d" for name in FLOAT_COLUMNS},
+    **{name: "b" for name in FLAG_COLUMNS},
+    **{name: "q" for name in COUNTER_COLUMNS},
+}
+
+# کلید پیام WebSocket → ستون (همان کلیدهای AutoclaveReading.to_dict)
+MESSAGE_KEYS = {
+    "temperature": "temperature_c",
+    "pressure": "pressure_bar",
+    "steam_flow": "steam_flow_kg_h",
+    "water_level": "water_level_pct",
+    "power": "power_consumption_kw",
+    "combustion_temp": "combustion_temp_c",
+    "exhaust_temp": "exhaust_temp_c",
+    "co_ppm": "co_ppm",
+    "nox_ppm": "nox_ppm",
+    "so2_ppm": "so2_ppm",
+    "co2_ppm": "co2_ppm",
+}
+
+
+def _flag(value) -> int:
+    if value is None:
+        return -1
+    return 1 if value else 0
+
+
+def _null(name: str):
+    if name in FLOAT_COLUMNS or name == "timestamp":
+        return NAN
+    if name in FLAG_COLUMNS:
+        return -1
+    return 0
+
+
+class ReadingBatch:
+    __slots__ = tuple(TYPECODES)
+
+    def __init__(self, columns: Optional[Dict[str, array]] = None):
+        for name, typecode in TYPECODES.items():
+            setattr(self, name, columns[name] if columns else array(typecode))
+
+    def __len__(self) -> int:
+        return len(self.device_id)
+
+    # ── ساخت ───────────────────────────────────────────────
+    def append(self, device_id: int, timestamp: float, values: Dict[str, float],
+               status: Optional[str] = None, cycle_id: Optional[int] = None):
+        """
+        یک ردیف از مقادیر decode‌شده (RegisterMap.decode یا payload MQTT)
+        status: اگر None باشد از کد cycle_status در values (CYCLE_STATUS) گرفته می‌شود
+        """
+        get = values.get
+        self.device_id.append(device_id)
+        self.cycle_id.append(cycle_id or 0)
+        self.timestamp.append(timestamp)
+        if status is None:
+            status = (_cycle_status or _cycle_status_map()).get(int(get("cycle_status", 0)), "idle")
+        self.status.append(status_code(status))
+        for name in FLOAT_COLUMNS:
+            value = get(name)
+            getattr(self, name).append(NAN if value is None else value)
+        for name in FLAG_COLUMNS:
+            getattr(self, name).append(_flag(get(name)))
+        for name in COUNTER_COLUMNS:
+            getattr(self, name).append(int(get(name) or 0))
+
+    @classmethod
+    def from_columns(cls, length: int, columns: Dict[str, Sequence]) -> "ReadingBatch":
+        """
+        ستون‌های آماده (مثلاً آرایه‌های NumPy شبیه‌ساز ناوگان)
+        آرایه NumPy با یک tobytes کپی می‌شود؛ ستون غایب = NULL
+        """
+        batch = {}
+        for name, typecode in TYPECODES.items():
+            column = columns.get(name)
+            if column is None:
+                column = array(typecode, [_null(name)]) * length
+            elif np is not None and isinstance(column, np.ndarray):
+                column = array(typecode, column.astype(typecode, copy=False).tobytes())
+            else:
+                column = array(typecode, column)
+            batch[name] = column
+        return cls(batch)
+
+    def clear(self):
+        """خالی کردن ستون‌ها بدون ساخت array جدید (بافر قابل استفاده مجدد poller)"""
+        for name in TYPECODES:
+            del getattr(self, name)[:]
+
+    def extend(self, other: "ReadingBatch"):
+        for name in TYPECODES:
+            getattr(self, name).extend(getattr(other, name))
+
+    def set_cycle_ids(self, cycle_by_device: Dict[int, Optional[int]]):
+        """سیکل فعال هر دستگاه (یک lookup برای کل دسته)"""
+        self.cycle_id = array("q", (cycle_by_device.get(d) or 0 for d in self.device_id))
+
+    # ── NumPy / اعتبارسنجی ─────────────────────────────────
+    def as_numpy(self, name: str):
+        """نمای NumPy بدون کپی روی ستون (نیاز به NumPy)"""
+        return np.frombuffer(getattr(self, name), dtype=getattr(self, name).typecode)
+
+    def valid_mask(self, bounds: Dict[str, Tuple[float, float]]) -> List[bool]:
+        """
+        ردیف‌هایی که همه ستون‌های bounds در محدوده‌اند (NaN = مقدار ندارد = معتبر)
+        با NumPy یک عملیات برداری به ازای هر ستون، بدون NumPy یک حلقه
+        """
+        if np is not None:
+            mask = np.ones(len(self), dtype=bool)
+            for name, (low, high) in bounds.items():
+                column = self.as_numpy(name)
+                mask &= np.isnan(column) | ((column >= low) & (column <= high))
+            return mask.tolist()
+
+        mask = [True] * len(self)
+        for name, (low, high) in bounds.items():
+            for i, value in enumerate(getattr(self, name)):
+                if value == value and not low <= value <= high:
+                    mask[i] = False
+        return mask
+
+    def filter(self, mask: Sequence[bool]) -> "ReadingBatch":
+        if all(mask):
+            return self
+        return ReadingBatch({
+            name: array(typecode, compress(getattr(self, name), mask))
+            for name, typecode in TYPECODES.items()
+        })
+
+    # ── ذخیره ──────────────────────────────────────────────
+    def insert(self, using: str = "default") -> int:
+        """
+        درج کل دسته در SensorReading با یک executemany (بدون نمونه مدل)
+        ستون‌ها مستقیماً از arrayها zip می‌شوند
+        """
+        if not len(self):
+            return 0
+        from django.db import connections
+        from apps.monitoring.models import SensorReading
+
+        connection = connections[using]
+        quote = connection.ops.quote_name
+        adapt_datetime = connection.ops.adapt_datetimefield_value
+        meta = SensorReading._meta
+
+        columns = ["device_id", "cycle_id", "timestamp", *FLOAT_COLUMNS, "door_locked", "device_status"]
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            quote(meta.db_table),
+            ", ".join(quote(meta.get_field(c).column) for c in columns),
+            ", ".join(["%s"] * len(columns)),
+        )
+        rows = zip(
+            self.device_id,
+            (c or None for c in self.cycle_id),
+            (adapt_datetime(datetime.fromtimestamp(t, timezone.utc)) for t in self.timestamp),
+            *((None if v != v else v for v in getattr(self, name)) for name in FLOAT_COLUMNS),
+            (None if f < 0 else bool(f) for f in self.door_locked),
+            (DEVICE_STATUSES[s] for s in self.status),
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+        return len(self)
+
+    # ── WebSocket ──────────────────────────────────────────
+    def latest_rows(self) -> Dict[int, int]:
+        """device_id → اندیس آخرین ردیف آن دستگاه"""
+        return {device_id: i for i, device_id in enumerate(self.device_id)}
+
+    def row_payload(self, i: int) -> dict:
+        """همان شکل AutoclaveReading.to_dict برای ردیف i"""
+        payload = {}
+        for key, name in MESSAGE_KEYS.items():
+            value = getattr(self, name)[i]
+            if value == value:
+                payload[key] = value
+        for name in FLAG_COLUMNS:
+            flag = getattr(self, name)[i]
+            if flag >= 0:
+                payload[name] = bool(flag)
+        for name in COUNTER_COLUMNS:
+            payload[name] = getattr(self, name)[i]
+        payload["status"] = DEVICE_STATUSES[self.status[i]]
+        payload["timestamp"] = datetime.fromtimestamp(self.timestamp[i], timezone.utc).isoformat()
+        return payload
+
+    def messages(self) -> Iterator[Tuple[str, dict]]:
+        """(گروه WebSocket، پیام sensor_update) — فقط آخرین ردیف هر دستگاه"""
+        for device_id, i in self.latest_rows().items():
+            yield f"device_{device_id}", {"type": "sensor_update", "data": self.row_payload(i)}
@@ -0,0 +1,205 @@
+"""
+============================================================
+Register Map + Read Planner — نقشه رجیستر اعلانی برای هر دستگاه
+============================================================
+به جای D0..D11 ثابت در درایورها، هر دستگاه می‌تواند نقشه خودش را
+در DeviceRegister داشته باشد (آدرس، نوع داده، ضریب، فیلد مقصد).
+
+- planner: رجیسترها بر اساس آدرس مرتب و تا سقف ۱۲۵ رجیستر (FC03)
+  یا ۲۰۰۰ coil (FC01) در کمترین تعداد درخواست ادغام می‌شوند؛
+  فاصله بین بلوک‌ها هم خوانده و دور ریخته می‌شود (بایت بیشتر روی
+  خط ارزان‌تر از یک round trip اضافه است)
+- decode: هر بلوک یک struct.Struct کامپایل‌شده دارد (نوع داده هر
+  رجیستر + pad برای فاصله‌ها) → کل بلوک با یک unpack_from و همه
+  ضرایب با یک گذر اعمال می‌شوند (مقدار = خام ÷ ضریب، مثل «°C × 10»)
+
+    register_map = RegisterMap.for_device(device)
+    for block in register_map.blocks:
+        payload = ...  # FC block.function از block.start به تعداد block.count
+    values = register_map.decode(payloads)   # {"temperature_c": 121.5, ...}
+"""
+
+import logging
+import operator
+import struct
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from core import modbus_codec
+
+logger = logging.getLogger(__name__)
+
+HOLDING = "holding"
+COIL = "coil"
+
+FUNCTION_CODES = {HOLDING: modbus_codec.FC_READ_HOLDING, COIL: modbus_codec.FC_READ_COILS}
+# سقف هر درخواست طبق Modbus Application Protocol
+MAX_READ_COUNT = {HOLDING: 125, COIL: 2000}
+
+# نوع داده → (کاراکتر struct، تعداد رجیستر)؛ ۳۲ بیتی‌ها word بالا اول (big-endian)
+DATA_TYPES = {
+    "u16": ("H", 1),
+    "s16": ("h", 1),
+    "u32": ("I", 2),
+    "float32": ("f", 2),
+}
+
+
+@dataclass(frozen=True)
+class RegisterSpec:
+    field: str
+    address: int
+    data_type: str = "u16"
+    scale: float = 1.0
+    area: str = HOLDING
+
+    @property
+    def width(self) -> int:
+        """تعداد رجیستر/coil اشغال‌شده"""
+        if self.area == COIL:
+            return 1
+        return DATA_TYPES[self.data_type][1]
+
+    @property
+    def end(self) -> int:
+        return self.address + self.width
+
+
+class ReadBlock:
+    """یک درخواست FC03/FC01 + decoder کامپایل‌شده آن"""
+
+    def __init__(self, area: str, specs: Sequence[RegisterSpec]):
+        self.area = area
+        self.function = FUNCTION_CODES[area]
+        self.start = specs[0].address
+        self.count = max(spec.end for spec in specs) - self.start
+        self.fields = tuple(spec.field for spec in specs)
+        self.scales = tuple(spec.scale for spec in specs)
+
+        if area == HOLDING:
+            fmt, position = [">"], self.start
+            for spec in specs:
+                if spec.address > position:
+                    fmt.append(f"{(spec.address - position) * 2}x")
+                fmt.append(DATA_TYPES[spec.data_type][0])
+                position = spec.end
+            self._struct = struct.Struct("".join(fmt))
+        else:
+            # coilها LSB-first در بایت‌های پاسخ FC01 بسته‌بندی می‌شوند
+            self._bits = tuple(divmod(spec.address - self.start, 8) for spec in specs)
+
+    @property
+    def payload_length(self) -> int:
+        return modbus_codec.read_payload_length(self.function, self.count)
+
+    def decode(self, payload) -> Dict[str, float]:
+        """payload = بخش داده پاسخ (بعد از byte_count)"""
+        if self.area == HOLDING:
+            raw = self._struct.unpack_from(payload)
+        else:
+            raw = tuple((payload[byte] >> bit) & 1 for byte, bit in self._bits)
+        return dict(zip(self.fields, map(operator.truediv, raw, self.scales)))
+
+    def __repr__(self):
+        return f"<ReadBlock FC{self.function:02d} {self.start}+{self.count} {len(self.fields)} فیلد>"
+
+
+def find_overlaps(specs: Iterable[RegisterSpec]) -> List[Tuple[RegisterSpec, RegisterSpec]]:
+    """(رجیستر، رجیستر قبلی که بازه آدرسش آن را می‌پوشاند) در هر ناحیه"""
+    overlaps = []
+    specs = list(specs)
+    for area in (HOLDING, COIL):
+        covering = None  # رجیستر با بیشترین end تا اینجا
+        for spec in sorted((s for s in specs if s.area == area), key=lambda s: s.address):
+            if covering is not None and spec.address < covering.end:
+                overlaps.append((spec, covering))
+            if covering is None or spec.end > covering.end:
+                covering = spec
+    return overlaps
+
+
+def plan_reads(specs: Iterable[RegisterSpec]) -> List[ReadBlock]:
+    """ادغام رجیسترها در کمترین تعداد درخواست زیر سقف هر function code"""
+    blocks = []
+    specs = list(specs)
+    for spec, other in find_overlaps(specs):
+        raise ValueError(
+            f"رجیستر {spec.field} @ {spec.address} با {other.field} @ {other.address} "
+            f"({other.data_type}، {other.width} رجیستر) هم‌پوشانی دارد"
+        )
+    for area in (HOLDING, COIL):
+        limit = MAX_READ_COUNT[area]
+        group: List[RegisterSpec] = []
+        for spec in sorted((s for s in specs if s.area == area), key=lambda s: s.address):
+            if group:
+                if spec.end - group[0].address > limit:
+                    blocks.append(ReadBlock(area, group))
+                    group = []
+            group.append(spec)
+        if group:
+            blocks.append(ReadBlock(area, group))
+    return blocks
+
+
+class RegisterMap:
+    def __init__(self, specs: Iterable[RegisterSpec]):
+        self.specs = tuple(specs)
+        self.blocks = plan_reads(self.specs)
+
+    def decode(self, payloads: Sequence) -> Dict[str, float]:
+        """payloads به ترتیب self.blocks"""
+        values: Dict[str, float] = {}
+        for block, payload in zip(self.blocks, payloads):
+            values.update(block.decode(payload))
+        return values
+
+    @classmethod
+    def for_device(cls, device) -> "RegisterMap":
+        """
+        نقشه ثبت‌شده در DeviceRegister یا نقشه پیش‌فرض D0..D11
+        نقشه نامعتبر (هم‌پوشانی، نوع داده ناشناخته) لاگ می‌شود و نقشه پیش‌فرض
+        جای آن را می‌گیرد تا polling دستگاه (و reload supervisor) متوقف نشود
+        """
+        try:
+            rows = list(device.registers.all())
+        except (AttributeError, ValueError):
+            rows = []
+        if not rows:
+            return DEFAULT_REGISTER_MAP
+        try:
+            return cls(
+                RegisterSpec(
+                    field=row.target_field,
+                    address=row.address,
+                    data_type=row.data_type,
+                    scale=row.scale or 1.0,
+                    area=row.area,
+                )
+                for row in rows
+            )
+        except (ValueError, KeyError) as e:
+            logger.error(
+                f"نقشه رجیستر دستگاه #{getattr(device, 'pk', None)} نامعتبر است، "
+                f"نقشه پیش‌فرض D0..D11 استفاده می‌شود: {e}"
+            )
+            return DEFAULT_REGISTER_MAP
+
+    def __repr__(self):
+        return f"<RegisterMap {len(self.specs)} رجیستر در {len(self.blocks)} درخواست>"
+
+
+# نقشه پیش‌فرض برنامه COTRUST (docstring core/plc_driver.py)
+DEFAULT_REGISTER_MAP = RegisterMap([
+    RegisterSpec("temperature_c", 0, scale=10),
+    RegisterSpec("pressure_bar", 1, scale=100),
+    RegisterSpec("steam_flow_kg_h", 2, scale=10),
+    RegisterSpec("water_level_pct", 3),
+    RegisterSpec("power_consumption_kw", 4, scale=10),
+    RegisterSpec("cycle_status", 5),
+    RegisterSpec("door_locked", 6),
+    RegisterSpec("heater_on", 7),
+    RegisterSpec("pump_on", 8),
+    RegisterSpec("cycle_number", 9),
+    RegisterSpec("total_cycles", 10),
+    RegisterSpec("alarm_code", 11),
+])
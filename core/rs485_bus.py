@@ -0,0 +1,259 @@
+"""
+============================================================
+RS485 Bus Arbiter — چند PLC (slave ID) روی یک پورت سریال
+============================================================
+روی یک خط RS485 (multi-drop) فقط یک master می‌تواند فریم بفرستد.
+هر پورت فیزیکی (مثلاً /dev/ttyUSB0) دقیقاً یک RS485Bus دارد که:
+- تنها مالک serial.Serial است
+- درخواست‌های همه slave IDها را در صف‌های جداگانه نگه می‌دارد و
+  به صورت round-robin روی خط می‌فرستد (یک slave کند بقیه را گرسنه نمی‌گذارد)
+- بین فریم‌ها فقط سکوت t3.5 استاندارد Modbus را رعایت می‌کند
+  (به جای sleep ثابت 50ms) → حداکثر poll/s که خط اجازه می‌دهد
+- فرمان‌ها (FC05: شروع/توقف/ریست هشدار) صف جداگانه دارند و همیشه قبل
+  از خواندن‌های در صف فرستاده می‌شوند؛ حداکثر انتظار یک فرمان = یک
+  تراکنش در حال اجرا روی خط، مستقل از تعداد slaveها
+- خطای پورت (SerialException/OSError، مثلاً جدا شدن مبدل USB) پورت را
+  می‌بندد و bus را failed می‌کند: همه درخواست‌ها None می‌گیرند تا اتصال
+  مجدد درایور (ManagedDriver) پورت را با open() دوباره باز کند
+
+    bus = get_bus("/dev/ttyUSB0", baudrate=9600)
+    response = bus.transact(slave_id=3, frame=..., expected_len=29)
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# کاراکتر RTU با 8N1 (تنظیم پورت در open) = 1 start + 8 data + 1 stop = 10 بیت؛
+# 11 (قالب 8E1/8N2 استاندارد) عمداً به عنوان حاشیه اطمینان t3.5 استفاده می‌شود
+BITS_PER_CHAR = 11
+
+
+def inter_frame_gap(baud_rate: int) -> float:
+    """
+    سکوت t3.5 بین دو فریم (ثانیه)
+    طبق Modbus over Serial Line §2.5.1.1 برای baud > 19200 مقدار ثابت 1.75ms است
+    """
+    if baud_rate > 19200:
+        return 0.00175
+    return 3.5 * BITS_PER_CHAR / baud_rate
+
+
+class RS485Bus:
+    """مالک یک پورت سریال فیزیکی + زمان‌بند round-robin برای همه slaveها"""
+
+    def __init__(self, port: str, baudrate: int = 9600, timeout: float = 2.0):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.gap = inter_frame_gap(baudrate)
+        self._serial = None
+        self._users = 0
+        self._running = False
+        self._thread = None
+        self._cond = threading.Condition()
+        self._queues: Dict[int, deque] = {}
+        self._round_robin: deque = deque()
+        self._commands: deque = deque()
+        self._line_idle_at = 0.0
+        from core.metrics import get_registry
+        self.metrics = get_registry().bus(f"rtu:{port}")
+        self.metrics.depth = self.queue_depth
+
+    # ── اتصال ─────────────────────────────────────────────
+    def open(self) -> bool:
+        """
+        هر درایور یک بار open می‌کند؛ پورت با اولین کاربر (یا اولین open بعد
+        از failed شدن bus) باز می‌شود
+        """
+        with self._cond:
+            if self._serial and self._serial.is_open:
+                self._users += 1
+                return True
+            try:
+                import serial
+                self._serial = serial.Serial(
+                    port=self.port,
+                    baudrate=self.baudrate,
+                    bytesize=serial.EIGHTBITS,
+                    parity=serial.PARITY_NONE,
+                    stopbits=serial.STOPBITS_ONE,
+                    timeout=self.timeout,
+                )
+            except Exception as e:
+                logger.error(f"خطا در اتصال RS485: {e}")
+                return False
+
+            self._users += 1
+            if not self._running:
+                self._running = True
+                self._thread = threading.Thread(
+                    target=self._loop, name=f"rs485-{self.port}", daemon=True
+                )
+                self._thread.start()
+            logger.info(
+                f"RS485 متصل شد: {self.port} @ {self.baudrate} baud "
+                f"(t3.5 = {self.gap * 1000:.2f}ms)"
+            )
+            return True
+
+    def close(self):
+        """با آخرین کاربر پورت بسته و صف‌ها با None تخلیه می‌شوند"""
+        with self._cond:
+            self._users = max(0, self._users - 1)
+            if self._users:
+                return
+            self._running = False
+            for queue in (self._commands, *self._queues.values()):
+                while queue:
+                    queue.popleft()[0].set_result(None)
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=self.timeout + 1)
+            self._thread = None
+        if self._serial and self._serial.is_open:
+            self._serial.close()
+            logger.info(f"RS485 قطع شد: {self.port}")
+
+    @property
+    def is_open(self) -> bool:
+        return bool(self._serial and self._serial.is_open)
+
+    def _fail(self, error: Exception):
+        """بستن پورت خراب؛ _serial = None یعنی bus failed و open() بعدی پورت را باز می‌کند"""
+        with self._cond:
+            serial_port, self._serial = self._serial, None
+            # درخواست‌های در صف روی پورت بسته منتظر timeout نمانند
+            for queue in (self._commands, *self._queues.values()):
+                while queue:
+                    future = queue.popleft()[0]
+                    if future.set_running_or_notify_cancel():
+                        future.set_result(None)
+        if serial_port is not None:
+            logger.error(f"پورت RS485 {self.port} از کار افتاد و بسته شد: {error}")
+            try:
+                serial_port.close()
+            except Exception:
+                pass
+
+    def queue_depth(self) -> int:
+        return len(self._commands) + sum(len(queue) for queue in self._queues.values())
+
+    # ── صف درخواست‌ها ─────────────────────────────────────
+    def submit(self, slave_id: int, frame: bytes, expected_len: int, priority: bool = False) -> Future:
+        future = Future()
+        with self._cond:
+            if not self._running or self._serial is None:
+                future.set_result(None)
+                return future
+            if priority:
+                self._commands.append((future, frame, expected_len))
+                self._cond.notify()
+                return future
+            queue = self._queues.get(slave_id)
+            if queue is None:
+                queue = self._queues[slave_id] = deque()
+                self._round_robin.append(slave_id)
+            queue.append((future, frame, expected_len))
+            self._cond.notify()
+        return future
+
+    def transact(self, slave_id: int, frame: bytes, expected_len: int,
+                 priority: bool = False) -> Optional[bytes]:
+        """ارسال فریم و انتظار برای پاسخ (بلاک شدن فقط برای thread صدازننده)"""
+        future = self.submit(slave_id, frame, expected_len, priority=priority)
+        # صبر برای نوبت روی خط + timeout خود پاسخ
+        # (فرمان فقط پشت تراکنش در حال اجرا و فرمان‌های قبلی می‌ماند)
+        if priority:
+            timeout = self.timeout * (len(self._commands) + 2)
+        else:
+            timeout = self.timeout * (len(self._round_robin) + len(self._commands) + 1)
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            future.cancel()
+            return None
+
+    def _next_request(self):
+        """فرمان‌ها اول، سپس نوبت بعدی round-robin (با قفل _cond صدا زده می‌شود)"""
+        if self._commands:
+            return self._commands.popleft()
+        for _ in range(len(self._round_robin)):
+            slave_id = self._round_robin[0]
+            self._round_robin.rotate(-1)
+            queue = self._queues[slave_id]
+            if queue:
+                return queue.popleft()
+        return None
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                request = self._next_request()
+                while request is None and self._running:
+                    self._cond.wait()
+                    request = self._next_request()
+                if request is None:
+                    return
+
+            future, frame, expected_len = request
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            # سکوت t3.5 از آخرین بایت روی خط
+            wait = self._line_idle_at - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+            serial_port = self._serial
+            if serial_port is None:
+                # bus failed؛ تا open() بعدی چیزی روی خط نمی‌رود
+                future.set_result(None)
+                continue
+
+            response = None
+            started = time.monotonic()
+            try:
+                serial_port.reset_input_buffer()
+                serial_port.write(frame)
+                response = serial_port.read(expected_len)
+            except OSError as e:
+                # serial.SerialException زیرکلاس OSError است
+                self._fail(e)
+            except Exception as e:
+                logger.error(f"خطای RS485 روی {self.port}: {e}")
+            finally:
+                finished = time.monotonic()
+                self._line_idle_at = finished + self.gap
+                # سکوت t3.5 هم جزو ظرفیت خط است
+                self.metrics.busy_for(finished - started + self.gap)
+                future.set_result(response)
+
+
+# ============================================================
+# BUS REGISTRY — یک RS485Bus به ازای هر پورت فیزیکی
+# ============================================================
+_buses: Dict[str, RS485Bus] = {}
+_buses_lock = threading.Lock()
+
+
+def get_bus(port: str, baudrate: int = 9600, timeout: float = 2.0) -> RS485Bus:
+    with _buses_lock:
+        bus = _buses.get(port)
+        if bus is None:
+            bus = _buses[port] = RS485Bus(port=port, baudrate=baudrate, timeout=timeout)
+        elif bus.baudrate != baudrate:
+            logger.warning(
+                f"Baud Rate ناهمسان روی {port}: {baudrate} ≠ {bus.baudrate} "
+                f"(همه slaveهای یک خط باید هم‌سرعت باشند؛ {bus.baudrate} استفاده می‌شود)"
+            )
+        return bus
+
+
+def get_all_buses() -> Dict[str, RS485Bus]:
+    return _buses
@@ -0,0 +1,235 @@
+"""
+============================================================
+Sensor Schema — یک تعریف برای فیلدهای payload سنسور و اعتبارسنجی آن‌ها
+============================================================
+قبلاً محدوده‌ها (SENSOR_BOUNDS)، نگاشت کلید payload → ستون SensorReading
+(PAYLOAD_COLUMNS) و پیش‌فرض‌ها (توان/ولتاژ/جریان = 0) جدا از هم تعریف
+شده بودند و validate_sensor_payload برای هر پیام همه فیلدهای همه انواع
+دستگاه را بررسی می‌کرد و رشته خطا می‌ساخت.
+
+SCHEMA تنها منبع است و از آن برای هر نوع دستگاه یک PayloadValidator
+ساخته می‌شود (فقط فیلدهای همان نوع):
+
+- validate(payload): یک خوانش → مقادیر ستون‌ها (با پیش‌فرض‌ها) یا خطاها
+- validate_batch(payloads): کل دسته به صورت ماتریس NumPy (خوانش × فیلد)؛
+  بررسی نوع با یک گذر روی مقادیر و بررسی محدوده با یک مقایسه برداری،
+  پس هزینه هر پیام تقریباً به تعداد فیلدها بستگی ندارد. خروجی ستون‌های
+  آماده ReadingBatch.from_columns است. بدون NumPy (یا دسته کوچک‌تر از
+  MIN_NUMPY_BATCH) همان validate در حلقه
+- rejections: شمارنده رد شدن به ازای هر فیلد (پنل و گزارش بار)
+
+قالب سیمی باینری (core.mqtt_codec.LAYOUTS) نسخه‌دار است و عمداً از این
+جدول ساخته نمی‌شود؛ اضافه شدن فیلد به SCHEMA قالب v1 را عوض نمی‌کند.
+
+    validator = get_validator(device.device_type)
+    columns, valid, errors = validator.validate_batch(payloads)
+"""
+
+import math
+import threading
+from dataclasses import dataclass
+from itertools import chain
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy اختیاری است؛ مسیر حلقه خالص کار می‌کند
+    np = None
+
+AUTOCLAVE = ("autoclave",)
+INCINERATOR = ("incinerator",)
+ALL_TYPES = AUTOCLAVE + INCINERATOR
+
+FLOAT, FLAG = "float", "flag"
+_NUMERIC_TYPES = frozenset((int, float, bool, type(None)))
+# دسته کوچک‌تر: هزینه ثابت ساخت آرایه‌ها بیش از حلقه ساده است
+MIN_NUMPY_BATCH = 16
+
+
+@dataclass(frozen=True)
+class SensorField:
+    key: str                      # کلید payload MQTT
+    column: str                   # فیلد SensorReading / ستون ReadingBatch
+    low: float = -math.inf
+    high: float = math.inf
+    device_types: Tuple[str, ...] = ALL_TYPES
+    kind: str = FLOAT             # FLAG = بولی (-1 = نامشخص)
+    default: Optional[float] = None   # مقدار ستون وقتی فیلد در payload نیست
+
+
+# ============================================================
+# SCHEMA — مقادیر خارج از محدوده کل خوانش را رد می‌کنند
+# ============================================================
+SCHEMA: Tuple[SensorField, ...] = (
+    # اتوکلاو
+    SensorField('temp_c', 'temperature_c', 0, 200, AUTOCLAVE),               # درجه سانتیگراد
+    SensorField('pressure', 'pressure_bar', 0, 10, AUTOCLAVE),               # بار
+    SensorField('steam_flow', 'steam_flow_kg_h', 0, 100, AUTOCLAVE),         # kg/h
+    SensorField('water_level', 'water_level_pct', 0, 100, AUTOCLAVE),        # درصد
+    SensorField('door_locked', 'door_locked', device_types=AUTOCLAVE, kind=FLAG),
+    # زباله‌سوز
+    SensorField('combustion_temp', 'combustion_temp_c', 0, 1600, INCINERATOR),
+    SensorField('post_combustion_temp', 'post_combustion_temp_c', 0, 1600, INCINERATOR),
+    SensorField('exhaust_temp', 'exhaust_temp_c', 0, 600, INCINERATOR),
+    SensorField('co2', 'co2_ppm', 0, 100000, INCINERATOR),                   # ppm
+    SensorField('co', 'co_ppm', 0, 10000, INCINERATOR),                      # ppm
+    SensorField('nox', 'nox_ppm', 0, 5000, INCINERATOR),                     # ppm
+    SensorField('so2', 'so2_ppm', 0, 5000, INCINERATOR),                     # ppm
+    SensorField('fuel_flow', 'fuel_flow_lh', 0, 200, INCINERATOR),           # L/h
+    # مشترک
+    SensorField('power_kw', 'power_consumption_kw', 0, 500, default=0),      # کیلووات
+    SensorField('voltage', 'voltage_v', 0, 1000, default=0),                 # ولت
+    SensorField('current', 'current_a', 0, 1000, default=0),                 # آمپر
+)
+
+# مشتق از SCHEMA (سازگاری با core.mqtt_client)
+SENSOR_BOUNDS: Dict[str, Tuple[float, float]] = {
+    field.key: (field.low, field.high) for field in SCHEMA if field.kind == FLOAT
+}
+PAYLOAD_COLUMNS: Dict[str, str] = {field.key: field.column for field in SCHEMA}
+
+
+class PayloadValidator:
+    """اعتبارسنج یک نوع دستگاه؛ یک بار از SCHEMA ساخته می‌شود"""
+
+    def __init__(self, device_type: Optional[str], fields: Sequence[SensorField]):
+        self.device_type = device_type
+        self.fields = tuple(field for field in fields if field.kind == FLOAT)
+        self.flags = tuple(field for field in fields if field.kind == FLAG)
+        self.keys = tuple(field.key for field in self.fields)
+        self.columns = tuple(field.column for field in self.fields)
+        self._checks = tuple((field.key, field.low, field.high) for field in self.fields)
+        self._defaults = tuple(
+            (index, field.default) for index, field in enumerate(self.fields) if field.default is not None
+        )
+        if np is not None:
+            self._low = np.array([field.low for field in self.fields], dtype=float)
+            self._high = np.array([field.high for field in self.fields], dtype=float)
+        self.rejections: Dict[str, int] = {field.key: 0 for field in fields}
+        self.checked = 0
+
+    # ── یک خوانش ───────────────────────────────────────────
+    def _errors(self, payload: dict) -> List[str]:
+        errors = []
+        for key, low, high in self._checks:
+            value = payload.get(key)
+            if value is None or value != value:
+                continue  # فیلد اختیاری است (NaN = ندارد، مثل مسیر NumPy)
+            if type(value) not in _NUMERIC_TYPES:
+                errors.append(f"{key}: مقدار باید عدد باشد، دریافت شد: {type(value).__name__}")
+                self.rejections[key] += 1
+            elif not low <= value <= high:
+                errors.append(f"{key}: مقدار {value} خارج از محدوده [{low}, {high}]")
+                self.rejections[key] += 1
+        return errors
+
+    def validate(self, payload: dict) -> Tuple[Optional[Dict[str, float]], List[str]]:
+        """(ستون → مقدار با پیش‌فرض‌ها، []) یا (None، خطاها)"""
+        self.checked += 1
+        errors = self._errors(payload)
+        if errors:
+            return None, errors
+        values = {}
+        for field in self.fields:
+            value = payload.get(field.key)
+            values[field.column] = field.default if value is None else value
+        for field in self.flags:
+            values[field.column] = payload.get(field.key)
+        return values, []
+
+    # ── کل دسته ────────────────────────────────────────────
+    def validate_batch(self, payloads: Sequence[dict]) -> Tuple[Dict[str, Sequence], Sequence[bool], List[str]]:
+        """
+        (ستون → آرایه هم‌طول payloads، ماسک معتبر، خطاهای اولین خوانش رد شده)
+        ستون‌ها شامل ردیف‌های نامعتبر هم هستند؛ اعمال ماسک با فراخواننده
+        """
+        if np is None or len(payloads) < MIN_NUMPY_BATCH:
+            return self._validate_loop(payloads)
+        self.checked += len(payloads)
+
+        rows = [tuple(map(payload.get, self.keys)) for payload in payloads]
+        if not set(map(type, chain.from_iterable(rows))) <= _NUMERIC_TYPES:
+            # مقدار غیرعددی (نادر): همان ردیف‌ها NULL می‌شوند و بعد رد
+            bad_types = [
+                i for i, row in enumerate(rows)
+                if not set(map(type, row)) <= _NUMERIC_TYPES
+            ]
+            first_error = self._errors(payloads[bad_types[0]])
+            for i in bad_types[1:]:
+                self._errors(payloads[i])
+            for i in bad_types:
+                rows[i] = (None,) * len(self.keys)
+        else:
+            bad_types, first_error = [], []
+
+        # None → NaN؛ NaN در مقایسه False است، پس مقدار غایب معتبر است
+        matrix = np.array(rows, dtype=float).reshape(len(rows), len(self.keys))
+        out_of_range = (matrix < self._low) | (matrix > self._high)
+        valid = ~out_of_range.any(axis=1)
+        if not valid.all():
+            counts = out_of_range.sum(axis=0)
+            for key, count in zip(self.keys, counts.tolist()):
+                if count:
+                    self.rejections[key] += count
+            if not first_error:
+                first_error = [
+                    f"{key}: مقدار {value:g} خارج از محدوده [{low}, {high}]"
+                    for (key, low, high), value, bad in zip(
+                        self._checks, matrix[int(np.argmin(valid))], out_of_range[int(np.argmin(valid))]
+                    ) if bad
+                ]
+        if bad_types:
+            valid[bad_types] = False
+
+        for index, default in self._defaults:
+            column = matrix[:, index]
+            column[np.isnan(column)] = default
+        columns = {column: matrix[:, index] for index, column in enumerate(self.columns)}
+        for field in self.flags:
+            columns[field.column] = np.array(
+                [-1 if value is None else int(bool(value)) for value in map(lambda p: p.get(field.key), payloads)],
+                dtype=np.int8,
+            )
+        return columns, valid, first_error
+
+    def _validate_loop(self, payloads: Sequence[dict]):
+        columns = {field.column: [] for field in self.fields + self.flags}
+        valid, first_error = [], []
+        for payload in payloads:
+            values, errors = self.validate(payload)
+            if values is None:
+                values = {}
+                first_error = first_error or errors
+            valid.append(not errors)
+            for field in self.fields:
+                value = values.get(field.column)
+                columns[field.column].append(math.nan if value is None else value)
+            for field in self.flags:
+                value = values.get(field.column)
+                columns[field.column].append(-1 if value is None else int(bool(value)))
+        return columns, valid, first_error
+
+    def stats(self) -> dict:
+        return {"checked": self.checked, "rejected": {key: n for key, n in self.rejections.items() if n}}
+
+
+_validators: Dict[Optional[str], PayloadValidator] = {}
+_validators_lock = threading.Lock()
+
+
+def get_validator(device_type: Optional[str] = None) -> PayloadValidator:
+    """validator هر نوع دستگاه (یک بار ساخته می‌شود)؛ نوع ناشناخته/None = همه فیلدها"""
+    validator = _validators.get(device_type)
+    if validator is None:
+        with _validators_lock:
+            validator = _validators.get(device_type)
+            if validator is None:
+                fields = [field for field in SCHEMA if device_type in field.device_types]
+                validator = PayloadValidator(device_type, fields or SCHEMA)
+                _validators[device_type] = validator
+    return validator
+
+
+def validator_stats() -> Dict[str, dict]:
+    """نوع دستگاه → تعداد بررسی و رد شدن هر فیلد"""
+    return {str(device_type): validator.stats() for device_type, validator in list(_validators.items())}
@@ -0,0 +1,372 @@
+"""
+============================================================
+Reading Spool — صف پایدار روی دیسک برای خوانش‌هایی که به دیتابیس نرسیدند
+============================================================
+وقتی PostgreSQL کند یا قطع بود BulkWriter دسته‌ها را فقط در حافظه نگه
+می‌داشت: با پر شدن بافر pollerها منتظر می‌ماندند (backpressure) و بعد از
+BLOCK_SECONDS خوانش‌ها رد می‌شدند؛ restart پروسه هم بافر را از بین می‌برد.
+نتیجه: حفره در سوابق استریلیزاسیون.
+
+ReadingSpool یک لاگ append-only روی فایل‌های segment با اندازه ثابت است
+که با mmap نوشته می‌شوند (بدون syscall به ازای هر رکورد):
+
+- رکورد = سرآیند (طول، تعداد ردیف، زمان spool، CRC32) + ستون‌های خام
+  ReadingBatch (array.tobytes)؛ سرآیند بعد از داده نوشته می‌شود تا رکورد
+  نیمه‌کاره (crash وسط نوشتن) هنگام باز کردن کنار گذاشته شود
+- cursor (segment، offset) اولین رکورد replay‌نشده است؛ بعد از درج موفق
+  جلو می‌رود و segmentهای تمام‌شده پاک می‌شوند. crash بین درج و ذخیره
+  cursor همان دسته را دوباره درج می‌کند (at-least-once)
+- حجم محدود (MAX_BYTES): اگر segment جدید لازم باشد و سقف پر باشد،
+  قدیمی‌ترین segment دور ریخته و شمرده/لاگ می‌شود
+- هر پروسه یک slot (زیرپوشه) با قفل flock می‌گیرد؛ slot پروسه‌ای که
+  crash یا restart شده توسط پروسه بعدی همان‌جا replay می‌شود
+
+    spool = ReadingSpool.open_slot(settings.SENSOR_SPOOL_DIR)
+    spool.append(batch)                     # BulkWriter: دیتابیس قطع یا بافر پر
+    batch, position = spool.read(1000)      # replay به ترتیب spool
+    spool.commit(position)                  # بعد از درج موفق
+"""
+
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # ویندوز: بدون قفل — فقط یک پروسه روی هر پوشه spool
+    fcntl = None
+
+from core.reading_batch import TYPECODES, ReadingBatch
+
+logger = logging.getLogger(__name__)
+
+# طول payload، تعداد ردیف، زمان spool (epoch)، CRC32 payload
+HEADER = struct.Struct("<IIdI")
+ROW_BYTES = sum(array(typecode).itemsize for typecode in TYPECODES.values())
+# حداکثر فاصله msync صفحات تغییرکرده
+SYNC_SECONDS = 1.0
+MAX_SLOTS = 64
+
+
+class SpoolPosition(NamedTuple):
+    """انتهای یک read(): cursor بعد از commit + حجم خوانده‌شده"""
+    seq: int
+    offset: int
+    rows: int
+    size: int
+
+
+def _encode(batch: ReadingBatch, start: int, stop: int) -> bytes:
+    return b"".join(getattr(batch, name)[start:stop].tobytes() for name in TYPECODES)
+
+
+def _decode(payload: bytes, rows: int) -> ReadingBatch:
+    columns, offset = {}, 0
+    for name, typecode in TYPECODES.items():
+        column = array(typecode)
+        size = rows * column.itemsize
+        column.frombytes(payload[offset:offset + size])
+        columns[name] = column
+        offset += size
+    return ReadingBatch(columns)
+
+
+class ReadingSpool:
+    def __init__(self, directory, segment_bytes: int = 8 << 20, max_bytes: int = 1 << 30):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.max_segments = max(2, max_bytes // segment_bytes)
+        # دسته بزرگ‌تر از یک segment به چند رکورد شکسته می‌شود
+        self.max_record_rows = (segment_bytes - HEADER.size) // ROW_BYTES
+
+        self._lock = threading.Lock()
+        self._lock_file = None
+        self._segments: List[int] = []
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._write_seq = 0
+        self._write_offset = 0
+        self._cursor: Tuple[int, int] = (0, 0)
+        self._read_from: Tuple[int, int] = (0, 0)
+        self._synced = time.monotonic()
+
+        self.backlog_rows = 0
+        self.backlog_bytes = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.dropped = 0
+
+    @classmethod
+    def open_slot(cls, root, **kwargs) -> Optional["ReadingSpool"]:
+        """اولین slot آزاد زیر root (هر پروسه یکی؛ slot پروسه مرده دوباره گرفته می‌شود)"""
+        for slot in range(MAX_SLOTS if fcntl is not None else 1):
+            spool = cls(Path(root) / f"slot-{slot}", **kwargs)
+            if spool.open():
+                return spool
+        logger.error(f"هیچ slot آزادی در {root} نیست — spool خوانش‌ها غیرفعال است")
+        return None
+
+    # ── باز کردن / بازیابی ─────────────────────────────────
+    def open(self) -> bool:
+        """False = این پوشه در اختیار پروسه دیگری است"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.directory / "lock", "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+        self._lock_file = lock_file
+
+        self._segments = sorted(int(path.stem) for path in self.directory.glob("*.seg"))
+        if not self._segments:
+            self._create_segment(1)
+        # قبل از تعیین _write_seq تا _record_at آن را segment بسته‌شده ببیند
+        self._write_offset = self._scan_end(self._segments[-1])
+        self._write_seq = self._segments[-1]
+        self._clear_header(self._write_seq, self._write_offset)
+        self._cursor = self._load_cursor()
+
+        self._recount_backlog()
+        for seq in list(self._maps):
+            if seq != self._write_seq:
+                self._maps.pop(seq).close()
+        if self.backlog_rows:
+            logger.warning(
+                f"📼 spool {self.directory}: {self.backlog_rows:,} خوانش از اجرای قبلی در انتظار درج"
+            )
+        return True
+
+    def _path(self, seq: int) -> Path:
+        return self.directory / f"{seq:010d}.seg"
+
+    def _create_segment(self, seq: int):
+        with open(self._path(seq), "wb") as f:
+            f.truncate(self.segment_bytes)
+        self._segments.append(seq)
+
+    def _map(self, seq: int) -> mmap.mmap:
+        segment = self._maps.get(seq)
+        if segment is None:
+            with open(self._path(seq), "r+b") as f:
+                segment = self._maps[seq] = mmap.mmap(f.fileno(), 0)
+        return segment
+
+    def _record_at(self, seq: int, offset: int, verify: bool = True) -> Optional[Tuple[int, int, float]]:
+        """(ردیف‌ها، طول، زمان spool) رکورد معتبر در این موقعیت یا None (انتهای segment)"""
+        if seq == self._write_seq and offset >= self._write_offset:
+            return None
+        segment = self._map(seq)
+        if offset + HEADER.size > len(segment):
+            return None
+        length, rows, spooled_at, crc = HEADER.unpack_from(segment, offset)
+        body = offset + HEADER.size
+        if not length or length != rows * ROW_BYTES or body + length > len(segment):
+            return None
+        if verify and zlib.crc32(segment[body:body + length]) != crc:
+            logger.error(f"رکورد خراب در spool {self._path(seq).name} @ {offset} — بقیه segment نادیده گرفته شد")
+            return None
+        return rows, length, spooled_at
+
+    def _scan_end(self, seq: int) -> int:
+        """انتهای آخرین رکورد کامل segment (بعد از crash)"""
+        offset = 0
+        while True:
+            record = self._record_at(seq, offset)
+            if record is None:
+                return offset
+            offset += HEADER.size + record[1]
+
+    def _clear_header(self, seq: int, offset: int):
+        """پایان صریح segment (سرآیند صفر) روی باقی‌مانده رکورد نیمه‌کاره"""
+        segment = self._map(seq)
+        if offset + HEADER.size <= len(segment):
+            segment[offset:offset + HEADER.size] = bytes(HEADER.size)
+
+    def _next_seq(self, seq: int) -> Optional[int]:
+        later = [s for s in self._segments if s > seq]
+        return later[0] if later else None
+
+    def _load_cursor(self) -> Tuple[int, int]:
+        try:
+            seq, offset = map(int, (self.directory / "cursor").read_text().split())
+        except (OSError, ValueError):
+            return self._segments[0], 0
+        if seq not in self._segments:
+            # segment cursor پاک شده (دور ریخته یا replay شده)
+            seq = self._next_seq(seq) or self._segments[-1]
+            offset = 0
+        return seq, offset
+
+    def _save_cursor(self):
+        path = self.directory / "cursor"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(f"{self._cursor[0]} {self._cursor[1]}\n")
+        os.replace(tmp, path)
+
+    def _records(self, seq: int, offset: int):
+        """(seq، offset، ردیف‌ها، طول) همه رکوردهای بعد از موقعیت، به ترتیب"""
+        while seq is not None:
+            record = self._record_at(seq, offset)
+            if record is None:
+                if seq >= self._write_seq:
+                    return
+                seq, offset = self._next_seq(seq), 0
+                continue
+            yield seq, offset, record[0], record[1]
+            offset += HEADER.size + record[1]
+
+    def _recount_backlog(self):
+        self.backlog_rows = self.backlog_bytes = 0
+        for _, _, rows, length in self._records(*self._cursor):
+            self.backlog_rows += rows
+            self.backlog_bytes += HEADER.size + length
+
+    # ── نوشتن ──────────────────────────────────────────────
+    def append(self, batch: ReadingBatch) -> int:
+        """نوشتن کل دسته؛ خروجی: تعداد ردیف"""
+        total = len(batch)
+        with self._lock:
+            if self._lock_file is None:
+                raise RuntimeError(f"spool {self.directory} بسته شده است")
+            for start in range(0, total, self.max_record_rows):
+                stop = min(total, start + self.max_record_rows)
+                payload = _encode(batch, start, stop)
+                size = HEADER.size + len(payload)
+                if self._write_offset + size > self.segment_bytes:
+                    self._roll()
+                segment = self._map(self._write_seq)
+                body = self._write_offset + HEADER.size
+                segment[body:body + len(payload)] = payload
+                segment[self._write_offset:body] = HEADER.pack(len(payload), stop - start, time.time(), zlib.crc32(payload))
+                self._write_offset += size
+                self.backlog_rows += stop - start
+                self.backlog_bytes += size
+            self.spooled += total
+            if time.monotonic() - self._synced >= SYNC_SECONDS:
+                self._sync()
+        return total
+
+    def _roll(self):
+        """segment فعلی پر شد: بستن آن و شروع segment جدید (با رعایت سقف حجم)"""
+        self._clear_header(self._write_seq, self._write_offset)
+        self._map(self._write_seq).flush()
+        if self._write_seq != self._cursor[0]:
+            self._maps.pop(self._write_seq).close()
+        while len(self._segments) >= self.max_segments:
+            self._drop_oldest()
+        self._create_segment(self._write_seq + 1)
+        self._write_seq, self._write_offset = self._segments[-1], 0
+
+    def _drop_oldest(self):
+        seq = self._segments[0]
+        start = self._cursor[1] if self._cursor[0] == seq else 0
+        lost = lost_bytes = 0
+        for record_seq, _, rows, length in self._records(seq, start):
+            if record_seq != seq:
+                break
+            lost += rows
+            lost_bytes += HEADER.size + length
+        self._delete(seq)
+        if self._cursor[0] == seq:
+            self._cursor = (self._segments[0], 0)
+            self._save_cursor()
+        if not lost:
+            return
+        self.dropped += lost
+        self.backlog_rows -= lost
+        self.backlog_bytes -= lost_bytes
+        logger.error(
+            f"⚠️ spool {self.directory} به سقف {self.max_segments * self.segment_bytes >> 20}MB رسید — "
+            f"{lost:,} خوانش قدیمی دور ریخته شد (مجموع {self.dropped:,})"
+        )
+
+    def _delete(self, seq: int):
+        segment = self._maps.pop(seq, None)
+        if segment is not None:
+            segment.close()
+        self._segments.remove(seq)
+        self._path(seq).unlink(missing_ok=True)
+
+    def _sync(self):
+        self._map(self._write_seq).flush()
+        self._synced = time.monotonic()
+
+    # ── replay ─────────────────────────────────────────────
+    def read(self, max_rows: int) -> Tuple[Optional[ReadingBatch], Optional[SpoolPosition]]:
+        """رکوردهای بعد از cursor تا حدود max_rows ردیف (رکورد شکسته نمی‌شود)"""
+        with self._lock:
+            batch, rows, size = None, 0, 0
+            seq, offset = self._read_from = self._cursor
+            for seq, offset, count, length in self._records(*self._cursor):
+                body = offset + HEADER.size
+                part = _decode(self._map(seq)[body:body + length], count)
+                if batch is None:
+                    batch = part
+                else:
+                    batch.extend(part)
+                rows += count
+                size += HEADER.size + length
+                offset = body + length
+                if rows >= max_rows:
+                    break
+            if batch is None:
+                return None, None
+            return batch, SpoolPosition(seq, offset, rows, size)
+
+    def commit(self, position: SpoolPosition):
+        """دسته خوانده‌شده درج شد: جلو بردن cursor و پاک کردن segmentهای تمام‌شده"""
+        with self._lock:
+            if position.seq not in self._segments:
+                # segment حین درج به خاطر سقف حجم دور ریخته شد
+                return
+            for seq in [s for s in self._segments if s < position.seq]:
+                self._delete(seq)
+            dropped_meanwhile = self._cursor != self._read_from
+            self._cursor = (position.seq, position.offset)
+            self._save_cursor()
+            self.replayed += position.rows
+            if dropped_meanwhile:
+                self._recount_backlog()
+            else:
+                self.backlog_rows -= position.rows
+                self.backlog_bytes -= position.size
+
+    # ── گزارش ──────────────────────────────────────────────
+    def lag_seconds(self) -> float:
+        """سن قدیمی‌ترین رکورد replay‌نشده"""
+        with self._lock:
+            for seq, offset, _, _ in self._records(*self._cursor):
+                record = self._record_at(seq, offset, verify=False)
+                return max(0.0, time.time() - record[2])
+        return 0.0
+
+    def stats(self) -> dict:
+        return {
+            "backlog_rows": self.backlog_rows,
+            "backlog_bytes": self.backlog_bytes,
+            "disk_bytes": len(self._segments) * self.segment_bytes,
+            "lag_seconds": round(self.lag_seconds(), 1),
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "dropped": self.dropped,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._lock_file is None:
+                return
+            for segment in self._maps.values():
+                segment.flush()
+                segment.close()
+            self._maps.clear()
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
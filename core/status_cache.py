@@ -0,0 +1,148 @@
+"""
+============================================================
+Device Status Cache — نوشتن تأخیری status / last_seen دستگاه‌ها
+============================================================
+قبلاً هر خوانش PLC و هر پیام MQTT یک UPDATE روی ردیف devices_device
+می‌زد؛ با صدها دستگاه این ردیف‌های داغ با خواندن‌های پنل ادمین و
+داشبورد رقابت می‌کنند. این کش آخرین وضعیت و زمان هر دستگاه را در حافظه
+نگه می‌دارد:
+
+- تغییر وضعیت (online ↔ error ↔ offline ↔ reconnecting): UPDATE فوری
+- فقط last_seen تغییر کرده: هر FLUSH_SECONDS همه ردیف‌های تغییرکرده
+  با یک bulk_update نوشته می‌شوند (status هم دوباره نوشته می‌شود تا
+  تغییرات پروسه‌های دیگر، مثل check_device_connectivity، اصلاح شوند)
+
+    get_status_cache().record(device_id, "online")
+"""
+
+import atexit
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceStatusCache:
+    def __init__(self, flush_seconds: float = 5.0):
+        self.flush_seconds = flush_seconds
+        # device_id → (status, last_seen)
+        self._latest: Dict[int, Tuple[str, Optional[datetime]]] = {}
+        # آخرین status نوشته‌شده در دیتابیس توسط این پروسه
+        self._persisted: Dict[int, str] = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.immediate_writes = 0
+        self.bulk_rows = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="device-status", daemon=True)
+            self._thread.start()
+
+    def record(self, device_id: int, status: str, last_seen: Optional[datetime] = None):
+        """خوانش جدید از دستگاه؛ last_seen پیش‌فرض = الان"""
+        if last_seen is None:
+            from django.utils import timezone
+            last_seen = timezone.now()
+        self._update(device_id, status, last_seen)
+
+    def set_status(self, device_id: int, status: str):
+        """تغییر وضعیت بدون خوانش (مثلاً باز شدن مدار breaker) — last_seen دست نمی‌خورد"""
+        self._update(device_id, status, None)
+
+    def get(self, device_id: int) -> Optional[Tuple[str, Optional[datetime]]]:
+        return self._latest.get(device_id)
+
+    def _update(self, device_id: int, status: str, last_seen: Optional[datetime]):
+        self.start()
+        with self._lock:
+            previous = self._latest.get(device_id)
+            if last_seen is None and previous is not None:
+                last_seen = previous[1]
+            self._latest[device_id] = (status, last_seen)
+            transition = self._persisted.get(device_id) != status
+            if transition:
+                self._persisted[device_id] = status
+                self._dirty.discard(device_id)
+            elif last_seen is not None:
+                self._dirty.add(device_id)
+
+        if transition:
+            self._write_now(device_id, status, last_seen)
+
+    def _write_now(self, device_id: int, status: str, last_seen: Optional[datetime]):
+        from apps.devices.models import Device
+
+        fields = {"status": status}
+        if last_seen is not None:
+            fields["last_seen"] = last_seen
+        try:
+            Device.objects.filter(pk=device_id).update(**fields)
+            self.immediate_writes += 1
+        except Exception as e:
+            logger.error(f"خطا در ثبت وضعیت دستگاه #{device_id}: {e}")
+            with self._lock:
+                # تلاش دوباره در flush بعدی
+                self._persisted.pop(device_id, None)
+                self._dirty.add(device_id)
+
+    def flush(self) -> int:
+        """نوشتن همه ردیف‌های تغییرکرده با یک bulk_update"""
+        from apps.devices.models import Device
+
+        with self._lock:
+            if not self._dirty:
+                return 0
+            dirty, self._dirty = self._dirty, set()
+            rows = [
+                Device(pk=device_id, status=self._latest[device_id][0], last_seen=self._latest[device_id][1])
+                for device_id in dirty
+            ]
+        try:
+            Device.objects.bulk_update(rows, ["status", "last_seen"], batch_size=500)
+        except Exception as e:
+            logger.error(f"خطا در ثبت دسته‌ای وضعیت {len(rows)} دستگاه: {e}")
+            with self._lock:
+                self._dirty |= dirty
+            return 0
+        with self._lock:
+            for row in rows:
+                if self._latest[row.pk][0] == row.status:
+                    self._persisted[row.pk] = row.status
+                else:
+                    # وضعیت حین نوشتن عوض شد؛ مقدار تازه در flush بعدی
+                    self._dirty.add(row.pk)
+        self.bulk_rows += len(rows)
+        return len(rows)
+
+    def _run(self):
+        from django.db import close_old_connections
+
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+            close_old_connections()
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+
+_cache: Optional[DeviceStatusCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_status_cache() -> DeviceStatusCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            from django.conf import settings
+            _cache = DeviceStatusCache(flush_seconds=getattr(settings, "DEVICE_STATUS_FLUSH_SECONDS", 5.0))
+            atexit.register(_cache.stop)
+        return _cache
@@ -0,0 +1,186 @@
+"""
+============================================================
+Channel Publisher — ارسال ناهمگام پیام‌های WebSocket از مسیرهای ingest
+============================================================
+قبلاً هر خوانش PLC و هر پیام MQTT یک async_to_sync(group_send) روی
+thread خودش اجرا می‌کرد: ساخت ماشین event loop برای هر فراخوانی و
+انتظار poll loop برای چند round trip به Redis.
+
+ChannelPublisher یک thread با event loop دائمی دارد:
+
+- publish(): فقط قرار دادن پیام در یک dict زیر قفل (چند میکروثانیه)
+- تجمیع (coalescing): اگر پیام قبلی همان دستگاه هنوز ارسال نشده، پیام
+  جدید جایگزین آن می‌شود — داشبورد فقط آخرین مقدار را لازم دارد
+- صف محدود (MAX_PENDING گروه): وقتی پر باشد پیام گروه جدید دور ریخته
+  و شمرده می‌شود (داده real-time است؛ ذخیره دیتابیس جداست)
+- ارسال: هر LINGER_MS همه گروه‌های در صف هم‌زمان (تا CONCURRENCY
+  درخواست در پرواز روی pool اتصال channels_redis) فرستاده می‌شوند
+
+    get_publisher().publish(f"device_{device_id}", {"type": "sensor_update", "data": ...})
+    get_publisher().publish_batch(batch)      # ReadingBatch.messages()
+    get_publisher().stats()["pending"]        # عمق صف
+"""
+
+import asyncio
+import atexit
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelPublisher:
+    def __init__(self, max_pending: int = 10_000, linger_ms: int = 20, concurrency: int = 64):
+        self.max_pending = max_pending
+        self.linger_seconds = linger_ms / 1000
+        self.concurrency = concurrency
+
+        # (گروه، نوع پیام) → (گروه، پیام)؛ ترتیب درج حفظ می‌شود
+        self._pending: Dict[Tuple[str, str], Tuple[str, dict]] = {}
+        self._lock = threading.Lock()
+        self._idle = True
+        self._disabled = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+
+        self.published = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.failures = 0
+        self.last_send_ms = 0.0
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._wake = asyncio.Event()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="ws-publisher", daemon=True)
+            self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._run(), self._loop)
+
+    # ── تولیدکننده‌ها ──────────────────────────────────────
+    def publish(self, group: str, message: dict) -> bool:
+        """False = صف پر است یا channel layer تنظیم نشده"""
+        if self._thread is None:
+            self.start()
+        if self._disabled:
+            return False
+        key = (group, message.get("type"))
+        with self._lock:
+            if key in self._pending:
+                self.coalesced += 1
+            elif len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                if self.dropped % 1000 == 1:
+                    logger.warning(f"صف WebSocket پر است ({self.max_pending:,} گروه) — {self.dropped:,} پیام دور ریخته شد")
+                return False
+            self._pending[key] = (group, message)
+            wake, self._idle = self._idle, False
+        if wake:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        return True
+
+    def publish_batch(self, batch):
+        """آخرین ردیف هر دستگاه یک ReadingBatch"""
+        for group, message in batch.messages():
+            self.publish(group, message)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "published": self.published,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "failures": self.failures,
+            "last_send_ms": round(self.last_send_ms, 1),
+        }
+
+    # ── event loop ─────────────────────────────────────────
+    async def _run(self):
+        from channels.layers import get_channel_layer
+
+        layer = get_channel_layer()
+        if layer is None:
+            logger.warning("Channel layer تنظیم نشده — به‌روزرسانی زنده داشبورد غیرفعال است")
+            self._disabled = True
+            return
+        limit = asyncio.Semaphore(self.concurrency)
+        failing = False
+
+        while True:
+            await self._wake.wait()
+            if self.linger_seconds:
+                # چند میلی‌ثانیه صبر تا پیام‌های بیشتری تجمیع شوند
+                await asyncio.sleep(self.linger_seconds)
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._wake.clear()
+                self._idle = True
+
+            started = time.monotonic()
+            results = await asyncio.gather(
+                *(self._send(layer, limit, group, message) for group, message in pending.values()),
+                return_exceptions=True,
+            )
+            errors = [r for r in results if isinstance(r, Exception)]
+            self.published += len(results) - len(errors)
+            self.last_send_ms = (time.monotonic() - started) * 1000
+            if errors:
+                self.failures += len(errors)
+                # Redis قطع است: فقط اولین خطای هر دوره قطعی لاگ می‌شود
+                if not failing:
+                    logger.error(f"ارسال {len(errors)}/{len(results)} پیام WebSocket ناموفق: {errors[0]}")
+                failing = True
+            elif failing:
+                logger.info("✅ ارسال پیام‌های WebSocket دوباره برقرار شد")
+                failing = False
+
+    async def _send(self, layer, limit: asyncio.Semaphore, group: str, message: dict):
+        async with limit:
+            await layer.group_send(group, message)
+
+    def stop(self, timeout: float = 5.0):
+        """ارسال پیام‌های باقی‌مانده و توقف event loop"""
+        if self._loop is None or not self._loop.is_running():
+            return
+        deadline = time.monotonic() + timeout
+        while self._pending and not self._disabled and time.monotonic() < deadline:
+            time.sleep(self.linger_seconds or 0.01)
+        # publish بعد از توقف فقط False برمی‌گرداند
+        self._disabled = True
+        self._loop.call_soon_threadsafe(self._halt)
+        self._thread.join(max(0.0, deadline - time.monotonic()))
+        if not self._loop.is_running():
+            self._loop.close()
+
+    def _halt(self):
+        for task in asyncio.all_tasks(self._loop):
+            task.cancel()
+        # stop بعد از یک دور تا taskهای لغوشده تمام شوند
+        self._loop.call_soon(self._loop.stop)
+
+
+_publisher: Optional[ChannelPublisher] = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher() -> ChannelPublisher:
+    global _publisher
+    with _publisher_lock:
+        if _publisher is None:
+            from django.conf import settings
+            _publisher = ChannelPublisher(
+                max_pending=getattr(settings, "WS_PUBLISH_MAX_PENDING", 10_000),
+                linger_ms=getattr(settings, "WS_PUBLISH_LINGER_MS", 20),
+                concurrency=getattr(settings, "WS_PUBLISH_CONCURRENCY", 64),
+            )
+            atexit.register(_publisher.stop)
+        return _publisher